@@ -17,6 +17,7 @@
 # limitations under the License.
 # ======================================================================
 
+from supervisor.loggers import LevelsByName
 from supervisor.xmlrpc import capped_int
 
 from supvisors.ttypes import AddressStates, InvalidTransition
@@ -32,18 +33,30 @@ class AddressStatus(object):
     - remote_time: the last date received from the Supvisors instance,
     - local_time: the last date received from the Supvisors instance,
     in the local reference time,
-    - processes: the list of processes that are available on this address. """
-
-    def __init__(self, address_name, logger):
+    - processes: the list of processes that are available on this address,
+    - running_index: the processes running on this address, kept up-to-date upon process updates,
+    - loadings: the expected loading of the processes running on this address,
+    - state_index: the node names per state, shared by all the AddressStatus of the context
+    and updated on every state change (None if not indexed),
+    - _serial: the cached serializable form, reset whenever a serialized attribute changes. """
+
+    def __init__(self, address_name, logger, state_index=None):
         """ Initialization of the attributes. """
         # keep a reference to the common logger
         self.logger = logger
         # attributes
         self.address_name = address_name
+        self.state_index = state_index
         self._state = AddressStates.UNKNOWN
+        if state_index is not None:
+            state_index[AddressStates.UNKNOWN].add(address_name)
         self.remote_time = 0
         self.local_time = 0
         self.processes = {}
+        self.running_index = {}
+        self.loadings = {}
+        self._loading = 0
+        self._serial = None
 
     # accessors / mutators
     @property
@@ -55,22 +68,33 @@ class AddressStatus(object):
     def state(self, new_state):
         if self._state != new_state:
             if self.check_transition(new_state):
-                self._state = new_state
+                self.force_state(new_state)
                 self.logger.info('Address {} is {}'.format(self.address_name, self.state_string()))
             else:
                 raise InvalidTransition('Address: transition rejected {} to {}'.
                                         format(self.state_string(),
                                                AddressStates.to_string(new_state)))
 
+    def force_state(self, new_state):
+        """ Set the state without checking the transition and keep the state index up-to-date. """
+        if self.state_index is not None:
+            self.state_index[self._state].discard(self.address_name)
+            self.state_index[new_state].add(self.address_name)
+        self._state = new_state
+        self._serial = None
+
     # serialization
     def serial(self):
-        """ Return a serializable form of the AddressStatus. """
-        return {'address_name': self.address_name,
-                'statecode': self.state,
-                'statename': self.state_string(),
-                'remote_time': capped_int(self.remote_time),
-                'local_time': capped_int(self.local_time),
-                'loading': self.loading()}
+        """ Return a serializable form of the AddressStatus.
+        The result is cached until a serialized attribute changes, so it must not be modified by the caller. """
+        if self._serial is None:
+            self._serial = {'address_name': self.address_name,
+                            'statecode': self.state,
+                            'statename': self.state_string(),
+                            'remote_time': capped_int(self.remote_time),
+                            'local_time': capped_int(self.local_time),
+                            'loading': self.loading()}
+        return self._serial
 
     # methods
     def state_string(self):
@@ -82,12 +106,11 @@ class AddressStatus(object):
         return self.state in [AddressStates.ISOLATING, AddressStates.ISOLATED]
 
     def update_times(self, remote_time, local_time):
-        """ Update the last times attributes of the AddressStatus and
-        of all the processes running on it. """
+        """ Update the last times attributes of the AddressStatus.
+        The time entries of the processes are refreshed from remote_time only when they are read. """
         self.remote_time = remote_time
         self.local_time = local_time
-        for process in self.processes.values():
-            process.update_times(self.address_name, remote_time)
+        self._serial = None
 
     def check_transition(self, new_state):
         """ Check that the state transition is valid. """
@@ -95,32 +118,68 @@ class AddressStatus(object):
 
     # methods on processes
     def add_process(self, process):
-        """ Add a new process to the process list. """
+        """ Add a new process to the process list.
+        The process will notify this instance when its loading on the address may have changed. """
         self.processes[process.namespec()] = process
+        process.address_statuses[self.address_name] = self
+        self.update_loading(process)
+
+    def update_loading(self, process):
+        """ Update the running processes and the loading of the address with the expected loading of the process
+        if it is running on the address. """
+        namespec = process.namespec()
+        if process.running_on(self.address_name):
+            self.running_index[namespec] = process
+            loading = process.rules.expected_loading
+        else:
+            self.running_index.pop(namespec, None)
+            loading = 0
+        delta = loading - self.loadings.pop(namespec, 0)
+        if loading:
+            self.loadings[namespec] = loading
+        if delta:
+            self._loading += delta
+            self._serial = None
 
     def running_processes(self):
         """ Return the process running on the address.
         Here, 'running' means that the process state is in Supervisor
-        RUNNING_STATES. """
-        return [process for process in self.processes.values()
-                if process.running_on(self.address_name)]
+        RUNNING_STATES.
+        The processes are taken from the running index, so the other processes are not scanned. """
+        return list(self.running_index.values())
 
     def pid_processes(self):
         """ Return the process running on the address and having a pid.
        Different from running_processes_on because it excludes the states
        STARTING and BACKOFF """
-        return [(process.namespec(), process.infos[self.address_name]['pid'])
-                for process in self.processes.values()
+        return [(namespec, process.infos[self.address_name]['pid'])
+                for namespec, process in self.running_index.items()
                 if process.pid_running_on(self.address_name)]
 
     def loading(self):
-        """ Return the loading of the address, by summing the declared loading
-        of the processes running on that address """
-        loading = sum(process.rules.expected_loading
-                      for process in self.running_processes())
-        self.logger.debug('address={} loading={}'.
-                          format(self.address_name, loading))
-        return loading
+        """ Return the loading of the address, i.e. the sum of the declared loading
+        of the processes running on that address, as maintained upon process updates.
+        The value is checked against the processes in debug mode. """
+        if self.logger.level <= LevelsByName.DEBG:
+            self.check_loading()
+        return self._loading
+
+    def check_loading(self):
+        """ Return True if the maintained running processes and loading are consistent with the processes
+        running on the address. """
+        running = {namespec for namespec, process in self.processes.items()
+                   if process.running_on(self.address_name)}
+        if running != self.running_index.keys():
+            self.logger.error('AddressStatus.check_loading: address={} running={} expected={}'
+                              .format(self.address_name, sorted(self.running_index), sorted(running)))
+            return False
+        loading = sum(self.processes[namespec].rules.expected_loading for namespec in running)
+        if loading != self._loading:
+            self.logger.error('AddressStatus.check_loading: address={} loading={} expected={}'
+                              .format(self.address_name, self._loading, loading))
+            return False
+        self.logger.debug('address={} loading={}'.format(self.address_name, loading))
+        return True
 
     # dictionary for transitions
     _Transitions = {
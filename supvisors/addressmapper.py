@@ -27,6 +27,7 @@ class AddressMapper(object):
     The instance holds:
         - logger: a reference to the common logger,
         - addresses: the list of addresses defined in the Supvisors configuration file,
+        - node_ids: the rank of each address in the list of addresses, used as node identifier,
         - local_addresses: the list of known aliases of the current host, i.e. the host name and the IPv4 addresses,
         - local_address: the usage name of the current host, i.e. the name in the known aliases corresponding to an address of the Supvisors list. """
 
@@ -36,6 +37,7 @@ class AddressMapper(object):
         self.logger = logger
         # init
         self._addresses = []
+        self.node_ids = {}
         self.local_addresses = [gethostname()] + self.ipv4()
         self.local_address = None
 
@@ -51,13 +53,17 @@ class AddressMapper(object):
         self.logger.info('Expected addresses: {}'.format(addr))
         # store IP list as found in config file
         self._addresses = addr
+        # intern the addresses so that they are found without scanning the list
+        self.node_ids = {}
+        for node_id, address in enumerate(addr):
+            self.node_ids.setdefault(address, node_id)
         # get IP list for local node
         self.local_address = self.expected(self.local_addresses)
         self.logger.info('Local addresses: {} - Local address: {}'.format(self.local_addresses, self.local_address))
 
     def valid(self, address):
         """ Return True if address is among the addresses defined in the configuration file. """
-        return address in self._addresses
+        return address in self.node_ids
 
     def filter(self, address_list):
         """ Returns a list of expected nodes from a list of names or ip addresses identifying different locations. """
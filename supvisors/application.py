@@ -17,7 +17,7 @@
 # limitations under the License.
 # ======================================================================
 
-from typing import Mapping, Sequence
+from typing import Dict, List, Mapping, Sequence, Tuple
 
 from supervisor.loggers import Logger
 from supervisor.states import *
@@ -80,15 +80,24 @@ class ApplicationStatus(object):
         - processes: the map (key is process name) of the ProcessStatus belonging to the application,
         - rules: the ApplicationRules instance applicable to the application,
         - start_sequence: the sequencing to start the processes belonging to the application, as a dictionary.
-        - stop_sequence: the sequencing to stop the processes belonging to the application, as a dictionary.
+        - stop_sequence: the sequencing to stop the processes belonging to the application, as a dictionary,
+        - contributions: the contribution of each process to the counters (key is process name),
+        - counters: the number of processes that are starting, running, stopping, in major failure and in minor failure,
+        - _serial: the cached serializable form, reset whenever a serialized attribute changes.
 
     For start and stop sequences, each entry is a list of processes having the same sequence order, used as key.
+    The counters are updated by the processes whenever their state changes, so that the state of the application
+    is evaluated without scanning all its processes.
     """
 
     # types for annotations
     ApplicationSequence = Mapping[int, Sequence[ProcessStatus]]
     PrintableApplicationSequence = Mapping[int, Sequence[str]]
     ProcessMap = Mapping[str, Sequence[ProcessStatus]]
+    Contribution = Tuple[bool, bool, bool, bool, bool]
+
+    # contribution of a process that is not considered
+    NoContribution = (False,) * 5
 
     def __init__(self, application_name: str, logger: Logger) -> None:
         """ Initialization of the attributes.
@@ -108,6 +117,9 @@ class ApplicationStatus(object):
         self.rules = ApplicationRules()
         self.start_sequence: ApplicationStatus.ApplicationSequence = {}
         self.stop_sequence: ApplicationStatus.ApplicationSequence = {}
+        self.contributions: Dict[str, ApplicationStatus.Contribution] = {}
+        self.counters: List[int] = [0] * 5
+        self._serial = None
 
     # access
     def running(self) -> bool:
@@ -141,19 +153,23 @@ class ApplicationStatus(object):
         """
         if self._state != new_state:
             self._state = new_state
+            self._serial = None
             self.logger.info('Application {} is {}'.format(self.application_name, self.state_string()))
 
     # serialization
     def serial(self) -> Payload:
         """ Get a serializable form of the application status.
+        The result is cached until a serialized attribute changes, so it must not be modified by the caller.
 
         :return: the application status in a dictionary
         """
-        return {'application_name': self.application_name,
-                'statecode': self.state,
-                'statename': self.state_string(),
-                'major_failure': self.major_failure,
-                'minor_failure': self.minor_failure}
+        if self._serial is None:
+            self._serial = {'application_name': self.application_name,
+                            'statecode': self.state,
+                            'statename': self.state_string(),
+                            'major_failure': self.major_failure,
+                            'minor_failure': self.minor_failure}
+        return self._serial
 
     # methods
     def state_string(self) -> str:
@@ -165,11 +181,59 @@ class ApplicationStatus(object):
 
     def add_process(self, process: ProcessStatus) -> None:
         """ Add a new process to the process list.
+        The process will notify the application upon any state change.
 
         :param process: the process status to be added to the application
         :return:
         """
         self.processes[process.process_name] = process
+        process.application_status = self
+        self.update_process(process)
+
+    @staticmethod
+    def get_contribution(process: ProcessStatus) -> Contribution:
+        """ Get the contribution of the process to the counters of the application.
+
+        :param process: the process status
+        :return: the starting, running, stopping, major failure and minor failure status of the process
+        """
+        starting, running, stopping, major_failure, minor_failure = (False,) * 5
+        if process.state == ProcessStates.RUNNING:
+            running = True
+        elif process.state in [ProcessStates.STARTING, ProcessStates.BACKOFF]:
+            starting = True
+        # STOPPING is not in STOPPED_STATES
+        elif process.state == ProcessStates.STOPPING:
+            stopping = True
+        elif process.state in STOPPED_STATES:
+            if process.rules.required:
+                # any required stopped process is a major failure for a running application
+                # exception is made for an EXITED process with an expected exit code
+                if process.state != ProcessStates.EXITED or not process.expected_exit:
+                    major_failure = True
+            else:
+                # an optional process is a minor failure for a running application
+                # when its state is FATAL or unexpectedly EXITED
+                if ((process.state == ProcessStates.FATAL) or
+                        (process.state == ProcessStates.EXITED and not process.expected_exit)):
+                    minor_failure = True
+        # all other STOPPED-like states are considered normal
+        return starting, running, stopping, major_failure, minor_failure
+
+    def update_process(self, process: ProcessStatus) -> None:
+        """ Update the counters of the application iaw the contribution of the process.
+        This must be called after any change of the process state, exit status or rules.
+
+        :param process: the process status
+        :return: None
+        """
+        contribution = self.get_contribution(process)
+        previous = self.contributions.get(process.process_name, ApplicationStatus.NoContribution)
+        if contribution != previous:
+            self.contributions[process.process_name] = contribution
+            self.counters = [counter - old + new for counter, old, new in zip(self.counters, previous, contribution)]
+            self.logger.trace('Application {}: process {} contribution={}'
+                              .format(self.application_name, process.process_name, contribution))
 
     @staticmethod
     def printable_sequence(application_sequence: ApplicationSequence) -> PrintableApplicationSequence:
@@ -198,39 +262,11 @@ class ApplicationStatus(object):
                                   self.printable_sequence(self.stop_sequence)))
 
     def update_status(self) -> None:
-        """ Update the state of the application iaw the state of its processes.
+        """ Update the state of the application iaw the counters maintained by its processes.
 
         :return: None
         """
-        starting, running, stopping, major_failure, minor_failure = (False,) * 5
-        for process in self.processes.values():
-            self.logger.trace('Process {}: state={} required={} exit_expected={}'
-                              .format(process.namespec(),
-                                      process.state_string(),
-                                      process.rules.required,
-                                      process.expected_exit))
-            if process.state == ProcessStates.RUNNING:
-                running = True
-            elif process.state in [ProcessStates.STARTING, ProcessStates.BACKOFF]:
-                starting = True
-            # STOPPING is not in STOPPED_STATES
-            elif process.state == ProcessStates.STOPPING:
-                stopping = True
-            elif process.state in STOPPED_STATES:
-                if process.rules.required:
-                    # any required stopped process is a major failure for a
-                    # running application
-                    # exception is made for an EXITED process with an expected
-                    # exit code
-                    if process.state != ProcessStates.EXITED or not process.expected_exit:
-                        major_failure = True
-                else:
-                    # an optional process is a minor failure for a running
-                    # application when its state is FATAL or unexpectedly EXITED
-                    if ((process.state == ProcessStates.FATAL) or
-                            (process.state == ProcessStates.EXITED and not process.expected_exit)):
-                        minor_failure = True
-            # all other STOPPED-like states are considered normal
+        starting, running, stopping, major_failure, minor_failure = (counter > 0 for counter in self.counters)
         self.logger.trace('Application {}: starting={} running={} stopping={} major_failure={} minor_failure={}'
                           .format(self.application_name, starting, running, stopping, major_failure, minor_failure))
         # apply rules for state
@@ -243,5 +279,8 @@ class ApplicationStatus(object):
         else:
             self.state = ApplicationStates.STOPPED
         # update major_failure and minor_failure status (only for running applications)
-        self.major_failure = major_failure and self.running()
-        self.minor_failure = minor_failure and self.running()
+        major_failure = major_failure and self.running()
+        minor_failure = minor_failure and self.running()
+        if (self.major_failure, self.minor_failure) != (major_failure, minor_failure):
+            self.major_failure, self.minor_failure = major_failure, minor_failure
+            self._serial = None
@@ -17,6 +17,7 @@
 package org.supvisors.event;
 
 import com.google.gson.Gson;
+import com.google.gson.JsonObject;
 
 import java.util.Timer;
 import java.util.TimerTask;
@@ -53,6 +54,9 @@ public class SupvisorsEventSubscriber implements Runnable {
     /** The constant header in ProcessStatus messages. */
     private static final String PROCESS_EVENT_HEADER = "event";
 
+    /** The separator of the levels in the message topics. */
+    private static final String TOPIC_SEPARATOR = "/";
+
     /** The ZeroMQ context. */
     private ZContext context;
 
@@ -65,6 +69,9 @@ public class SupvisorsEventSubscriber implements Runnable {
     /** The event listener. */
     private SupvisorsEventListener listener;
 
+    /** The sequence number of the last message received. */
+    private volatile long lastSequence;
+
     /**
      * The constructor creates the subscriber socket.
      *
@@ -87,6 +94,15 @@ public class SupvisorsEventSubscriber implements Runnable {
         this.subscriber = null;
     }
 
+    /**
+     * Get the sequence number of the last message received.
+     *
+     * @return long: the sequence number.
+     */
+    public long getLastSequence() {
+        return this.lastSequence;
+    }
+
     /**
      * Set the event listener.
      *
@@ -138,6 +154,38 @@ public class SupvisorsEventSubscriber implements Runnable {
         subscribeTo(PROCESS_EVENT_HEADER);
     }
 
+    /**
+     * Subscription to the status events of an address.
+     *
+     * @param String addressName: the name of the address.
+     */
+    public void subscribeToAddress(final String addressName) {
+        subscribeTo(addressTopic(addressName));
+    }
+
+    /**
+     * Subscription to the status events of an application and to the events of all its processes.
+     *
+     * @param String applicationName: the name of the application.
+     */
+    public void subscribeToApplication(final String applicationName) {
+        for (String topic : applicationTopics(applicationName)) {
+            subscribeTo(topic);
+        }
+    }
+
+    /**
+     * Subscription to the events of a process.
+     *
+     * @param String applicationName: the name of the application.
+     * @param String processName: the name of the process.
+     */
+    public void subscribeToProcess(final String applicationName, final String processName) {
+        for (String topic : processTopics(applicationName, processName)) {
+            subscribeTo(topic);
+        }
+    }
+
     /**
      * Subscription to event.
      *
@@ -189,6 +237,38 @@ public class SupvisorsEventSubscriber implements Runnable {
         unsubscribeFrom(PROCESS_EVENT_HEADER);
     }
 
+    /**
+     * Unsubscription from the status events of an address.
+     *
+     * @param String addressName: the name of the address.
+     */
+    public void unsubscribeFromAddress(final String addressName) {
+        unsubscribeFrom(addressTopic(addressName));
+    }
+
+    /**
+     * Unsubscription from the status events of an application and from the events of all its processes.
+     *
+     * @param String applicationName: the name of the application.
+     */
+    public void unsubscribeFromApplication(final String applicationName) {
+        for (String topic : applicationTopics(applicationName)) {
+            unsubscribeFrom(topic);
+        }
+    }
+
+    /**
+     * Unsubscription from the events of a process.
+     *
+     * @param String applicationName: the name of the application.
+     * @param String processName: the name of the process.
+     */
+    public void unsubscribeFromProcess(final String applicationName, final String processName) {
+        for (String topic : processTopics(applicationName, processName)) {
+            unsubscribeFrom(topic);
+        }
+    }
+
     /**
      * Unsubscription from event.
      *
@@ -198,6 +278,40 @@ public class SupvisorsEventSubscriber implements Runnable {
         this.subscriber.unsubscribe(header.getBytes(ZMQ.CHARSET));
     }
 
+    /**
+     * Get the topic of the status events of an address.
+     *
+     * @param String addressName: the name of the address.
+     * @return String: the topic.
+     */
+    private static String addressTopic(final String addressName) {
+        return ADDRESS_STATUS_HEADER + TOPIC_SEPARATOR + addressName + TOPIC_SEPARATOR;
+    }
+
+    /**
+     * Get the topics of the events related to an application.
+     *
+     * @param String applicationName: the name of the application.
+     * @return String[]: the topics.
+     */
+    private static String[] applicationTopics(final String applicationName) {
+        final String names = TOPIC_SEPARATOR + applicationName + TOPIC_SEPARATOR;
+        return new String[] { APPLICATION_STATUS_HEADER + names, PROCESS_STATUS_HEADER + names,
+            PROCESS_EVENT_HEADER + names };
+    }
+
+    /**
+     * Get the topics of the events related to a process.
+     *
+     * @param String applicationName: the name of the application.
+     * @param String processName: the name of the process.
+     * @return String[]: the topics.
+     */
+    private static String[] processTopics(final String applicationName, final String processName) {
+        final String names = TOPIC_SEPARATOR + applicationName + TOPIC_SEPARATOR + processName + TOPIC_SEPARATOR;
+        return new String[] { PROCESS_STATUS_HEADER + names, PROCESS_EVENT_HEADER + names };
+    }
+
     /**
      * Set the flag to stop the main loop.
      */
@@ -221,12 +335,18 @@ public class SupvisorsEventSubscriber implements Runnable {
             // check if something happened on socket
             if (poller.pollin(0)) {
                 // get the data
-                String header = this.subscriber.recvStr();
+                // the header is the first level of the topic
+                String header = this.subscriber.recvStr().split(TOPIC_SEPARATOR, 2)[0];
                 String body = this.subscriber.recvStr();
+                // the sequence number is used to synchronize with the snapshot of the Supvisors state
+                Gson gson = new Gson();
+                JsonObject json = gson.fromJson(body, JsonObject.class);
+                if (json.has("sequence")) {
+                    this.lastSequence = json.get("sequence").getAsLong();
+                }
 
                 // notify subscribers if any
                 if (listener != null) {
-                    Gson gson = new Gson();
                     if (SUPVISORS_STATUS_HEADER.equals(header)) {
                         SupvisorsStatus status = gson.fromJson(body, SupvisorsStatus.class);
                         listener.onSupvisorsStatus(status);
@@ -23,7 +23,7 @@ import zmq
 from supervisor import loggers
 from supervisor.loggers import LevelsByName
 
-from supvisors.supvisorszmq import EventSubscriber
+from supvisors.supvisorszmq import EventSubscriber, SnapshotRequester
 from supvisors.utils import EventHeaders
 
 
@@ -52,6 +52,11 @@ class SupvisorsEventInterface(threading.Thread):
     This event port number MUST correspond to the ``event_port`` value set
     in the ``[supvisors]`` section of the Supervisor configuration file.
 
+    Optionally, the snapshot port number can be provided. It MUST correspond to the ``snapshot_port`` value set
+    in the ``[supvisors]`` section of the Supervisor configuration file.
+    In this case, the current state of **Supvisors** is requested once the subscriptions are configured
+    and passed to `on_snapshot`. The events that are already taken into account in the snapshot are then discarded.
+
     The default behaviour is to print the messages received.
     For any other behaviour, just specialize the methods `on_xxx_status`.
 
@@ -59,7 +64,10 @@ class SupvisorsEventInterface(threading.Thread):
 
         - logger: the reference to the logger,
         - subscriber: the wrapper of the ZeroMQ socket connected to **Supvisors**,
-        - stop_event: when set, breaks the infinite loop of the thread.
+        - stop_event: when set, breaks the infinite loop of the thread,
+        - snapshot_sequence: the sequence number of the snapshot received (0 if no snapshot or once the events
+          following the snapshot are received),
+        - last_sequence: the sequence number of the last event received.
 
     Constants:
 
@@ -68,14 +76,17 @@ class SupvisorsEventInterface(threading.Thread):
 
     _Poll_timeout = 500
 
-    def __init__(self, zmq_context, event_port, logger):
+    def __init__(self, zmq_context, event_port, logger, snapshot_port=None):
         """ Initialization of the attributes. """
         # thread attributes
         threading.Thread.__init__(self)
         # store the parameters
         self.zmq_context = zmq_context
         self.event_port = event_port
+        self.snapshot_port = snapshot_port
         self.logger = logger
+        self.snapshot_sequence = 0
+        self.last_sequence = 0
         # create stop event
         self.stop_event = threading.Event()
 
@@ -89,6 +100,9 @@ class SupvisorsEventInterface(threading.Thread):
         # create event socket
         self.subscriber = EventSubscriber(self.zmq_context, self.event_port, self.logger)
         self.configure()
+        # get the current state once subscribed, so that no event is missed
+        if self.snapshot_port:
+            self.request_snapshot()
         # create poller and register event subscriber
         poller = zmq.Poller()
         poller.register(self.subscriber.socket, zmq.POLLIN)
@@ -106,6 +120,9 @@ class SupvisorsEventInterface(threading.Thread):
                     self.logger.error(
                         'failed to get data from subscriber: {}'.format(e.message))
                 else:
+                    if self.in_snapshot(self.subscriber.sequence):
+                        # event already taken into account in the snapshot
+                        continue
                     if message[0] == EventHeaders.SUPVISORS:
                         self.on_supvisors_status(message[1])
                     elif message[0] == EventHeaders.ADDRESS:
@@ -124,6 +141,33 @@ class SupvisorsEventInterface(threading.Thread):
         self.logger.info('subscribe to all messages')
         self.subscriber.subscribe_all()
 
+    def request_snapshot(self):
+        """ Request the current state of **Supvisors** and pass it to on_snapshot. """
+        requester = SnapshotRequester(self.zmq_context, self.snapshot_port, self.logger)
+        snapshot = requester.request()
+        requester.close()
+        if snapshot:
+            self.snapshot_sequence = snapshot['sequence']
+            self.last_sequence = 0
+            self.on_snapshot(snapshot)
+
+    def in_snapshot(self, sequence):
+        """ Return True if the event is already taken into account in the snapshot.
+        The events are filtered only until the first event following the snapshot.
+        A sequence number going backwards means that **Supvisors** has restarted, so the snapshot is obsolete.
+        An event without sequence number (0), sent by an older **Supvisors** instance, is never filtered. """
+        previous, self.last_sequence = self.last_sequence, sequence
+        if self.snapshot_sequence:
+            if previous < sequence <= self.snapshot_sequence:
+                return True
+            # event following the snapshot or restart of the publisher
+            self.snapshot_sequence = 0
+        return False
+
+    def on_snapshot(self, data):
+        """ Just logs the contents of the Snapshot message. """
+        self.logger.info('got Snapshot message: {}'.format(data))
+
     def on_supvisors_status(self, data):
         """ Just logs the contents of the Supvisors Status message. """
         self.logger.info('got Supvisors Status message: {}'.format(data))
@@ -152,11 +196,13 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Start a subscriber to Supvisors events.')
     parser.add_argument('-p', '--port', type=int, default=60002,
                         help="the event port of Supvisors")
+    parser.add_argument('-n', '--snapshot-port', type=int, default=None,
+                        help="the snapshot port of Supvisors")
     parser.add_argument('-s', '--sleep', type=int, metavar='SEC', default=10,
                         help="the duration of the subscription")
     args = parser.parse_args()
     # create test subscriber
-    loop = SupvisorsEventInterface(zmq.Context.instance(), args.port, create_logger())
+    loop = SupvisorsEventInterface(zmq.Context.instance(), args.port, create_logger(), args.snapshot_port)
     loop.subscriber.subscribe_all()
     # start thread and sleep for a while
     loop.start()
@@ -0,0 +1,304 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import pickle
+import zlib
+
+from io import BytesIO
+from itertools import chain
+from struct import Struct
+from typing import Any, List, Optional, Sequence, Tuple
+
+from supvisors.ttypes import InternalCodecs, Payload
+from supvisors.utils import InternalEventHeaders
+
+# Types for annotations
+InternalMessage = Tuple[int, str, Any]
+SequencedMessage = Tuple[InternalMessage, Optional[int]]
+
+
+class PickleCodec(object):
+    """ Serialization of the internal messages using the Python pickle module.
+    This is the historical format, kept for compatibility.
+
+    The message is the pickled tuple (message type, node name, payload), followed by the pickled sequence number.
+    As pickle ignores the bytes following the pickled object, the older Supvisors instances still read the tuple
+    and ignore the sequence number. The messages of the older Supvisors instances have no sequence number.
+    """
+
+    @staticmethod
+    def encode(event_type: int, address: str, payload: Any, sequence: int = 0) -> bytes:
+        """ Serialize an internal message.
+
+        :param event_type: the message type, in InternalEventHeaders
+        :param address: the name of the node publishing the message
+        :param payload: the message contents
+        :param sequence: the sequence number of the message
+        :return: the serialized message
+        """
+        return pickle.dumps((event_type, address, payload), pickle.DEFAULT_PROTOCOL) \
+            + pickle.dumps(sequence, pickle.DEFAULT_PROTOCOL)
+
+    @staticmethod
+    def decode(message: bytes) -> SequencedMessage:
+        """ De-serialize an internal message.
+
+        :param message: the serialized message
+        :return: the message type, the name of the publishing node and the message contents, and the sequence number
+        (None if the message has been sent by an older Supvisors instance)
+        """
+        stream = BytesIO(message)
+        unpickler = pickle.Unpickler(stream)
+        event_type, address, payload = unpickler.load()
+        sequence = unpickler.load() if stream.tell() < len(message) else None
+        return (event_type, address, payload), sequence
+
+
+class BinaryCodec(object):
+    """ Schema-based serialization of the internal messages.
+
+    A message is made of a fixed header followed by the packed fields of the payload, in network order.
+    The header holds:
+
+        - the codec version,
+        - the message type, in InternalEventHeaders,
+        - the index of the publishing node in the address list,
+        - the sequence number of the message, given by the publisher.
+
+    Strings are packed as a 16-bit length followed by the UTF-8 bytes.
+    The codec relies on the fact that all Supvisors instances share the same address list.
+
+    Attributes are:
+
+        - addresses: the node names defined in the Supvisors configuration,
+        - indexes: the index of every node name in the address list.
+    """
+
+    VERSION = 1
+
+    # header: version, message type, node index, sequence number
+    Header = Struct('!BBHI')
+    # string length
+    StringLength = Struct('!H')
+    # tick: when
+    TickBody = Struct('!q')
+    # process event: state, now, pid, expected
+    ProcessBody = Struct('!Hqi?')
+    # batch of process events: number of events
+    ProcessBatchBody = Struct('!H')
+    # statistics: date, memory, number of cpu, number of interfaces, number of processes, size of names block
+    StatisticsBody = Struct('!dfHHII')
+    # cpu: work and idle jiffies
+    CpuBody = Struct('!dd')
+    # interface: received and sent bytes
+    InterfaceBody = Struct('!QQ')
+    # process statistics: pid, work jiffies, memory
+    ProcessStatisticsBody = Struct('!idf')
+    # statistics delta: date of the keyframe
+    StatisticsDeltaBody = Struct('!d')
+    # names removed since the keyframe: number of interfaces, number of processes, size of names block
+    RemovedBody = Struct('!HII')
+
+    def __init__(self, addresses: Sequence[str]) -> None:
+        """ Initialization of the attributes.
+
+        :param addresses: the node names defined in the Supvisors configuration
+        """
+        self.addresses = addresses
+        self.indexes = {address: idx for idx, address in enumerate(addresses)}
+        # schema selection
+        self._encoders = {InternalEventHeaders.TICK: self.encode_tick,
+                          InternalEventHeaders.PROCESS: self.encode_process,
+                          InternalEventHeaders.STATISTICS: self.encode_statistics,
+                          InternalEventHeaders.PROCESS_BATCH: self.encode_process_batch,
+                          InternalEventHeaders.STATISTICS_DELTA: self.encode_statistics_delta,
+                          InternalEventHeaders.HEARTBEAT: self.encode_heartbeat}
+        self._decoders = {InternalEventHeaders.TICK: self.decode_tick,
+                          InternalEventHeaders.PROCESS: self.decode_process,
+                          InternalEventHeaders.STATISTICS: self.decode_statistics,
+                          InternalEventHeaders.PROCESS_BATCH: self.decode_process_batch,
+                          InternalEventHeaders.STATISTICS_DELTA: self.decode_statistics_delta,
+                          InternalEventHeaders.HEARTBEAT: self.decode_heartbeat}
+
+    def encode(self, event_type: int, address: str, payload: Any, sequence: int = 0) -> bytes:
+        """ Serialize an internal message.
+
+        :param event_type: the message type, in InternalEventHeaders
+        :param address: the name of the node publishing the message
+        :param payload: the message contents
+        :param sequence: the sequence number of the message
+        :return: the serialized message
+        """
+        chunks = [self.Header.pack(self.VERSION, event_type, self.indexes[address], sequence)]
+        self._encoders[event_type](chunks, payload)
+        return b''.join(chunks)
+
+    def decode(self, message: bytes) -> SequencedMessage:
+        """ De-serialize an internal message.
+
+        :param message: the serialized message
+        :return: the message type, the name of the publishing node and the message contents, and the sequence number
+        """
+        buffer = memoryview(message)
+        version, event_type, node_index, sequence = self.Header.unpack_from(buffer)
+        if version != self.VERSION:
+            raise ValueError('unsupported internal message version: {}'.format(version))
+        payload = self._decoders[event_type](buffer, self.Header.size)
+        return (event_type, self.addresses[node_index], payload), sequence
+
+    # strings
+    def pack_string(self, chunks, value: str) -> None:
+        """ Add a length-prefixed UTF-8 string to the chunks. """
+        data = value.encode('utf-8')
+        chunks.append(self.StringLength.pack(len(data)))
+        chunks.append(data)
+
+    def unpack_string(self, buffer: memoryview, offset: int) -> Tuple[str, int]:
+        """ Read a length-prefixed UTF-8 string from the buffer and return it with the offset after it. """
+        length, = self.StringLength.unpack_from(buffer, offset)
+        offset += self.StringLength.size
+        return str(buffer[offset:offset + length], 'utf-8'), offset + length
+
+    # tick
+    def encode_tick(self, chunks, payload: Payload) -> None:
+        """ Pack the tick payload. """
+        chunks.append(self.TickBody.pack(payload['when']))
+
+    def decode_tick(self, buffer: memoryview, offset: int) -> Payload:
+        """ Unpack the tick payload. """
+        when, = self.TickBody.unpack_from(buffer, offset)
+        return {'when': when}
+
+    # heartbeat
+    def encode_heartbeat(self, chunks, payload: None) -> None:
+        """ The heartbeat has no payload. """
+
+    def decode_heartbeat(self, buffer: memoryview, offset: int) -> None:
+        """ The heartbeat has no payload. """
+
+    # process event
+    def encode_process(self, chunks, payload: Payload) -> None:
+        """ Pack the process event payload. """
+        chunks.append(self.ProcessBody.pack(payload.get('state', 0), payload.get('now', 0),
+                                            payload.get('pid', 0), payload.get('expected', False)))
+        for key in ('name', 'group', 'extra_args', 'spawnerr'):
+            self.pack_string(chunks, payload.get(key) or '')
+
+    def decode_process(self, buffer: memoryview, offset: int) -> Payload:
+        """ Unpack the process event payload. """
+        return self.unpack_process(buffer, offset)[0]
+
+    def unpack_process(self, buffer: memoryview, offset: int) -> Tuple[Payload, int]:
+        """ Read a process event payload from the buffer and return it with the offset after it. """
+        state, now, pid, expected = self.ProcessBody.unpack_from(buffer, offset)
+        offset += self.ProcessBody.size
+        name, offset = self.unpack_string(buffer, offset)
+        group, offset = self.unpack_string(buffer, offset)
+        extra_args, offset = self.unpack_string(buffer, offset)
+        spawnerr, offset = self.unpack_string(buffer, offset)
+        return {'name': name, 'group': group, 'state': state, 'extra_args': extra_args,
+                'now': now, 'pid': pid, 'expected': expected, 'spawnerr': spawnerr}, offset
+
+    # batch of process events
+    def encode_process_batch(self, chunks, payloads: List[Payload]) -> None:
+        """ Pack the list of process event payloads. """
+        chunks.append(self.ProcessBatchBody.pack(len(payloads)))
+        for payload in payloads:
+            self.encode_process(chunks, payload)
+
+    def decode_process_batch(self, buffer: memoryview, offset: int) -> List[Payload]:
+        """ Unpack the list of process event payloads. """
+        nb_events, = self.ProcessBatchBody.unpack_from(buffer, offset)
+        offset += self.ProcessBatchBody.size
+        payloads = []
+        for _ in range(nb_events):
+            payload, offset = self.unpack_process(buffer, offset)
+            payloads.append(payload)
+        return payloads
+
+    # statistics
+    def encode_statistics(self, chunks, payload) -> None:
+        """ Pack the statistics payload, as provided by statscollector.instant_statistics.
+        Numbers are packed in contiguous blocks and names are gathered in a single compressed block,
+        as they are highly redundant (application names, interface names). """
+        date, cpu, memory, io, proc = payload
+        names = zlib.compress('\0'.join(chain(io.keys(), proc.keys())).encode('utf-8'), 1)
+        chunks.append(self.StatisticsBody.pack(date, memory, len(cpu), len(io), len(proc), len(names)))
+        chunks.extend(self.CpuBody.pack(work, idle) for work, idle in cpu)
+        chunks.extend(self.InterfaceBody.pack(recv_bytes, sent_bytes) for recv_bytes, sent_bytes in io.values())
+        chunks.extend(self.ProcessStatisticsBody.pack(pid, work, proc_memory)
+                      for pid, (work, proc_memory) in proc.values())
+        chunks.append(names)
+
+    def decode_statistics(self, buffer: memoryview, offset: int):
+        """ Unpack the statistics payload, in the same structure as statscollector.instant_statistics.
+        Blocks are unpacked in one pass, without intermediate copies of the buffer. """
+        return self.unpack_statistics(buffer, offset)[0]
+
+    def unpack_statistics(self, buffer: memoryview, offset: int):
+        """ Read a statistics payload from the buffer and return it with the offset after it. """
+        date, memory, nb_cpu, nb_intf, nb_proc, names_size = self.StatisticsBody.unpack_from(buffer, offset)
+        offset += self.StatisticsBody.size
+        # cpu block
+        end = offset + nb_cpu * self.CpuBody.size
+        cpu = list(self.CpuBody.iter_unpack(buffer[offset:end]))
+        # interface block
+        offset, end = end, end + nb_intf * self.InterfaceBody.size
+        io_values = self.InterfaceBody.iter_unpack(buffer[offset:end])
+        # process block
+        offset, end = end, end + nb_proc * self.ProcessStatisticsBody.size
+        proc_values = self.ProcessStatisticsBody.iter_unpack(buffer[offset:end])
+        # names block
+        names = zlib.decompress(buffer[end:end + names_size]).decode('utf-8').split('\0')
+        io = dict(zip(names[:nb_intf], io_values))
+        proc = {namespec: (pid, (work, proc_memory))
+                for namespec, (pid, work, proc_memory) in zip(names[nb_intf:], proc_values)}
+        return (date, cpu, memory, io, proc), end + names_size
+
+    # statistics delta
+    def encode_statistics_delta(self, chunks, payload) -> None:
+        """ Pack the statistics delta payload, as provided by statscollector.delta_statistics.
+        The changes are packed like a statistics payload and the removed names in a separate compressed block. """
+        ref_date, date, cpu, memory, io, io_removed, proc, proc_removed = payload
+        chunks.append(self.StatisticsDeltaBody.pack(ref_date))
+        self.encode_statistics(chunks, (date, cpu, memory, io, proc))
+        names = zlib.compress('\0'.join(chain(io_removed, proc_removed)).encode('utf-8'), 1)
+        chunks.append(self.RemovedBody.pack(len(io_removed), len(proc_removed), len(names)))
+        chunks.append(names)
+
+    def decode_statistics_delta(self, buffer: memoryview, offset: int):
+        """ Unpack the statistics delta payload, in the same structure as statscollector.delta_statistics. """
+        ref_date, = self.StatisticsDeltaBody.unpack_from(buffer, offset)
+        (date, cpu, memory, io, proc), offset = self.unpack_statistics(buffer, offset + self.StatisticsDeltaBody.size)
+        nb_intf, nb_proc, names_size = self.RemovedBody.unpack_from(buffer, offset)
+        offset += self.RemovedBody.size
+        names = zlib.decompress(buffer[offset:offset + names_size]).decode('utf-8').split('\0')
+        return ref_date, date, cpu, memory, io, names[:nb_intf], proc, names[nb_intf:nb_intf + nb_proc]
+
+
+def create_codec(codec: int, addresses: Sequence[str]):
+    """ Create the codec used to serialize the internal messages.
+
+    :param codec: the codec selected in the Supvisors options, in InternalCodecs
+    :param addresses: the node names defined in the Supvisors configuration
+    :return: the codec instance
+    """
+    if codec == InternalCodecs.BINARY:
+        return BinaryCodec(addresses)
+    return PickleCodec()
@@ -17,24 +17,40 @@
 # limitations under the License.
 # ======================================================================
 
-from typing import Sequence
+import os
+
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from time import monotonic
+from typing import Dict, List, Optional, Sequence, Set
 
 from supvisors.address import *
 from supvisors.application import ApplicationStatus
+from supvisors.detector import PhiAccrualDetector
 from supvisors.process import *
-from supvisors.ttypes import AddressStates
+from supvisors.ttypes import AddressStates, Payload, ProcessStates, RunningFailureStrategies
 from supvisors.utils import supvisors_shortcuts
 
 
 class Context(object):
     """ The Context class holds the main data of Supvisors:
     - addresses: the dictionary of all AddressStatus (key is address),
+    - state_addresses: the node names per state, kept up-to-date by the AddressStatus instances,
     - forced_addresses: the dictionary of the minimal set of AddressStatus (key is address),
+    - membership: the nodes RUNNING in the last working session, as stored in the membership file,
+    - expected_addresses: the dictionary of the AddressStatus of the membership (key is address),
     - applications: the dictionary of all ApplicationStatus (key is application name),
     - processes: the dictionary of all ProcessStatus (key is process namespec),
+    - conflict_processes: the dictionary of the conflicting ProcessStatus, kept up-to-date by the ProcessStatus
+    instances (key is process namespec),
+    - state_processes: the ProcessStatus per state, kept up-to-date by the ProcessStatus instances
+    (key is process namespec),
+    - default_rules: the default ProcessRules shared by the processes without rules in the rules file
+    (key is the running failure strategy of the application),
     - master_address: the address of the Supvisors master,
     - master: a boolean telling if the local address is the master address.
     - new: a boolean telling if this context has just been started.
+    - detectors: the failure detector fed by the heartbeats, per node (empty if the heartbeats are disabled).
     """
 
     def __init__(self, supvisors):
@@ -44,15 +60,26 @@ class Context(object):
         # shortcuts for readability
         supvisors_shortcuts(self, ['address_mapper', 'info_source', 'logger', 'options'])
         # attributes
-        self.addresses = {address_name: AddressStatus(address_name, self.logger)
+        self.state_addresses: Dict[int, Set[str]] = {state: set() for state in AddressStates.values()}
+        self.addresses = {address_name: AddressStatus(address_name, self.logger, self.state_addresses)
                           for address_name in self.address_mapper.addresses}
         self.forced_addresses = {address_name: status
                                  for address_name, status in self.addresses.items()
                                  if address_name in self.options.force_synchro_if}
+        self.membership = self.load_membership()
+        self.expected_addresses = {}
+        self.update_expected_addresses()
         self.applications = {}
         self.processes = {}
+        self.conflict_processes: ProcessStatus.ConflictIndex = {}
+        self.state_processes: ProcessStatus.StateIndex = {state: {} for state in ProcessStates.values()}
+        self.default_rules: Dict[int, ProcessRules] = {}
         self._master_address = ''
         self.master = False
+        self.detectors = {}
+        if self.options.heartbeat_period:
+            self.detectors = {address_name: PhiAccrualDetector(self.options.heartbeat_period / 1000.0)
+                              for address_name in self.address_mapper.addresses}
 
     @property
     def master_address(self):
@@ -77,6 +104,15 @@ class Context(object):
                 for status in self.forced_addresses.values()
                 if status.state == AddressStates.UNKNOWN]
 
+    def unknown_expected_addresses(self) -> List[str]:
+        """ Return the nodes of the last working session that are in UNKNOWN state.
+
+        :return: the node names
+        """
+        return [status.address_name
+                for status in self.expected_addresses.values()
+                if status.state == AddressStates.UNKNOWN]
+
     def running_addresses(self):
         """ Return the AddressStatus instances in RUNNING state. """
         return self.addresses_by_states([AddressStates.RUNNING])
@@ -91,10 +127,10 @@ class Context(object):
         return self.addresses_by_states([AddressStates.ISOLATING, AddressStates.ISOLATED])
 
     def addresses_by_states(self, states):
-        """ Return the AddressStatus instances sorted by state. """
-        return [status.address_name
-                for status in self.addresses.values()
-                if status.state in states]
+        """ Return the AddressStatus instances sorted by state.
+        The nodes are taken from the state index and returned in the order of the address list. """
+        address_names = [address_name for state in states for address_name in self.state_addresses[state]]
+        return sorted(address_names, key=self.address_mapper.node_ids.__getitem__)
 
     def invalid(self, status):
         """ Declare SILENT or ISOLATING the AddressStatus in parameter, according to the auto_fence option.
@@ -104,6 +140,9 @@ class Context(object):
             status.state = AddressStates.ISOLATING
         else:
             status.state = AddressStates.SILENT
+        # the silence is not a normal heartbeat interval
+        if status.address_name in self.detectors:
+            self.detectors[status.address_name].reset()
         # invalidate address in concerned processes
         # if local Supvisors is master, failure handler will be notified for processes running on this address
         for process in status.running_processes():
@@ -115,20 +154,107 @@ class Context(object):
         :return: None
         """
         # consider problem if no tick received at the end of synchro time
-        for address in self.addresses.values():
-            if address.state == AddressStates.UNKNOWN:
-                self.invalid(address)
+        for address_name in self.unknown_addresses():
+            self.invalid(self.addresses[address_name])
+
+    def load_membership(self) -> List[str]:
+        """ Read the nodes RUNNING in the last working session from the membership file.
+        The nodes that are not part of the address list anymore are ignored.
+
+        :return: the node names
+        """
+        membership_file = self.options.membership_file
+        if membership_file:
+            try:
+                with open(membership_file) as stream:
+                    address_names = [line.strip() for line in stream]
+            except FileNotFoundError:
+                self.logger.info('Context.load_membership: no membership stored in {}'.format(membership_file))
+            except OSError as exc:
+                self.logger.error('Context.load_membership: cannot read {}: {}'.format(membership_file, exc))
+            else:
+                membership = [address_name for address_name in address_names if address_name in self.addresses]
+                self.logger.info('Context.load_membership: expected nodes {}'.format(membership))
+                return membership
+        return []
+
+    def update_expected_addresses(self) -> None:
+        """ Set the nodes expected in the synchronization phase from the membership of the last working session,
+        so that a new synchronization phase in the same session uses the nodes of the current session.
+
+        :return: None
+        """
+        self.expected_addresses = {address_name: self.addresses[address_name] for address_name in self.membership}
+
+    def save_membership(self) -> None:
+        """ Store the nodes that are RUNNING into the membership file.
+        The file is written only when the set of RUNNING nodes has changed since the last storage.
+
+        :return: None
+        """
+        membership_file = self.options.membership_file
+        if membership_file:
+            membership = self.running_addresses()
+            if membership != self.membership:
+                # write a temporary file and rename it so that the membership is never found incomplete
+                temp_file = membership_file + '.tmp'
+                try:
+                    with open(temp_file, 'w') as stream:
+                        stream.writelines(address_name + '\n' for address_name in membership)
+                    os.replace(temp_file, membership_file)
+                except OSError as exc:
+                    self.logger.error('Context.save_membership: cannot write {}: {}'.format(membership_file, exc))
+                else:
+                    self.logger.debug('Context.save_membership: nodes {} stored'.format(membership))
+                    self.membership = membership
 
     # methods on applications / processes
     def conflicting(self):
         """ Return True if any conflicting ProcessStatus is detected. """
-        return next((True for process in self.processes.values()
-                     if process.conflicting()), False)
+        return len(self.conflict_processes) > 0
 
     def conflicts(self):
         """ Return all conflicting ProcessStatus. """
-        return [process for process in self.processes.values()
-                if process.conflicting()]
+        return list(self.conflict_processes.values())
+
+    def filter_processes(self, application: Optional[str] = None, states: Optional[Sequence[int]] = None,
+                         address_name: Optional[str] = None, conflicting: bool = False,
+                         crashed: bool = False) -> List[ProcessStatus]:
+        """ Return the processes matching all the filters set, sorted by namespec.
+        The processes are taken from the smallest index corresponding to the filters and checked against the others.
+
+        :param application: a shell-style pattern on the application name
+        :param states: the process states
+        :param address_name: the node where the processes are running
+        :param conflicting: True to keep only the conflicting processes
+        :param crashed: True to keep only the crashed processes
+        :return: the processes matching the filters
+        """
+        indexes = []
+        if application is not None:
+            indexes.append({process.namespec(): process
+                            for application_name, application_status in self.applications.items()
+                            if fnmatchcase(application_name, application)
+                            for process in application_status.processes.values()})
+        if states is not None:
+            indexes.append({namespec: process
+                            for state in set(states)
+                            for namespec, process in self.state_processes[state].items()})
+        if address_name is not None:
+            indexes.append(self.addresses[address_name].running_index)
+        if conflicting:
+            indexes.append(self.conflict_processes)
+        if crashed:
+            # EXITED processes are checked below against their exit status
+            indexes.append({namespec: process
+                            for state in [ProcessStates.FATAL, ProcessStates.EXITED]
+                            for namespec, process in self.state_processes[state].items()})
+        if not indexes:
+            indexes.append(self.processes)
+        smallest, *others = sorted(indexes, key=len)
+        return [smallest[namespec] for namespec in sorted(smallest)
+                if all(namespec in index for index in others)
+                and (not crashed or smallest[namespec].crashed())]
 
     def setdefault_application(self, application_name):
         """ Return the application corresponding to application_name if found.
@@ -158,10 +284,11 @@ class Context(object):
             process = self.processes[namespec]
         except KeyError:
             # create new instance
-            process = ProcessStatus(application_name, info['name'], self.supvisors)
-            # apply default running failure strategy
+            process = ProcessStatus(application_name, info['name'], self.supvisors,
+                                    self.conflict_processes, self.state_processes)
+            # apply default rules, shared by the processes having the same default running failure strategy
             application = self.setdefault_application(process.application_name)
-            process.rules.running_failure_strategy = application.rules.running_failure_strategy
+            process.rules = self.default_process_rules(application.rules.running_failure_strategy)
             # load rules from rules file
             if self.supvisors.parser:
                 self.supvisors.parser.load_process_rules(process)
@@ -170,6 +297,19 @@ class Context(object):
             self.processes[namespec] = process
         return process
 
+    def default_process_rules(self, strategy: RunningFailureStrategies) -> ProcessRules:
+        """ Return the default process rules related to the running failure strategy of an application.
+
+        :param strategy: the default running failure strategy of the application
+        :return: the shared default process rules
+        """
+        try:
+            rules = self.default_rules[strategy]
+        except KeyError:
+            rules = self.default_rules[strategy] = ProcessRules(self.supvisors)
+            rules.running_failure_strategy = strategy
+        return rules
+
     def load_processes(self, address, all_info):
         """ Load application dictionary from process info got from Supervisor on address. """
         # get AddressStatus corresponding to address
@@ -183,6 +323,26 @@ class Context(object):
             # share the instance to the Supervisor instance that holds it
             status.add_process(process)
 
+    def resync_processes(self, address_name: str, all_info) -> List[ProcessStatus]:
+        """ Reload the information about the processes of the node that have changed while internal messages
+        were lost. The information is ignored if the node is not RUNNING, as it will be fully reloaded
+        when the node is checked.
+
+        :param address_name: the node that holds the processes
+        :param all_info: the information about the processes that have changed
+        :return: the processes updated
+        """
+        processes = []
+        status = self.addresses.get(address_name)
+        if status and status.state == AddressStates.RUNNING:
+            for info in all_info:
+                process = self.setdefault_process(info)
+                # the information stands for the events lost so the last extra arguments are applicable
+                process.add_info(address_name, info, info['extra_args'])
+                status.add_process(process)
+                processes.append(process)
+        return processes
+
     # methods on events
     def on_authorization(self, address_name: str, authorized: bool) -> Optional[bool]:
         """ Method called upon reception of an authorization event telling if the remote Supvisors instance
@@ -236,11 +396,25 @@ class Context(object):
         The method updates the ProcessStatus corresponding to the event, and thus the wrapping ApplicationStatus.
         Finally, the updated ProcessStatus and ApplicationStatus are published.
         """
+        process = self.update_process(address_name, event)
+        if process:
+            self.publish_process_updates([process])
+            return process
+
+    def update_process(self, address_name: str, event: Payload) -> Optional[ProcessStatus]:
+        """ Update the ProcessStatus corresponding to the process event received from the remote Supvisors instance,
+        and publish the process event.
+        The wrapping ApplicationStatus is not updated here.
+
+        :param address_name: the node that sent the event
+        :param event: the process event
+        :return: the process updated, or None if the event is rejected
+        """
         if self.address_mapper.valid(address_name):
             status = self.addresses[address_name]
             # ISOLATED address is not updated anymore
             if not status.in_isolation():
-                self.logger.debug('Context.on_process_event: got event {} from location={}'.format(event, address_name))
+                self.logger.debug('Context.update_process: got event {} from location={}'.format(event, address_name))
                 try:
                     # get internal data
                     application = self.applications[event['group']]
@@ -250,33 +424,82 @@ class Context(object):
                 except KeyError:
                     # process not found. normal when no tick yet received
                     # from this address
-                    self.logger.debug('Context.on_process_event: reject event {} from location={}'
+                    self.logger.debug('Context.update_process: reject event {} from location={}'
                                       .format(event, address_name))
                 else:
                     # refresh process info from process event
                     process.update_info(address_name, event)
-                    # refresh application status
-                    application = self.applications[process.application_name]
-                    application.update_status()
-                    # publish process event, status and application status
-                    publisher = self.supvisors.zmq.publisher
-                    publisher.send_process_event(address_name, event)
-                    publisher.send_process_status(process.serial())
-                    publisher.send_application_status(application.serial())
+                    # publish process event
+                    self.supvisors.zmq.publisher.send_process_event(address_name, event)
                     return process
         else:
-            self.logger.error('Context.on_process_event: got process event from unexpected location={}'
-                .format(address_name))
+            self.logger.error('Context.update_process: got process event from unexpected location={}'
+                              .format(address_name))
+
+    def publish_process_updates(self, processes: Sequence[ProcessStatus]) -> None:
+        """ Refresh the status of the applications including the processes updated, and publish the status
+        of these processes and applications.
+        Whatever the number of events received for them, every process and application is published only once.
+
+        :param processes: the processes updated, possibly including duplicates
+        :return: None
+        """
+        publisher = self.supvisors.zmq.publisher
+        # use ordered dictionaries to remove duplicates while keeping the order
+        processes = list(OrderedDict.fromkeys(processes))
+        for process in processes:
+            publisher.send_process_status(process.serial())
+        application_names = OrderedDict.fromkeys(process.application_name for process in processes)
+        for application_name in application_names:
+            application = self.applications[application_name]
+            application.update_status()
+            publisher.send_application_status(application.serial())
 
     def on_timer_event(self):
         """ Check that all Supvisors instances are still publishing.
         Supvisors considers that there a Supvisors instance is not active if no tick received in last 10s. """
-        for status in self.addresses.values():
-            if status.state == AddressStates.RUNNING and (time() - status.local_time) > 10:
+        for address_name in self.running_addresses():
+            status = self.addresses[address_name]
+            if (time() - status.local_time) > 10:
                 self.invalid(status)
                 # publish AddressStatus event
                 self.supvisors.zmq.publisher.send_address_status(status.serial())
 
+    def on_heartbeat_event(self, address_name: str, when: float) -> None:
+        """ Method called upon reception of a heartbeat from the remote Supvisors instance.
+        The heartbeat feeds the failure detector of the node.
+
+        :param address_name: the node that sent the heartbeat
+        :param when: the monotonic time when the heartbeat has been received by the main loop
+        :return: None
+        """
+        detector = self.detectors.get(address_name)
+        if detector and self.addresses[address_name].state == AddressStates.RUNNING:
+            detector.heartbeat(when)
+
+    def on_heartbeat_timer(self) -> List[str]:
+        """ Declare inactive the Supvisors instances whose suspicion level is above the phi_threshold option.
+        The local instance is not considered.
+
+        :return: the nodes invalidated
+        """
+        invalidated = []
+        threshold = self.options.phi_threshold
+        if threshold and self.detectors:
+            now = monotonic()
+            for address_name in self.running_addresses():
+                if address_name != self.address_mapper.local_address:
+                    status = self.addresses[address_name]
+                    phi = self.detectors[address_name].phi(now)
+                    if phi > threshold:
+                        self.logger.warn('Context.on_heartbeat_timer: address {} suspected (phi={:.1f})'
+                                         .format(address_name, phi))
+                        self.invalid(status)
+                        # publish AddressStatus event
+                        self.supvisors.zmq.publisher.send_address_status(status.serial())
+                        invalidated.append(address_name)
+        return invalidated
+
     def handle_isolation(self) -> Sequence[str]:
         """ Move ISOLATING addresses to ISOLATED and publish related events. """
         addresses = self.isolating_addresses()
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+from collections import deque
+from math import erfc, log10, sqrt
+from typing import Deque, Optional
+
+
+class PhiAccrualDetector(object):
+    """ Adaptive failure detector based on the intervals between the heartbeats received from a node.
+
+    Instead of a boolean status, the detector provides a suspicion level phi, that increases continuously
+    with the time elapsed since the last heartbeat.
+    The intervals are assumed to follow a normal distribution whose mean and standard deviation are estimated
+    from the last intervals observed. phi is -log10 of the probability that the next heartbeat arrives
+    later than now, so a threshold of 8 corresponds to a probability of error of 10^-8.
+
+    Attributes are:
+
+        - period: the expected time in seconds between two heartbeats,
+        - intervals: the last intervals observed between two heartbeats,
+        - last_arrival: the time of the last heartbeat received (None if no heartbeat received).
+    """
+
+    # number of intervals kept for the estimation
+    WINDOW_SIZE = 100
+
+    # minimal standard deviation, as a ratio of the heartbeat period, so that a regular node is not suspected
+    # because of a small jitter
+    MIN_STD_DEVIATION_RATIO = 0.25
+
+    # greatest phi returned, corresponding to the precision of the floats
+    MAX_PHI = 300.0
+
+    def __init__(self, period: float) -> None:
+        """ Initialization of the attributes.
+
+        :param period: the expected time in seconds between two heartbeats
+        """
+        self.period = period
+        self.intervals: Deque[float] = deque(maxlen=self.WINDOW_SIZE)
+        self.last_arrival: Optional[float] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """ Forget the history of the heartbeats.
+        The estimation restarts from the expected heartbeat period.
+
+        :return: None
+        """
+        self.intervals.clear()
+        self.intervals.append(self.period)
+        self.last_arrival = None
+
+    def heartbeat(self, now: float) -> None:
+        """ Store the reception of a heartbeat.
+
+        :param now: the monotonic time of the reception
+        :return: None
+        """
+        if self.last_arrival is not None:
+            self.intervals.append(now - self.last_arrival)
+        self.last_arrival = now
+
+    def phi(self, now: float) -> float:
+        """ Get the suspicion level of the node.
+
+        :param now: the current monotonic time
+        :return: the suspicion level, 0 if no heartbeat received yet
+        """
+        if self.last_arrival is None:
+            return 0.0
+        nb_intervals = len(self.intervals)
+        mean = sum(self.intervals) / nb_intervals
+        variance = sum((interval - mean) ** 2 for interval in self.intervals) / nb_intervals
+        std_deviation = max(sqrt(variance), self.period * self.MIN_STD_DEVIATION_RATIO)
+        # probability that the heartbeat arrives later than now
+        probability = 0.5 * erfc((now - self.last_arrival - mean) / (std_deviation * sqrt(2)))
+        if probability <= 0.0:
+            return self.MAX_PHI
+        return min(-log10(probability), self.MAX_PHI)
@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import os
+
+from queue import Empty, Queue
+from threading import Lock
+from typing import Any, Callable
+
+from supervisor.loggers import Logger
+from supervisor.medusa.asyncore_25 import file_dispatcher
+
+
+class SupvisorsEventQueue(file_dispatcher):
+    """ In-process handoff of the events from the Supvisors thread to the Supervisor thread.
+
+    The events are stored in a thread-safe queue and a byte is written into a pipe to wake up the Supervisor thread.
+    The read end of the pipe is registered in the asyncore socket map used by the select loop of supervisord,
+    so that the events are unstacked in the Supervisor thread, without any XML-RPC or JSON encoding.
+
+    Attributes are:
+
+        - callback: the function called in the Supervisor thread for each event unstacked,
+        - logger: a reference to the Supvisors logger (only used in the Supervisor thread),
+        - queue: the thread-safe queue holding the events,
+        - wakeup_fd: the write end of the pipe,
+        - closed: a status telling if the queue has been closed.
+
+    The closure is serialized with the pushes, so that the pipe is never written once closed.
+    """
+
+    # size of the chunk read from the pipe
+    READ_SIZE = 4096
+
+    def __init__(self, callback: Callable[[str, Any], None], logger: Logger) -> None:
+        """ Initialization of the attributes.
+
+        :param callback: the function to call for each event in the Supervisor thread
+        :param logger: the Supvisors logger
+        """
+        read_fd, self.wakeup_fd = os.pipe()
+        # the Supvisors thread must never block on the pipe
+        os.set_blocking(self.wakeup_fd, False)
+        self.callback = callback
+        self.logger = logger
+        self.queue = Queue()
+        self.closed = False
+        self._lock = Lock()
+        # the read end is set non-blocking and added to the asyncore socket map
+        file_dispatcher.__init__(self, read_fd)
+
+    def push(self, event_type: str, event_data: Any) -> bool:
+        """ Store the event and wake up the Supervisor thread.
+        This method is called from the Supvisors thread.
+
+        :param event_type: the type of the event, in RemoteCommEvents
+        :param event_data: the event payload, as a Python object
+        :return: True if the event has been queued
+        """
+        with self._lock:
+            if self.closed:
+                return False
+            self.queue.put((event_type, event_data))
+            try:
+                os.write(self.wakeup_fd, b'.')
+            except OSError:
+                # BlockingIOError: the pipe is full so the Supervisor thread is already notified
+                # otherwise, the event will be unstacked with the next one
+                # in both cases, the event is queued so it must not be sent again by the caller
+                pass
+            return True
+
+    def readable(self) -> bool:
+        """ The pipe is polled for reading as long as the queue is open. """
+        return not self.closed
+
+    def writable(self) -> bool:
+        """ The read end of the pipe is never written. """
+        return False
+
+    def handle_read(self) -> None:
+        """ Unstack all the events available.
+        This method is called from the Supervisor thread. """
+        try:
+            os.read(self._fileno, self.READ_SIZE)
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                event_type, event_data = self.queue.get_nowait()
+            except Empty:
+                break
+            try:
+                self.callback(event_type, event_data)
+            except Exception as exc:
+                self.logger.error('SupvisorsEventQueue.handle_read: failed to process {} event: {}'
+                                  .format(event_type, exc))
+
+    def handle_close(self) -> None:
+        """ Nothing to do on peer closure as the pipe is owned by this instance. """
+
+    def close(self) -> None:
+        """ Remove the pipe from the asyncore socket map and close both ends. """
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                # dispatcher.close is not used as it would try to shutdown the pipe like a socket
+                self.del_channel()
+                self.socket.close()
+                os.close(self.wakeup_fd)
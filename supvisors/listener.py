@@ -20,12 +20,16 @@
 import json
 import time
 
+from threading import Timer
+from typing import Any, Dict, List, Optional
+
 from supervisor import events
 from supervisor.datatypes import boolean
-from supervisor.options import split_namespec
+from supervisor.options import make_namespec, split_namespec
 
+from supvisors.eventqueue import SupvisorsEventQueue
 from supvisors.mainloop import SupvisorsMainLoop
-from supvisors.ttypes import ProcessStates
+from supvisors.ttypes import Payload, ProcessStates
 from supvisors.utils import supvisors_shortcuts, InternalEventHeaders, RemoteCommEvents
 from supvisors.supvisorszmq import SupervisorZmq
 
@@ -39,10 +43,17 @@ class SupervisorListener(object):
         - supvisors: a reference to the Supvisors context,
         - address: the address name where this process is running,
         - main_loop: the Supvisors' event thread,
+        - event_queue: the in-process queue used by the Supvisors' event thread to hand over events,
         - publisher: the ZeroMQ socket used to publish Supervisor events
-        to all Supvisors threads.
+        to all Supvisors threads,
+        - process_events: the process events waiting for the end of the batch window,
+        - batch_timer: the timer used to wake up the Supervisor thread at the end of the batch window,
+        - process_sequences: the sequence number of the internal message that published the last event, per process.
     """
 
+    # event pushed in the event queue at the end of the batch window
+    FLUSH_PROCESS_EVENTS = u'flush'
+
     def __init__(self, supvisors):
         """ Initialization of the attributes. """
         self.supvisors = supvisors
@@ -51,16 +62,24 @@ class SupervisorListener(object):
                                    'logger', 'statistician'])
         # test if statistics collector can be created for local host
         try:
-            from supvisors.statscollector import instant_statistics
+            from supvisors.statscollector import delta_statistics, instant_statistics
             self.collector = instant_statistics
+            self.delta_collector = delta_statistics
         except ImportError:
             self.logger.warn('SupervisorListener.__init__: psutil not installed')
             self.logger.warn('SupervisorListener.__init__: this Supvisors will not publish statistics')
             self.collector = None
+            self.delta_collector = None
         # other attributes
         self.address = self.supvisors.address_mapper.local_address
         self.publisher = None
         self.main_loop = None
+        self.event_queue = None
+        self.process_events: List[Payload] = []
+        self.batch_timer: Optional[Timer] = None
+        self.process_sequences: Dict[str, int] = {}
+        self.stats_keyframe = None
+        self.stats_ticks = 0
         # subscribe to internal events
         events.subscribe(events.SupervisorRunningEvent, self.on_running)
         events.subscribe(events.SupervisorStoppingEvent, self.on_stopping)
@@ -80,9 +99,15 @@ class SupervisorListener(object):
         self.supvisors.zmq = SupervisorZmq(self.supvisors)
         # keep a reference to the internal events publisher
         self.publisher = self.supvisors.zmq.internal_publisher
+        # create the in-process queue used to receive the events from the main loop
+        # the main loop falls back to RemoteCommunicationEvent if it is not available
+        try:
+            self.event_queue = SupvisorsEventQueue(self.on_queued_event, self.logger)
+        except OSError as exc:
+            self.logger.warn('SupervisorListener.on_running: cannot create event queue: {}'.format(exc))
         # start the main loop
         # env is needed to create XML-RPC proxy
-        self.main_loop = SupvisorsMainLoop(self.supvisors)
+        self.main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         self.main_loop.start()
 
     def on_stopping(self, _):
@@ -92,10 +117,15 @@ class SupervisorListener(object):
         # force Supervisor to close HTTP servers
         # this will prevent any pending XML-RPC request to block the main loop
         self.info_source.close_httpservers()
+        # publish the process events pending
+        self.flush_process_events()
         # stop the main loop
         self.logger.info('SupervisorListener.on_stopping: request to stop main loop')
         self.main_loop.stop()
         self.logger.info('SupervisorListener.on_stopping: end of main loop')
+        # close the event queue
+        if self.event_queue:
+            self.event_queue.close()
         # close zmq sockets
         self.supvisors.zmq.close()
         # unsubscribe from events
@@ -120,7 +150,46 @@ class SupervisorListener(object):
                    'expected': event.expected,
                    'spawnerr': event.process.spawnerr}
         self.logger.debug('SupervisorListener.on_process: payload={}'.format(payload))
-        self.publisher.send_process_event(payload)
+        # the event queue is needed to wake up this thread at the end of the batch window
+        batch_window = self.supvisors.options.process_batch_window
+        if batch_window and self.event_queue:
+            self.process_events.append(payload)
+            if not self.batch_timer:
+                self.batch_timer = Timer(batch_window / 1000.0, self.event_queue.push,
+                                         (self.FLUSH_PROCESS_EVENTS, None))
+                self.batch_timer.daemon = True
+                self.batch_timer.start()
+        else:
+            self.publisher.send_process_event(payload)
+            self.stamp_process_events([payload])
+
+    def flush_process_events(self) -> None:
+        """ Publish the process events collected during the batch window.
+        A single event is published as is. Several events are published in a single message.
+
+        :return: None
+        """
+        if self.batch_timer:
+            self.batch_timer.cancel()
+            self.batch_timer = None
+        if self.process_events:
+            if len(self.process_events) == 1:
+                self.publisher.send_process_event(self.process_events[0])
+            else:
+                self.publisher.send_process_events(self.process_events)
+            self.stamp_process_events(self.process_events)
+            self.process_events = []
+
+    def stamp_process_events(self, payloads: List[Payload]) -> None:
+        """ Keep the sequence number of the internal message that has just published the process events.
+        This is used to resynchronize only the processes that have changed when a Supvisors instance
+        has lost some messages.
+
+        :param payloads: the process events published
+        :return: None
+        """
+        for payload in payloads:
+            self.process_sequences[make_namespec(payload['group'], payload['name'])] = self.publisher.sequence
 
     def on_tick(self, event: events.TickEvent) -> None:
         """ Called when a TickEvent is notified.
@@ -132,13 +201,35 @@ class SupervisorListener(object):
         # get and publish statistics at tick time (optional)
         if self.collector:
             status = self.supvisors.context.addresses[self.address]
-            stats = self.collector(status.pid_processes())
-            self.publisher.send_statistics(stats)
+            self.publish_statistics(self.collector(status.pid_processes()))
         # periodic task
         addresses = self.fsm.on_timer_event()
         # pushes isolated addresses to main loop
         self.supvisors.zmq.pusher.send_isolate_addresses(addresses)
 
+    def on_heartbeat(self) -> None:
+        """ Called periodically when the option heartbeat_period is set.
+        The heartbeat is published to all Supvisors instances.
+        Then the Supvisors instances suspected to be inactive are invalidated. """
+        self.publisher.send_heartbeat()
+        addresses = self.fsm.on_heartbeat_timer()
+        if addresses:
+            # pushes isolated addresses to main loop
+            self.supvisors.zmq.pusher.send_isolate_addresses(addresses)
+
+    def publish_statistics(self, stats) -> None:
+        """ Publish the statistics snapshot.
+        When the option stats_keyframe is set, the full snapshot is published every stats_keyframe ticks
+        and only the changes since this keyframe are published in between. """
+        keyframe_period = self.supvisors.options.stats_keyframe
+        if keyframe_period and self.stats_keyframe and self.stats_ticks < keyframe_period:
+            self.stats_ticks += 1
+            self.publisher.send_statistics_delta(self.delta_collector(self.stats_keyframe, stats))
+        else:
+            self.stats_keyframe = stats
+            self.stats_ticks = 1
+            self.publisher.send_statistics(stats)
+
     def on_remote_event(self, event: events.RemoteCommunicationEvent) -> None:
         """ Called when a RemoteCommunicationEvent is notified.
         This is used to sequence the events received from the Supvisors thread
@@ -151,32 +242,94 @@ class SupervisorListener(object):
             self.unstack_event(event.data)
         elif event.type == RemoteCommEvents.SUPVISORS_INFO:
             self.unstack_info(event.data)
+        elif event.type == RemoteCommEvents.SUPVISORS_RESYNC:
+            self.process_resync(*json.loads(event.data))
+        elif event.type == RemoteCommEvents.SUPVISORS_SNAPSHOT:
+            self.send_snapshot(json.loads(event.data))
+
+    def on_queued_event(self, event_type: str, event_data: Any) -> None:
+        """ Called when an event is handed over by the main loop through the in-process event queue.
+        This is the counterpart of on_remote_event, without the decoding step. """
+        if event_type == RemoteCommEvents.SUPVISORS_AUTH:
+            self.logger.trace('SupervisorListener.on_queued_event: got authorization event: {}'.format(event_data))
+            self.fsm.on_authorization(*event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_EVENT:
+            self.process_event(*event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_INFO:
+            self.process_info(*event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_RESYNC:
+            self.process_resync(*event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_SNAPSHOT:
+            self.send_snapshot(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_HEARTBEAT:
+            self.on_heartbeat()
+        elif event_type == self.FLUSH_PROCESS_EVENTS:
+            self.flush_process_events()
 
     def unstack_event(self, message: str):
         """ Unstack and process one event from the event queue. """
-        event_type, event_address, event_data = json.loads(message)
+        self.process_event(*json.loads(message))
+
+    def process_event(self, event_type: int, event_address: str, event_data: Any) -> None:
+        """ Process one internal event published by a Supvisors instance. """
         if event_type == InternalEventHeaders.TICK:
-            self.logger.trace('SupervisorListener.unstack_event: got tick event from {}: {}'
+            self.logger.trace('SupervisorListener.process_event: got tick event from {}: {}'
                               .format(event_address, event_data))
             self.fsm.on_tick_event(event_address, event_data)
         elif event_type == InternalEventHeaders.PROCESS:
-            self.logger.trace('SupervisorListener.unstack_event: got process event from {}: {}'
+            self.logger.trace('SupervisorListener.process_event: got process event from {}: {}'
                               .format(event_address, event_data))
             self.fsm.on_process_event(event_address, event_data)
+        elif event_type == InternalEventHeaders.PROCESS_BATCH:
+            self.logger.trace('SupervisorListener.process_event: got {} process events from {}'
+                              .format(len(event_data), event_address))
+            self.fsm.on_process_events(event_address, event_data)
+        elif event_type == InternalEventHeaders.HEARTBEAT:
+            # the payload is the arrival time set by the main loop
+            self.fsm.on_heartbeat_event(event_address, event_data)
         elif event_type == InternalEventHeaders.STATISTICS:
             # this Supvisors could handle statistics
             # even if psutil is not installed
-            self.logger.trace('SupervisorListener.unstack_event: got statistics event from {}: {}'
+            self.logger.trace('SupervisorListener.process_event: got statistics event from {}: {}'
                               .format(event_address, event_data))
             self.statistician.push_statistics(event_address, event_data)
+        elif event_type == InternalEventHeaders.STATISTICS_DELTA:
+            self.logger.trace('SupervisorListener.process_event: got statistics delta event from {}: {}'
+                              .format(event_address, event_data))
+            if not self.statistician.push_delta_statistics(event_address, event_data):
+                self.logger.debug('SupervisorListener.process_event: statistics delta from {} ignored'
+                                  ' until the next keyframe'.format(event_address))
 
     def unstack_info(self, message: str):
         """ Unstack the process info received. """
         # unstack the queue for process info
-        address_name, info = json.loads(message)
-        self.logger.trace('SupervisorListener.unstack_info: got process info event from {}'.format(address_name))
+        self.process_info(*json.loads(message))
+
+    def process_info(self, address_name: str, info) -> None:
+        """ Process the information about all processes of a Supvisors instance. """
+        self.logger.trace('SupervisorListener.process_info: got process info event from {}'.format(address_name))
         self.fsm.on_process_info(address_name, info)
 
+    def process_resync(self, address_name: str, info) -> None:
+        """ Process the information about the processes of a Supvisors instance that have changed
+        while internal messages were lost. """
+        self.logger.debug('SupervisorListener.process_resync: got {} process info from {}'
+                          .format(len(info), address_name))
+        self.fsm.on_process_resync(address_name, info)
+
+    def send_snapshot(self, identity: str) -> None:
+        """ Build the snapshot of the Supvisors state and hand it over to the main loop to be sent to the requester.
+        As it is built in the Supervisor thread, the snapshot is consistent with the sequence number
+        of the last event published. """
+        context = self.supvisors.context
+        snapshot = {'sequence': self.supvisors.zmq.publisher.sequence,
+                    'supvisors': self.fsm.serial(),
+                    'addresses': [status.serial() for status in context.addresses.values()],
+                    'applications': [application.serial() for application in context.applications.values()],
+                    'processes': [process.serial() for process in context.processes.values()]}
+        self.logger.debug('SupervisorListener.send_snapshot: sequence={}'.format(snapshot['sequence']))
+        self.supvisors.zmq.pusher.send_snapshot(identity, snapshot)
+
     def authorization(self, data):
         """ Extract authorization and address from data and process event. """
         self.logger.trace('SupervisorListener.authorization: got authorization event: {}'.format(data))
@@ -203,4 +356,6 @@ class SupervisorListener(object):
                    'pid': 0,
                    'expected': False}
         self.logger.debug('SupervisorListener.force_process_state: payload={}'.format(payload))
+        # the pending events of the process must be published before
+        self.flush_process_events()
         self.publisher.send_process_event(payload)
@@ -18,16 +18,125 @@
 # ======================================================================
 
 import json
+import zlib
 import zmq
 
-from threading import Event, Thread
-from typing import Any
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from math import ceil
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 from sys import stderr
 
-from supvisors.rpcrequests import getRPCInterface
+from supervisor.compat import xmlrpclib
+from supervisor.xmlrpc import Faults
+
+from supvisors.eventqueue import SupvisorsEventQueue
+from supvisors.rpcrequests import getRPCInterface, RPCProxyPool
 from supvisors.supvisorszmq import SupvisorsZmq
 from supvisors.ttypes import AddressStates
-from supvisors.utils import DeferredRequestHeaders, RemoteCommEvents
+from supvisors.utils import DeferredRequestHeaders, InternalEventHeaders, RemoteCommEvents
+
+
+class DeferredRequestExecutor(object):
+    """ Execution of the deferred XML-RPC requests on a bounded pool of worker threads.
+
+    The requests to different nodes are executed concurrently, so that an unreachable node does not delay
+    the requests to the other nodes, nor the forwarding of the internal events by the main loop.
+    The requests to the same node are executed one after the other, in the order of their submission.
+
+    Attributes are:
+
+        - executor: the pool of worker threads,
+        - pending: the requests waiting for the completion of the running request, per node,
+        - futures: the requests submitted to the pool and not completed yet.
+    """
+
+    # default maximum number of worker threads
+    MAX_WORKERS = 8
+
+    # types for annotations
+    Job = Callable[[], None]
+
+    def __init__(self, max_workers: int = MAX_WORKERS) -> None:
+        """ Initialization of the attributes.
+
+        :param max_workers: the maximum number of worker threads
+        """
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='supvisors_rpc')
+        # a node is in pending as long as one of its requests is running
+        self.pending: Dict[str, Deque[DeferredRequestExecutor.Job]] = {}
+        self.futures: Set[Future] = set()
+        self._lock = Lock()
+
+    def submit(self, address_name: str, func: Callable, *args) -> None:
+        """ Schedule the call of func with args.
+        The call is queued if a request to the same node is already running.
+
+        :param address_name: the node targeted by the request
+        :param func: the function performing the request
+        :param args: the arguments of the function
+        :return: None
+        """
+        job = partial(func, *args)
+        with self._lock:
+            jobs = self.pending.get(address_name)
+            if jobs is not None:
+                jobs.append(job)
+                return
+            self.pending[address_name] = deque()
+        future = self.executor.submit(self.run_jobs, address_name, job)
+        with self._lock:
+            self.futures.add(future)
+        # the callback is called immediately if the future is already done
+        future.add_done_callback(self.discard_future)
+
+    def discard_future(self, future: Future) -> None:
+        """ Forget the future once completed or cancelled.
+
+        :param future: the future of a request submitted to the pool
+        :return: None
+        """
+        with self._lock:
+            self.futures.discard(future)
+
+    def run_jobs(self, address_name: str, job: Job) -> None:
+        """ Execute the job and then the jobs queued for the same node, in the worker thread.
+
+        :param address_name: the node targeted by the jobs
+        :param job: the first job to execute
+        :return: None
+        """
+        while job:
+            try:
+                job()
+            except:
+                print('[ERROR] failed to execute request to {}'.format(address_name), file=stderr)
+            with self._lock:
+                jobs = self.pending[address_name]
+                if jobs:
+                    job = jobs.popleft()
+                else:
+                    del self.pending[address_name]
+                    job = None
+
+    def shutdown(self) -> None:
+        """ Cancel the pending requests and release the worker threads without waiting for the running requests.
+        The running requests cannot last longer than the request timeout.
+
+        :return: None
+        """
+        with self._lock:
+            for jobs in self.pending.values():
+                jobs.clear()
+            futures = list(self.futures)
+        # cancel is called outside the lock as it calls discard_future
+        # the running requests cannot be cancelled
+        for future in futures:
+            future.cancel()
+        self.executor.shutdown(wait=False)
 
 
 class SupvisorsMainLoop(Thread):
@@ -38,10 +147,36 @@ class SupvisorsMainLoop(Thread):
         - supvisors: a reference to the Supvisors context,
         - stop_event: the event used to stop the thread,
         - env: the environment variables linked to Supervisor security access,
-        - proxy: the proxy to the internal RPC interface.
+        - proxy: the proxy to the internal RPC interface,
+        - proxies: the pool of proxies to the remote RPC interfaces,
+        - executor: the executor of the deferred XML-RPC requests,
+        - batches: the start and stop requests collected during the batch window, per node,
+        - batch_deadline: the time when the batches have to be sent (None if there is no batch),
+        - legacy_addresses: the nodes whose Supvisors instance does not support get_node_handshake,
+        - event_queue: the in-process queue used to hand the events over to the Supervisor thread,
+        - heartbeat_period: the time in seconds between two heartbeats (0 if disabled),
+        - heartbeat_deadline: the time when the next heartbeat has to be triggered (None if disabled).
+
+    The start and stop requests received within BATCH_WINDOW seconds are sent to their node in a single multicall.
+    The heartbeats are triggered by this thread, as the Supervisor thread is only woken up every second,
+    but they are published by the Supervisor thread, which owns the internal publisher.
+    The heartbeats received are stamped by this thread, so that the failure detectors are not impacted
+    by the delays in the Supervisor thread.
+    The heartbeats require the in-process event queue.
     """
 
-    def __init__(self, supvisors: Any) -> None:
+    # time in seconds during which the start and stop requests are collected
+    BATCH_WINDOW = 0.05
+
+    # requests that can be batched
+    BATCH_REQUESTS = [DeferredRequestHeaders.START_PROCESS, DeferredRequestHeaders.STOP_PROCESS]
+
+    # types for annotations
+    DeferredRequest = Tuple[int, Tuple]
+    RequestBatches = Dict[str, List[DeferredRequest]]
+    Handshake = Tuple[str, bool, Optional[List[Dict[str, Any]]]]
+
+    def __init__(self, supvisors: Any, event_queue: Optional[SupvisorsEventQueue] = None) -> None:
         """ Initialization of the attributes. """
         # thread attributes
         Thread.__init__(self)
@@ -51,7 +186,19 @@ class SupvisorsMainLoop(Thread):
         self.supvisors = supvisors
         self.env = supvisors.info_source.get_env()
         # create a XML-RPC client to the local Supervisor instance
+        # it is used as a fallback when the event queue is not available
         self.proxy = getRPCInterface('localhost', self.env)
+        # the connections to the remote Supervisor instances are kept alive between requests
+        self.proxies = RPCProxyPool(self.env)
+        # the XML-RPC requests are not executed in this thread, so that they never delay the event forwarding
+        self.executor = DeferredRequestExecutor(supvisors.options.request_fanout)
+        self._proxy_lock = Lock()
+        self.batches: SupvisorsMainLoop.RequestBatches = {}
+        self.batch_deadline: Optional[float] = None
+        self.legacy_addresses: Set[str] = set()
+        self.event_queue = event_queue
+        self.heartbeat_period = supvisors.options.heartbeat_period / 1000.0 if event_queue else 0
+        self.heartbeat_deadline: Optional[float] = None
 
     def stopping(self):
         """ Access to the loop attribute (used to drive tests on run method). """
@@ -75,16 +222,28 @@ class SupvisorsMainLoop(Thread):
         # register sockets
         poller.register(sockets.internal_subscriber.socket, zmq.POLLIN)
         poller.register(sockets.puller.socket, zmq.POLLIN)
+        if sockets.snapshot_server:
+            poller.register(sockets.snapshot_server.socket, zmq.POLLIN)
+        if self.heartbeat_period:
+            self.heartbeat_deadline = monotonic() + self.heartbeat_period
         # poll events forever
         while not self.stopping():
-            socks = dict(poller.poll(500))
+            socks = dict(poller.poll(self.get_poll_timeout()))
             # test stop condition again: if Supervisor is stopping,
             # any XML-RPC call would block this thread, and the other
             # because of the join
             if not self.stopping():
                 self.check_requests(sockets, socks)
                 self.check_events(sockets.internal_subscriber, socks)
+                self.check_snapshots(sockets.snapshot_server, socks)
+                self.check_batches()
+                self.check_heartbeat()
+                self.proxies.evict_idle()
         # close resources gracefully
+        self.executor.shutdown()
+        self.proxies.close()
+        if sockets.snapshot_server:
+            poller.unregister(sockets.snapshot_server.socket)
         poller.unregister(sockets.puller.socket)
         poller.unregister(sockets.internal_subscriber.socket)
         sockets.close()
@@ -97,10 +256,31 @@ class SupvisorsMainLoop(Thread):
             except:
                 print('[ERROR] failed to get data from subscriber', file=stderr)
             else:
+                # the arrival time of the heartbeat replaces its empty payload
+                if message[0] == InternalEventHeaders.HEARTBEAT:
+                    message = message[0], message[1], monotonic()
                 # The events received are not processed directly in this thread because it would conflict
                 # with the processing in the Supervisor thread, as they use the same data.
-                # That's why a RemoteCommunicationEvent is used to push the event in the Supervisor thread.
-                self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_EVENT, json.dumps(message))
+                # That's why the event is handed over to the Supervisor thread.
+                self.post_event(RemoteCommEvents.SUPVISORS_EVENT, message)
+                # messages have been lost before this one: resynchronize the processes of the node
+                if subscriber.gap:
+                    address_name, sequence = subscriber.gap
+                    print('[WARN] lost messages from {} after sequence {}'.format(address_name, sequence),
+                          file=stderr)
+                    self.executor.submit(address_name, self.resync_address, address_name, sequence)
+
+    def check_snapshots(self, snapshot_server, socks):
+        """ Forward the snapshot requests of the Supvisors clients to main thread.
+        The snapshot is built in the Supervisor thread, so that it is consistent with the sequence number
+        of the events published. """
+        if snapshot_server and snapshot_server.socket in socks and socks[snapshot_server.socket] == zmq.POLLIN:
+            try:
+                identity = snapshot_server.receive()
+            except:
+                print('[ERROR] failed to get data from snapshot server', file=stderr)
+            else:
+                self.post_event(RemoteCommEvents.SUPVISORS_SNAPSHOT, identity.hex())
 
     def check_requests(self, zmq_sockets, socks):
         """ Defer internal requests. """
@@ -113,12 +293,86 @@ class SupvisorsMainLoop(Thread):
                 if header == DeferredRequestHeaders.ISOLATE_ADDRESSES:
                     # isolation request: disconnect the address from subscriber
                     zmq_sockets.internal_subscriber.disconnect(body)
+                    # no more XML-RPC expected towards the isolated nodes
+                    self.proxies.close(body)
+                elif header == DeferredRequestHeaders.SEND_SNAPSHOT:
+                    # snapshot built in the Supervisor thread: send it to the requester
+                    identity, snapshot = body
+                    zmq_sockets.snapshot_server.send(bytes.fromhex(identity), snapshot)
+                elif header in self.BATCH_REQUESTS:
+                    # start and stop requests are collected and sent later
+                    self.batch_request(header, body)
                 else:
-                    # XML-RPC request
-                    self.send_request(header, body)
+                    # XML-RPC request, executed in a worker thread
+                    # the first element of the body is always the targeted node
+                    # the batch of the node is sent before so that the requests keep their order
+                    self.send_batch(body[0])
+                    self.executor.submit(body[0], self.send_request, header, body)
+
+    def get_poll_timeout(self) -> int:
+        """ Get the poll timeout in milliseconds, taking into account the deadlines of the batches
+        and of the heartbeat.
+
+        :return: the poll timeout
+        """
+        deadlines = [deadline for deadline in (self.batch_deadline, self.heartbeat_deadline) if deadline is not None]
+        if not deadlines:
+            return 500
+        return min(500, max(0, ceil((min(deadlines) - monotonic()) * 1000)))
+
+    def check_heartbeat(self) -> None:
+        """ Ask the Supervisor thread to publish a heartbeat if the heartbeat period is over.
+
+        :return: None
+        """
+        if self.heartbeat_deadline is not None:
+            now = monotonic()
+            if now >= self.heartbeat_deadline:
+                self.event_queue.push(RemoteCommEvents.SUPVISORS_HEARTBEAT, None)
+                # keep the rhythm unless the loop has been delayed by more than a period
+                self.heartbeat_deadline += self.heartbeat_period
+                if self.heartbeat_deadline <= now:
+                    self.heartbeat_deadline = now + self.heartbeat_period
+
+    def batch_request(self, header: int, body: Tuple) -> None:
+        """ Add the request to the batch of its node.
+        The batch window starts with the first request collected.
+
+        :param header: the request type, in DeferredRequestHeaders
+        :param body: the request parameters, starting with the targeted node
+        :return: None
+        """
+        if self.batch_deadline is None:
+            self.batch_deadline = monotonic() + self.BATCH_WINDOW
+        self.batches.setdefault(body[0], []).append((header, body))
+
+    def check_batches(self) -> None:
+        """ Send all the batches if the batch window is over.
+
+        :return: None
+        """
+        if self.batch_deadline is not None and monotonic() >= self.batch_deadline:
+            for address_name in list(self.batches.keys()):
+                self.send_batch(address_name)
+            self.batch_deadline = None
+
+    def send_batch(self, address_name: str) -> None:
+        """ Hand the batch of the node over to the executor.
+        A single request is sent as is, several requests are sent in a multicall.
+
+        :param address_name: the node targeted by the batch
+        :return: None
+        """
+        requests = self.batches.pop(address_name, None)
+        if requests:
+            if len(requests) == 1:
+                self.executor.submit(address_name, self.send_request, *requests[0])
+            else:
+                self.executor.submit(address_name, self.multicall, address_name, requests)
 
     def send_request(self, header, body):
-        """ Perform the XML-RPC according to the header. """
+        """ Perform the XML-RPC according to the header.
+        This method is called from a worker thread of the executor. """
         if header == DeferredRequestHeaders.CHECK_ADDRESS:
             address_name, = body
             self.check_address(address_name)
@@ -138,31 +392,68 @@ class SupvisorsMainLoop(Thread):
     def check_address(self, address_name):
         """ Check isolation and get all process info asynchronously. """
         try:
-            remote_proxy = getRPCInterface(address_name, self.env)
-            # get remote perception of master node
-            master_address = remote_proxy.supvisors.get_master_address()
-            # check authorization
-            status = remote_proxy.supvisors.get_address_info(address_name)
-            authorized = status['statecode'] not in [AddressStates.ISOLATING, AddressStates.ISOLATED]
-            # get process info if authorized
+            with self.proxies.proxy(address_name) as remote_proxy:
+                master_address, authorized, all_info = self.get_handshake(remote_proxy, address_name)
+            # post process info internally if authorized
             if authorized:
-                # get information about all processes handled by Supervisor
-                all_info = remote_proxy.supvisors.get_all_local_process_info()
-                # post internally
-                self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_INFO,
-                                            json.dumps((address_name, all_info)))
+                self.post_event(RemoteCommEvents.SUPVISORS_INFO, (address_name, all_info))
             # inform local Supvisors that authorization is available
-            self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_AUTH,
-                                        'address_name:{} authorized:{} master_address:{}'
-                                        .format(address_name, authorized, master_address))
+            self.post_event(RemoteCommEvents.SUPVISORS_AUTH, (address_name, authorized, master_address))
         except:
             print('[ERROR] failed to check address {}'.format(address_name), file=stderr)
 
+    def resync_address(self, address_name: str, sequence: int) -> None:
+        """ Get the information about the processes of the node that have changed since the sequence number
+        and post it internally.
+        This method is called from a worker thread of the executor.
+
+        :param address_name: the node whose internal messages have been lost
+        :param sequence: the sequence number of the last internal message received from the node
+        :return: None
+        """
+        try:
+            with self.proxies.proxy(address_name) as remote_proxy:
+                if address_name in self.legacy_addresses:
+                    all_info = remote_proxy.supvisors.get_all_local_process_info()
+                else:
+                    all_info = remote_proxy.supvisors.get_local_process_info_since(sequence)
+            self.post_event(RemoteCommEvents.SUPVISORS_RESYNC, (address_name, all_info))
+        except:
+            print('[ERROR] failed to resynchronize address {}'.format(address_name), file=stderr)
+
+    def get_handshake(self, remote_proxy, address_name: str) -> Handshake:
+        """ Get the master address, the authorization and the process info from the remote Supvisors instance.
+        The composite XML-RPC get_node_handshake is used, unless the remote Supvisors instance does not support it.
+
+        :param remote_proxy: the proxy to the remote Supvisors instance
+        :param address_name: the node of the remote Supvisors instance
+        :return: the master address, the authorization and the process info
+        """
+        if address_name not in self.legacy_addresses:
+            try:
+                handshake = remote_proxy.supvisors.get_node_handshake(address_name, True)
+            except xmlrpclib.Fault as exc:
+                if exc.faultCode != Faults.UNKNOWN_METHOD:
+                    raise
+                # older Supvisors version: use the separate XML-RPCs from now on
+                self.legacy_addresses.add(address_name)
+            else:
+                all_info = json.loads(zlib.decompress(handshake['process_info'].data))
+                return handshake['master_address'], handshake['authorized'], all_info
+        # get remote perception of master node
+        master_address = remote_proxy.supvisors.get_master_address()
+        # check authorization
+        status = remote_proxy.supvisors.get_address_info(address_name)
+        authorized = status['statecode'] not in [AddressStates.ISOLATING, AddressStates.ISOLATED]
+        # get information about all processes handled by Supervisor if authorized
+        all_info = remote_proxy.supvisors.get_all_local_process_info() if authorized else None
+        return master_address, authorized, all_info
+
     def start_process(self, address_name, namespec, extra_args):
         """ Start process asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supvisors.start_args(namespec, extra_args, False)
+            with self.proxies.proxy(address_name) as proxy:
+                proxy.supvisors.start_args(namespec, extra_args, False)
         except:
             print('[ERROR] failed to start process {} on {} with extra_args="{}"'
                   .format(namespec, address_name, extra_args), file=stderr)
@@ -170,32 +461,74 @@ class SupvisorsMainLoop(Thread):
     def stop_process(self, address_name, namespec):
         """ Stop process asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.stopProcess(namespec, False)
+            with self.proxies.proxy(address_name) as proxy:
+                proxy.supervisor.stopProcess(namespec, False)
         except:
             print('[ERROR] failed to stop process {} on {}'.format(namespec, address_name),
                   file=stderr)
 
+    def multicall(self, address_name: str, requests: List[DeferredRequest]) -> None:
+        """ Start and stop processes asynchronously, using a single XML-RPC.
+        This method is called from a worker thread of the executor.
+
+        :param address_name: the node where the processes have to be started or stopped
+        :param requests: the start and stop requests
+        :return: None
+        """
+        calls = []
+        for header, body in requests:
+            if header == DeferredRequestHeaders.START_PROCESS:
+                _, namespec, extra_args = body
+                calls.append({'methodName': 'supvisors.start_args', 'params': [namespec, extra_args, False]})
+            else:
+                _, namespec = body
+                calls.append({'methodName': 'supervisor.stopProcess', 'params': [namespec, False]})
+        try:
+            with self.proxies.proxy(address_name) as proxy:
+                results = proxy.system.multicall(calls)
+        except:
+            print('[ERROR] failed to start / stop {} processes on {}'.format(len(calls), address_name), file=stderr)
+        else:
+            for request, result in zip(calls, results):
+                if type(result) is dict and 'faultCode' in result:
+                    print('[ERROR] failed to {} {} on {}: {}'.format(request['methodName'], request['params'][0],
+                                                                     address_name, result['faultString']),
+                          file=stderr)
+
     def restart(self, address_name):
         """ Restart a Supervisor instance asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.restart()
+            with self.proxies.proxy(address_name) as proxy:
+                proxy.supervisor.restart()
         except:
             print('[ERROR] failed to restart address {}'.format(address_name), file=stderr)
 
     def shutdown(self, address_name):
         """ Stop process asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.shutdown()
+            with self.proxies.proxy(address_name) as proxy:
+                proxy.supervisor.shutdown()
         except:
             print('[ERROR] failed to shutdown address {}'.format(address_name), file=stderr)
 
+    def post_event(self, event_type: str, event_data: Any) -> None:
+        """ Hand the event over to the Supervisor thread.
+        The in-process event queue is used when available, so that the event data is passed as is.
+        Otherwise, the event data is encoded and sent through a RemoteCommunicationEvent. """
+        if self.event_queue and self.event_queue.push(event_type, event_data):
+            return
+        if event_type == RemoteCommEvents.SUPVISORS_AUTH:
+            event_data = 'address_name:{} authorized:{} master_address:{}'.format(*event_data)
+        else:
+            event_data = json.dumps(event_data)
+        self.send_remote_comm_event(event_type, event_data)
+
     def send_remote_comm_event(self, event_type, event_data):
-        """ Shortcut for the use of sendRemoteCommEvent. """
+        """ Shortcut for the use of sendRemoteCommEvent.
+        The proxy is shared by the main loop and the worker threads so its use is serialized. """
         try:
-            self.proxy.supervisor.sendRemoteCommEvent(event_type, event_data)
+            with self._proxy_lock:
+                self.proxy.supervisor.sendRemoteCommEvent(event_type, event_data)
         except:
             # expected on restart / shutdown
             print('[WARN] failed to send event to Supervisor: {}'.format(event_type), file=stderr)
@@ -27,7 +27,7 @@ from supervisor.datatypes import (Automatic, logfile_name,
                                   list_of_strings)
 from supervisor.options import ServerOptions
 
-from supvisors.ttypes import ConciliationStrategies, StartingStrategies
+from supvisors.ttypes import ConciliationStrategies, InternalCodecs, StartingStrategies
 
 
 # Options of main section
@@ -40,13 +40,21 @@ class SupvisorsOptions(object):
         - rules_file: absolute or relative path to the XML rules file,
         - internal_port: port number used to publish local events to remote Supvisors instances,
         - event_port: port number used to publish all Supvisors events,
+        - snapshot_port: port number used to provide the current Supvisors state to the clients (None to disable),
+        - internal_codec: serialization format of the messages exchanged between Supvisors instances,
+        - process_batch_window: time in milliseconds during which the local process events are grouped (0 to disable),
+        - request_fanout: maximum number of nodes to which the XML-RPC requests are sent concurrently,
         - auto_fence: when True, Supvisors won't try to reconnect to a Supvisors instance that has been inactive,
+        - heartbeat_period: time in milliseconds between two heartbeats published to the Supvisors instances (0 to disable),
+        - phi_threshold: suspicion level above which a Supvisors instance is considered inactive (0 to disable),
         - synchro_timeout: time in seconds that Supvisors waits for all expected Supvisors instances to publish,
         - force_synchro_if: subset of address_list that will force the end of syncho when all RUNNING,
+        - membership_file: absolute or relative path to the file storing the nodes RUNNING in the last working session,
         - conciliation_strategy: strategy used to solve conflicts when Supvisors has detected multiple running instances of the same program,
         - starting_strategy: strategy used to start processes on addresses,
         - stats_periods: list of periods for which the statistics will be provided in the Supvisors web page,
         - stats_histo: depth of statistics history,
+        - stats_keyframe: number of ticks between two full publications of the statistics (0 to disable the deltas),
         - logfile: absolute or relative path of the Supvisors log file,
         - logfile_maxbytes: maximum size of the Supvisors log file,
         - logfile_backups: number of Supvisors backup log files,
@@ -54,10 +62,12 @@ class SupvisorsOptions(object):
         - procnumbers: a dictionary giving the number of the program in a homogeneous group.
     """
 
-    _Options = ['address_list', 'rules_file', 'internal_port', 'event_port', 'auto_fence',
-                'synchro_timeout', 'force_synchro_if',
+    _Options = ['address_list', 'rules_file', 'internal_port', 'event_port', 'snapshot_port', 'internal_codec', 'process_batch_window',
+                'request_fanout',
+                'auto_fence', 'heartbeat_period', 'phi_threshold',
+                'synchro_timeout', 'force_synchro_if', 'membership_file',
                 'conciliation_strategy', 'starting_strategy',
-                'stats_periods', 'stats_histo', 'stats_irix_mode',
+                'stats_periods', 'stats_histo', 'stats_keyframe', 'stats_irix_mode',
                 'logfile', 'logfile_maxbytes', 'logfile_backups', 'loglevel']
 
     def __init__(self):
@@ -70,15 +80,22 @@ class SupvisorsOptions(object):
 
     def __str__(self):
         """ Contents as string. """
-        return ('address_list={} rules_file={} internal_port={} event_port={} auto_fence={} '
-                'synchro_timeout={} force_synchro_if={} conciliation_strategy={} '
-                'starting_strategy={} stats_periods={} stats_histo={} '
+        return ('address_list={} rules_file={} internal_port={} event_port={} snapshot_port={} '
+                'internal_codec={} '
+                'process_batch_window={} request_fanout={} auto_fence={} heartbeat_period={} phi_threshold={} '
+                'synchro_timeout={} force_synchro_if={} membership_file={} conciliation_strategy={} '
+                'starting_strategy={} stats_periods={} stats_histo={} stats_keyframe={} '
                 'stats_irix_mode={} logfile={} logfile_maxbytes={} '
                 'logfile_backups={} loglevel={}'.format(self.address_list, self.rules_file,
-                                                        self.internal_port, self.event_port, self.auto_fence,
+                                                        self.internal_port, self.event_port, self.snapshot_port,
+                                                        self.internal_codec, self.process_batch_window,
+                                                        self.request_fanout,
+                                                        self.auto_fence, self.heartbeat_period, self.phi_threshold,
                                                         self.synchro_timeout, self.force_synchro_if,
+                                                        self.membership_file,
                                                         self.conciliation_strategy, self.starting_strategy,
-                                                        self.stats_periods, self.stats_histo, self.stats_irix_mode,
+                                                        self.stats_periods, self.stats_histo, self.stats_keyframe,
+                                                        self.stats_irix_mode,
                                                         self.logfile, self.logfile_maxbytes, self.logfile_backups,
                                                         self.loglevel))
 
@@ -137,15 +154,27 @@ class SupvisorsServerOptions(ServerOptions):
             opt.rules_file = existing_dirpath(opt.rules_file)
         opt.internal_port = self.to_port_num(parser.getdefault('internal_port', '65001'))
         opt.event_port = self.to_port_num(parser.getdefault('event_port', '65002'))
+        opt.snapshot_port = parser.getdefault('snapshot_port', None)
+        if opt.snapshot_port:
+            opt.snapshot_port = self.to_port_num(opt.snapshot_port)
+        opt.internal_codec = self.to_internal_codec(parser.getdefault('internal_codec', 'PICKLE'))
+        opt.process_batch_window = self.to_batch_window(parser.getdefault('process_batch_window', '0'))
+        opt.request_fanout = self.to_request_fanout(parser.getdefault('request_fanout', '8'))
         opt.auto_fence = boolean(parser.getdefault('auto_fence', 'false'))
+        opt.heartbeat_period = self.to_heartbeat_period(parser.getdefault('heartbeat_period', '0'))
+        opt.phi_threshold = self.to_phi_threshold(parser.getdefault('phi_threshold', '0'))
         opt.synchro_timeout = self.to_timeout(parser.getdefault('synchro_timeout', '15'))
         opt.force_synchro_if = filter(None, list_of_strings(parser.getdefault('force_synchro_if', None)))
         opt.force_synchro_if = [node for node in opt.force_synchro_if if node in opt.address_list]
+        opt.membership_file = parser.getdefault('membership_file', None)
+        if opt.membership_file:
+            opt.membership_file = existing_dirpath(opt.membership_file)
         opt.conciliation_strategy = self.to_conciliation_strategy(parser.getdefault('conciliation_strategy', 'USER'))
         opt.starting_strategy = self.to_starting_strategy(parser.getdefault('starting_strategy', 'CONFIG'))
         # configure statistics
         opt.stats_periods = self.to_periods(list_of_strings(parser.getdefault('stats_periods', '10')))
         opt.stats_histo = self.to_histo(parser.getdefault('stats_histo', 200))
+        opt.stats_keyframe = self.to_keyframe(parser.getdefault('stats_keyframe', '0'))
         opt.stats_irix_mode = boolean(parser.getdefault('stats_irix_mode', 'false'))
         # configure logger
         opt.logfile = logfile_name(parser.getdefault('logfile', Automatic))
@@ -181,6 +210,64 @@ class SupvisorsServerOptions(ServerOptions):
             return value
         raise ValueError('invalid value for synchro_timeout: %d. expected in [15;1200] (seconds)' % value)
 
+    @staticmethod
+    def to_batch_window(value: str) -> int:
+        """ Convert a string into a batch window, in [0;1000].
+
+        :param value: the batch window as a string
+        :return: the batch window as an integer
+        """
+        value = integer(value)
+        if 0 <= value <= 1000:
+            return value
+        raise ValueError('invalid value for process_batch_window: %d. expected in [0;1000] (milliseconds)' % value)
+
+    @staticmethod
+    def to_request_fanout(value: str) -> int:
+        """ Convert a string into a request fan-out, in [1;256].
+
+        :param value: the request fan-out as a string
+        :return: the request fan-out as an integer
+        """
+        value = integer(value)
+        if 1 <= value <= 256:
+            return value
+        raise ValueError('invalid value for request_fanout: %d. expected in [1;256]' % value)
+
+    @staticmethod
+    def to_heartbeat_period(value: str) -> int:
+        """ Convert a string into a heartbeat period, in [0;1000].
+
+        :param value: the heartbeat period as a string
+        :return: the heartbeat period as an integer
+        """
+        value = integer(value)
+        if 0 <= value <= 1000:
+            return value
+        raise ValueError('invalid value for heartbeat_period: %d. expected in [0;1000] (milliseconds)' % value)
+
+    @staticmethod
+    def to_phi_threshold(value: str) -> float:
+        """ Convert a string into a suspicion threshold, in [0;100].
+
+        :param value: the suspicion threshold as a string
+        :return: the suspicion threshold as a float
+        """
+        threshold = float(value)
+        if 0 <= threshold <= 100:
+            return threshold
+        raise ValueError('invalid value for phi_threshold: {}. expected in [0;100]'.format(value))
+
+    @staticmethod
+    def to_internal_codec(value):
+        """ Convert a string into a InternalCodecs enum. """
+        try:
+            codec = InternalCodecs.from_string(value)
+        except KeyError:
+            raise ValueError('invalid value for internal_codec: {}. expected in {}'
+                             .format(value, InternalCodecs.strings()))
+        return codec
+
     @staticmethod
     def to_conciliation_strategy(value):
         """ Convert a string into a ConciliationStrategies enum. """
@@ -229,3 +316,15 @@ class SupvisorsServerOptions(ServerOptions):
         if 10 <= histo <= 1500:
             return histo
         raise ValueError('invalid value for stats_histo: {}. expected in [10;1500] (seconds)'.format(value))
+
+    @staticmethod
+    def to_keyframe(value: str) -> int:
+        """ Convert a string into a keyframe period, in [0;720].
+
+        :param value: the keyframe period as a string
+        :return: the keyframe period as an integer
+        """
+        keyframe = integer(value)
+        if 0 <= keyframe <= 720:
+            return keyframe
+        raise ValueError('invalid value for stats_keyframe: {}. expected in [0;720] (ticks)'.format(value))
@@ -17,7 +17,7 @@
 # limitations under the License.
 # ======================================================================
 
-from typing import AbstractSet, Any, Optional
+from typing import AbstractSet, Any, Dict, Optional
 
 from supervisor.options import make_namespec
 from supervisor.rpcinterface import SupervisorNamespaceRPCInterface
@@ -39,8 +39,15 @@ class ProcessRules(object):
         - wait_exit: a status telling if Supvisors has to wait for the process to exit before triggering the next phase in the starting sequence of the application,
         - expected_loading: the expected loading of the process on the considered hardware (can be anything at the user discretion: CPU, RAM, etc),
         - running_failure_strategy: supersedes the application rule and defines the strategy to apply when the process crashes when the application is running.
+
+    The same instance is shared by all the processes resolving to the same program or pattern element
+    of the rules file, so it must not be updated for a single process.
+    The only exception is the rules using the '#' option, that are resolved per process.
     """
 
+    __slots__ = ('supvisors', 'info_source', 'logger', 'addresses', 'hash_addresses', 'start_sequence',
+                 'stop_sequence', 'required', 'wait_exit', 'expected_loading', 'running_failure_strategy')
+
     def __init__(self, supvisors: Any) -> None:
         """ Initialization of the attributes.
 
@@ -109,6 +116,94 @@ class ProcessRules(object):
                 'running_failure_strategy': RunningFailureStrategies.to_string(self.running_failure_strategy)}
 
 
+class ProcessInfo(object):
+    """ Compact record of the process information received from a node.
+
+    Only the entries used by Supvisors are kept from the Supervisor process information.
+    The record can be read and updated like the dictionary it is built from.
+
+    Attributes are:
+        - name: the process name, as used by Supervisor in the description,
+        - state: the state of the process on the node,
+        - start: the date of the last start of the process, in the reference time of the node,
+        - stop: the date of the last stop of the process, in the reference time of the node,
+        - now: the date of the last information received, in the reference time of the node,
+        - pid: the UNIX process ID,
+        - spawnerr: the error message of the last spawn failure,
+        - expected: a status telling if the process has exited expectantly,
+        - local_time: the local date of the last information received,
+        - uptime: the time elapsed since the last start of the process,
+        - description: the Supervisor description of the process.
+    """
+
+    __slots__ = ('name', 'state', 'start', 'stop', 'now', 'pid', 'spawnerr', 'expected',
+                 'local_time', 'uptime', 'description')
+
+    def __init__(self, payload: Payload) -> None:
+        """ Initialization of the attributes.
+
+        :param payload: the process information received from the node
+        """
+        for key in self.__slots__:
+            setattr(self, key, None)
+        self.update(payload)
+
+    def __getitem__(self, key: str) -> Any:
+        """ Get the value of an entry.
+
+        :param key: the name of the entry
+        :return: the value of the entry
+        """
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        """ Set the value of an entry.
+
+        :param key: the name of the entry
+        :param value: the new value of the entry
+        :return: None
+        """
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __repr__(self) -> str:
+        """ Get the process information as string.
+
+        :return: the printable process information
+        """
+        return str(self.serial())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """ Get the value of an entry if it exists.
+
+        :param key: the name of the entry
+        :param default: the value returned if the entry does not exist
+        :return: the value of the entry
+        """
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def update(self, payload: Payload) -> None:
+        """ Update the record with the payload.
+        The entries that are not part of the record are ignored.
+
+        :param payload: the process information used to refresh the record
+        :return: None
+        """
+        for key in self.__slots__:
+            if key in payload:
+                setattr(self, key, payload[key])
+
+    def serial(self) -> Payload:
+        """ Get a serializable form of the process information.
+
+        :return: the process information in a dictionary
+        """
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
 class ProcessStatus(object):
     """ Class defining the status of a process of Supvisors.
 
@@ -120,16 +215,35 @@ class ProcessStatus(object):
         - last_event_time: the local date of the last information received,
         - extra_args: the additional arguments passed to the command line,
         - addresses: the list of all addresses where the process is running,
-        - infos: a process info dictionary for each address (running or not),
-        - rules: the rules related to this process.
+        - infos: a ProcessInfo record for each address (running or not),
+        - rules: the rules related to this process,
+        - conflict_index: the conflicting processes, shared by all the ProcessStatus of the context
+        and updated whenever the conflict status is evaluated (None if not indexed),
+        - state_index: the processes per state, shared by all the ProcessStatus of the context
+        and updated on every state change (None if not indexed),
+        - address_statuses: the AddressStatus holding the process, notified when the process is updated,
+        - application_status: the ApplicationStatus holding the process, notified when the process state changes,
+        - _serial: the cached serializable form, reset whenever a serialized attribute changes.
     """
 
-    def __init__(self, application_name: str, process_name: str, supvisors: Any) -> None:
+    # types for annotations
+    ConflictIndex = Dict[str, 'ProcessStatus']
+    StateIndex = Dict[int, Dict[str, 'ProcessStatus']]
+
+    __slots__ = ('supvisors', 'address_mapper', 'info_source', 'logger', 'options',
+                 'application_name', 'process_name', '_state', 'expected_exit', 'last_event_time', '_extra_args',
+                 'addresses', 'infos', 'rules', 'conflict_index', 'state_index', 'address_statuses', 'application_status',
+                 '_serial')
+
+    def __init__(self, application_name: str, process_name: str, supvisors: Any,
+                 conflict_index: Optional[ConflictIndex] = None, state_index: Optional[StateIndex] = None) -> None:
         """ Initialization of the attributes.
 
         :param application_name: the name of the application the process belongs to
         :param process_name: the name of the process
         :param supvisors: the global Supvisors structure
+        :param conflict_index: the conflicting processes of the context
+        :param state_index: the processes per state of the context
         """
         # keep a reference of the Supvisors data
         self.supvisors = supvisors
@@ -145,9 +259,16 @@ class ProcessStatus(object):
         self._extra_args = ''
         # expected one single applicable address
         self.addresses = set()  # addresses
-        self.infos = {}  # address: processInfo
+        self.infos: Dict[str, ProcessInfo] = {}  # address: ProcessInfo
         # rules part
         self.rules = ProcessRules(supvisors)
+        self.conflict_index = conflict_index
+        self.state_index = state_index
+        if state_index is not None:
+            state_index[ProcessStates.UNKNOWN][self.namespec()] = self
+        self.address_statuses = {}
+        self.application_status = None
+        self._serial = None
 
     @property
     def state(self) -> int:
@@ -165,8 +286,14 @@ class ProcessStatus(object):
         :return: None
         """
         if self._state != new_state:
+            if self.state_index is not None:
+                namespec = self.namespec()
+                self.state_index[self._state].pop(namespec, None)
+                self.state_index[new_state][namespec] = self
             self._state = new_state
+            self._serial = None
             self.logger.info('ProcessStatus.state: Process {} is {}'.format(self.namespec(), self.state_string()))
+            self.update_application()
 
     @property
     def extra_args(self) -> str:
@@ -185,21 +312,25 @@ class ProcessStatus(object):
         """
         if self._extra_args != new_args:
             self._extra_args = new_args
+            self._serial = None
             self.info_source.update_extra_args(self.namespec(), new_args)
 
     def serial(self) -> Payload:
         """ Get a serializable form of the ProcessStatus.
+        The result is cached until a serialized attribute changes, so it must not be modified by the caller.
 
         :return: the process status in a dictionary
         """
-        return {'application_name': self.application_name,
-                'process_name': self.process_name,
-                'statecode': self.state,
-                'statename': self.state_string(),
-                'expected_exit': self.expected_exit,
-                'last_event_time': self.last_event_time,
-                'addresses': list(self.addresses),
-                'extra_args': self.extra_args}
+        if self._serial is None:
+            self._serial = {'application_name': self.application_name,
+                            'process_name': self.process_name,
+                            'statecode': self.state,
+                            'statename': self.state_string(),
+                            'expected_exit': self.expected_exit,
+                            'last_event_time': self.last_event_time,
+                            'addresses': list(self.addresses),
+                            'extra_args': self.extra_args}
+        return self._serial
 
     # access
     def namespec(self) -> str:
@@ -263,24 +394,24 @@ class ProcessStatus(object):
         """
         return ProcessStates.to_string(self.state)
 
-    def add_info(self, address: str, process_info: Payload) -> None:
+    def add_info(self, address: str, process_info: Payload, extra_args: str = '') -> None:
         """ Insert a new process information in internal list.
 
         :param address: the name of the node from which the information has been received
         :param process_info: a subset of the dict received from Supervisor.getProcessInfo.
+        :param extra_args: the extra arguments applicable to the process (reset by default)
         :return: None
         """
         # keep date of last information received
         # use local time here as there is no guarantee that addresses will be time synchronized
         self.last_event_time = int(time())
-        # store information
-        info = self.infos[address] = process_info
+        # store a compact copy of the information
+        info = self.infos[address] = ProcessInfo(process_info)
         info['local_time'] = self.last_event_time
         self.update_uptime(info)
         self.logger.debug('ProcessStatus.add_info: adding {} at {}'.format(info, address))
-        # reset extra_args
-        info['extra_args'] = ''
-        self.extra_args = ''
+        # reset extra_args unless provided
+        self.extra_args = extra_args
         # update process status
         self.update_status(address, info['state'], info['expected'])
         # fix address rule iaw '#' option
@@ -302,7 +433,7 @@ class ProcessStatus(object):
                           .format(self.namespec(), address, procnumber))
         if '*' in self.rules.hash_addresses:
             # all nodes defined in the supvisors section of the supervisor configuration file are applicable
-            if self.address_mapper.addresses.index(address) == procnumber:
+            if self.address_mapper.node_ids.get(address) == procnumber:
                 self.rules.addresses = [address]
         else:
             # the subset of applicable nodes is the second element of rules addresses
@@ -346,8 +477,23 @@ class ProcessStatus(object):
             self.logger.warn('ProcessStatus.update_info: ProcessEvent rejected for {}. wait for tick from {}'
                              .format(self.process_name, address))
 
+    def get_info(self, address: str) -> ProcessInfo:
+        """ Get the process information related to the node.
+        The time entries (now, uptime and description) are refreshed here with the time of the last tick
+        received from the node, rather than for all the processes of the node on every tick.
+
+        :param address: the node name
+        :return: the process information
+        """
+        info = self.infos[address]
+        status = self.address_statuses.get(address)
+        if status and status.remote_time > info['now']:
+            self.update_times(address, status.remote_time)
+        return info
+
     def update_times(self, address: str, remote_time: int) -> None:
-        """ Update the internal process information when a new tick is received from the remote Supvisors instance.
+        """ Update the internal process information with the time of the last tick received
+        from the remote Supvisors instance.
 
         :param address: the name of the node from which the tick has been received
         :param remote_time: the timestamp (seconds from Epoch) of the tick in the reference time of the node
@@ -361,7 +507,7 @@ class ProcessStatus(object):
             info['description'] = self.update_description(info)
 
     @staticmethod
-    def update_uptime(info: Payload) -> None:
+    def update_uptime(info: ProcessInfo) -> None:
         """ Update uptime entry of a process information.
 
         :param info: the process information related to a given node
@@ -384,6 +530,7 @@ class ProcessStatus(object):
         # reassign the difference between current set and parameter
         if address in self.addresses:
             self.addresses.remove(address)
+            self._serial = None
         if address in self.infos:
             # force process info to UNKNOWN at address
             self.infos[address]['state'] = ProcessStates.UNKNOWN
@@ -409,6 +556,7 @@ class ProcessStatus(object):
         else:
             self.logger.debug('ProcessStatus.invalidate_address: process {} still in conflict after node invalidation'
                               .format(self.namespec()))
+        self.update_loading()
 
     def update_status(self, address: str, new_state: int, expected: bool) -> None:
         """ Updates the state and list of running address iaw the new event.
@@ -418,6 +566,8 @@ class ProcessStatus(object):
         :param expected: the exit status of the process (only valid for an EXITED state)
         :return: None
         """
+        # the event time, the addresses or the exit status may change
+        self._serial = None
         # update addresses list
         if new_state in STOPPED_STATES:
             self.addresses.discard(address)
@@ -436,18 +586,44 @@ class ProcessStatus(object):
             else:
                 self.state = new_state
                 self.expected_exit = expected
+            # the exit status may have changed without state change
+            self.update_application()
+        self.update_loading()
         # log the new status
         log_trace = 'ProcessStatus.update_status: Process {} is {}'.format(self.namespec(), self.state_string())
         if self.addresses:
             log_trace += ' on {}'.format(list(self.addresses))
         self.logger.debug(log_trace)
 
+    def update_application(self) -> None:
+        """ Notify the application holding the process that the state of the process may have changed.
+
+        :return: None
+        """
+        if self.application_status:
+            self.application_status.update_process(self)
+
+    def update_loading(self) -> None:
+        """ Notify the nodes holding the process that the loading of the process may have changed.
+        This must be called after any change of the process state, running nodes or expected loading.
+
+        :return: None
+        """
+        for status in self.address_statuses.values():
+            status.update_loading(self)
+
     def evaluate_conflict(self) -> Optional[bool]:
         """ Get a synthetic state if several processes are in a RUNNING-like state.
 
         :return: True if a conflict is detected, None otherwise
         """
-        if self.conflicting():
+        conflicting = self.conflicting()
+        if self.conflict_index is not None:
+            if conflicting:
+                self.conflict_index[self.namespec()] = self
+            else:
+                self.conflict_index.pop(self.namespec(), None)
+        if conflicting:
             # several processes seems to be in a running state so that becomes tricky
             states = {self.infos[address]['state'] for address in self.addresses}
             self.logger.debug('ProcessStatus.evaluate_conflict: {} multiple states {} for nodes {}'
@@ -17,16 +17,21 @@
 # limitations under the License.
 # ======================================================================
 
+import json
 import os
+import zlib
 
+from supervisor.compat import xmlrpclib
 from supervisor.http import NOT_DONE_YET
 from supervisor.options import make_namespec, split_namespec
 from supervisor.xmlrpc import Faults, RPCError
 
 from supvisors.initializer import Supvisors
 from supvisors.strategy import conciliate_conflicts
-from supvisors.ttypes import (ApplicationStates,
+from supvisors.ttypes import (AddressStates,
+                              ApplicationStates,
                               ConciliationStrategies,
+                              ProcessStates,
                               StartingStrategies,
                               SupvisorsStates)
 from supvisors.utils import extract_process_info, supvisors_shortcuts
@@ -178,6 +183,53 @@ class RPCInterface(object):
             return [process.serial()]
         return [proc.serial() for proc in application.processes.values()]
 
+    def get_process_info_filtered(self, filters, offset=0, limit=0):
+        """ Get synthetic information about the processes matching the filters, sorted by namespec.
+        The filters are evaluated on the indexes of the **Supvisors** context and the result is paged.
+
+        *@param* ``dict filters``: the filters to apply, all optional:
+
+            * ``'application'``: a shell-style pattern on the application name,
+            * ``'states'``: the list of process states as strings,
+            * ``'node'``: the node where the processes are running,
+            * ``'conflicting'``: ``True`` to keep only the conflicting processes,
+            * ``'crashed'``: ``True`` to keep only the crashed processes.
+
+        *@param* ``int offset``: the rank of the first process returned among the processes matching the filters.
+
+        *@param* ``int limit``: the maximum number of processes returned (``0`` for no limit).
+
+        *@throws* ``RPCError``:
+
+            * with code ``Faults.BAD_SUPVISORS_STATE`` if **Supvisors** is still in ``INITIALIZATION`` state,
+            * with code ``Faults.INCORRECT_PARAMETERS`` if a filter or a process state is unknown,
+              or if offset or limit is negative,
+            * with code ``Faults.BAD_ADDRESS`` if node is unknown to **Supvisors**.
+
+        *@return* ``list(dict)``: a list of structures containing data about the processes.
+        """
+        self._check_from_deployment()
+        # check parameters
+        unknown_filters = set(filters.keys()) - {'application', 'states', 'node', 'conflicting', 'crashed'}
+        if unknown_filters:
+            raise RPCError(Faults.INCORRECT_PARAMETERS, 'unknown filters {}'.format(sorted(unknown_filters)))
+        states = filters.get('states')
+        if states is not None:
+            try:
+                states = [ProcessStates.from_string(state) for state in states]
+            except KeyError as exc:
+                raise RPCError(Faults.INCORRECT_PARAMETERS, 'unknown process state {}'.format(exc))
+        node = filters.get('node')
+        if node is not None and node not in self.context.addresses:
+            raise RPCError(Faults.BAD_ADDRESS, 'address {} unknown to Supvisors'.format(node))
+        if offset < 0 or limit < 0:
+            raise RPCError(Faults.INCORRECT_PARAMETERS, 'negative offset {} or limit {}'.format(offset, limit))
+        # get the processes from the context indexes
+        processes = self.context.filter_processes(filters.get('application'), states, node,
+                                                  filters.get('conflicting', False), filters.get('crashed', False))
+        end = offset + limit if limit else None
+        return [process.serial() for process in processes[offset:end]]
+
     def get_all_local_process_info(self):
         """ Get information about all processes located on this address.
         It is a subset of ``supervisor.getProcessInfo``, used by **Supvisors** in INITIALIZATION state,
@@ -204,6 +256,52 @@ class RPCInterface(object):
         info = supervisor_intf.getProcessInfo(namespec)
         return self._get_local_info(info)
 
+    def get_local_process_info_since(self, sequence):
+        """ Get local information about the processes whose events have been published after the internal message
+        numbered sequence.
+        It is used by **Supvisors** to resynchronize the processes of this instance when internal messages are lost.
+
+        *@param* ``int sequence``: the sequence number of the last internal message received from this instance.
+
+        *@return* ``list(dict)``: a list of structures containing data about the processes.
+        """
+        listener = self.supvisors.listener
+        publisher = listener.publisher
+        if publisher is None or sequence > publisher.sequence:
+            # the sequence number has wrapped or this instance has been restarted
+            return self.get_all_local_process_info()
+        namespecs = {namespec for namespec, process_sequence in listener.process_sequences.items()
+                     if process_sequence > sequence}
+        supervisor_intf = self.info_source.supervisor_rpc_interface
+        all_info = supervisor_intf.getAllProcessInfo()
+        return [self._get_local_info(info) for info in all_info
+                if make_namespec(info['group'], info['name']) in namespecs]
+
+    def get_node_handshake(self, node, compress=False):
+        """ Get in a single call the information needed by a **Supvisors** instance to check this instance.
+        It gathers the results of ``get_master_address``, ``get_address_info`` and ``get_all_local_process_info``.
+
+        *@param* ``str node``: the node whose authorization is checked.
+
+        *@param* ``bool compress``: if ``True``, the process information is returned as a compressed JSON document.
+
+        *@throws* ``RPCError``: with code ``Faults.BAD_ADDRESS`` if node is unknown to **Supvisors**.
+
+        *@return* ``dict``: a structure containing the master address, the authorization of the node
+        and the information about the processes of this instance (empty if the node is not authorized).
+        """
+        try:
+            status = self.context.addresses[node]
+        except KeyError:
+            raise RPCError(Faults.BAD_ADDRESS, 'address {} unknown to Supvisors'.format(node))
+        authorized = status.state not in [AddressStates.ISOLATING, AddressStates.ISOLATED]
+        all_info = self.get_all_local_process_info() if authorized else []
+        if compress:
+            all_info = xmlrpclib.Binary(zlib.compress(json.dumps(all_info).encode('utf-8')))
+        return {'master_address': self.context.master_address,
+                'authorized': authorized,
+                'process_info': all_info}
+
     def get_process_rules(self, namespec):
         """ Get the rules used to start / stop the process named namespec.
 
@@ -17,14 +17,27 @@
 # limitations under the License.
 # ======================================================================
 
-from supervisor.compat import xmlrpclib
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from supervisor.compat import httplib, urlparse, xmlrpclib
 
 from supervisor.xmlrpc import SupervisorTransport
 
+# Types for annotations
+TransportArgs = Tuple[str, str, str]
 
-def getRPCInterface(address, env):
-    """ The getRPCInterface creates a proxy to a supervisor XML-RPC server.
-    Information about the HTTP configuration is required in env. """
+
+def getTransportArgs(address: str, env: Mapping[str, str]) -> TransportArgs:
+    """ Get the parameters required to create a transport to the Supervisor XML-RPC server running on address.
+    Information about the HTTP configuration is required in env.
+
+    :param address: the node where the Supervisor XML-RPC server is running
+    :param env: the environment variables linked to Supervisor security access
+    :return: the user name, the password and the server URL
+    """
     # get configuration info from env
     try:
         serverurl = env['SUPERVISOR_SERVER_URL']
@@ -39,6 +52,215 @@ def getRPCInterface(address, env):
     serverurl = serverurl.split(':')
     serverurl[1] = '//' + address
     serverurl = ':'.join(serverurl)
+    return username, password, serverurl
+
+
+def getRPCInterface(address, env):
+    """ The getRPCInterface creates a proxy to a supervisor XML-RPC server.
+    Information about the HTTP configuration is required in env. """
     # create transport and return proxy
-    transport = SupervisorTransport(username, password, serverurl)
+    transport = SupervisorTransport(*getTransportArgs(address, env))
     return xmlrpclib.ServerProxy('http://{}'.format(address), transport)
+
+
+class PooledTransport(SupervisorTransport):
+    """ Transport keeping its HTTP connection alive between requests.
+
+    The SupervisorTransport already keeps its HTTP connection open after a request.
+    This class adds the reconnection:
+
+        - when a request fails on a connection that has been kept open, the remote Supervisor has probably closed it
+          (restart, keep-alive timeout), so the request is sent again once on a new connection;
+        - when a request fails for any other reason than a XML-RPC fault, the connection is closed,
+          so that the next request opens a new one.
+
+    A timeout is applied to the socket operations so that a request to an unreachable node cannot block forever.
+
+    Attributes are:
+
+        - pool: the pool owning the transport, used to count new and reused connections,
+        - timeout: the timeout in seconds applied to the connection and to every socket operation.
+    """
+
+    def __init__(self, pool: 'RPCProxyPool', username: str, password: str, serverurl: str,
+                 timeout: Optional[float] = None) -> None:
+        """ Initialization of the attributes.
+
+        :param pool: the pool owning the transport
+        :param username: the user name used to access the Supervisor XML-RPC server
+        :param password: the password used to access the Supervisor XML-RPC server
+        :param serverurl: the URL of the Supervisor XML-RPC server
+        :param timeout: the timeout in seconds of the socket operations (None means blocking)
+        """
+        SupervisorTransport.__init__(self, username, password, serverurl)
+        self.pool = pool
+        self.timeout = timeout
+        # serverurl is expected to be HTTP (checked in getTransportArgs)
+        parsed = urlparse.urlparse(serverurl)
+        host, port = parsed.hostname, parsed.port or 80
+        self._get_connection = lambda: httplib.HTTPConnection(host, port, timeout=self.timeout)
+
+    def request(self, host, handler, request_body, verbose=0):
+        """ Send the XML-RPC request, reusing the HTTP connection if available. """
+        reused = self.connection is not None
+        self.pool.count_connection(reused)
+        try:
+            return SupervisorTransport.request(self, host, handler, request_body, verbose)
+        except xmlrpclib.Fault:
+            # the response has been fully read so the connection is still valid
+            raise
+        except ConnectionError:
+            self.close()
+            if not reused:
+                raise
+        except:
+            self.close()
+            raise
+        # the connection kept open was not valid anymore
+        self.pool.count_connection(False)
+        try:
+            return SupervisorTransport.request(self, host, handler, request_body, verbose)
+        except xmlrpclib.Fault:
+            raise
+        except:
+            self.close()
+            raise
+
+
+class RPCProxyPool(object):
+    """ Pool of XML-RPC proxies to the remote Supervisor instances.
+
+    A proxy is acquired for the duration of a request and released afterwards, so that its HTTP connection
+    is kept alive and reused by the next request to the same node.
+    The pool is thread-safe.
+
+    Attributes are:
+
+        - env: the environment variables linked to Supervisor security access,
+        - max_size: the maximum number of idle proxies kept per node,
+        - idle_timeout: the time in seconds after which an idle proxy is closed,
+        - request_timeout: the timeout in seconds of the socket operations of a request,
+        - idle_proxies: the idle proxies per node, with the time of their last use,
+        - new_connections: the number of HTTP connections opened,
+        - reused_connections: the number of requests sent over a HTTP connection already opened.
+    """
+
+    # default maximum number of idle proxies per node
+    MAX_SIZE = 4
+
+    # default idle timeout in seconds (well under the 30 minutes of the Supervisor HTTP server)
+    IDLE_TIMEOUT = 60
+
+    # default timeout of the socket operations of a request, in seconds
+    REQUEST_TIMEOUT = 10
+
+    # types for annotations
+    IdleProxies = Dict[str, List[Tuple[float, xmlrpclib.ServerProxy]]]
+
+    def __init__(self, env: Mapping[str, str], max_size: int = MAX_SIZE, idle_timeout: float = IDLE_TIMEOUT,
+                 request_timeout: float = REQUEST_TIMEOUT) -> None:
+        """ Initialization of the attributes.
+
+        :param env: the environment variables linked to Supervisor security access
+        :param max_size: the maximum number of idle proxies kept per node
+        :param idle_timeout: the time in seconds after which an idle proxy is closed
+        :param request_timeout: the timeout in seconds of the socket operations of a request
+        """
+        self.env = env
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.request_timeout = request_timeout
+        self.idle_proxies: RPCProxyPool.IdleProxies = {}
+        self.new_connections = 0
+        self.reused_connections = 0
+        self._lock = Lock()
+
+    def create_proxy(self, address_name: str) -> xmlrpclib.ServerProxy:
+        """ Create a new proxy to the Supervisor XML-RPC server running on address_name.
+
+        :param address_name: the node where the Supervisor XML-RPC server is running
+        :return: the proxy
+        """
+        transport = PooledTransport(self, *getTransportArgs(address_name, self.env), timeout=self.request_timeout)
+        return xmlrpclib.ServerProxy('http://{}'.format(address_name), transport)
+
+    def acquire(self, address_name: str) -> xmlrpclib.ServerProxy:
+        """ Get an idle proxy to address_name or create a new one if none is available.
+
+        :param address_name: the node where the Supervisor XML-RPC server is running
+        :return: the proxy
+        """
+        with self._lock:
+            proxies = self.idle_proxies.get(address_name)
+            if proxies:
+                return proxies.pop()[1]
+        return self.create_proxy(address_name)
+
+    def release(self, address_name: str, proxy: xmlrpclib.ServerProxy) -> None:
+        """ Give the proxy back to the pool.
+        The proxy is closed if the maximum number of idle proxies is already reached for address_name.
+
+        :param address_name: the node where the Supervisor XML-RPC server is running
+        :param proxy: the proxy to give back
+        :return: None
+        """
+        with self._lock:
+            proxies = self.idle_proxies.setdefault(address_name, [])
+            if len(proxies) < self.max_size:
+                proxies.append((monotonic(), proxy))
+                return
+        proxy('close')()
+
+    @contextmanager
+    def proxy(self, address_name: str):
+        """ Context manager providing a proxy to address_name for the duration of a request.
+
+        :param address_name: the node where the Supervisor XML-RPC server is running
+        :return: the proxy
+        """
+        proxy = self.acquire(address_name)
+        try:
+            yield proxy
+        finally:
+            # the transport has already closed its connection if it was not valid anymore
+            self.release(address_name, proxy)
+
+    def count_connection(self, reused: bool) -> None:
+        """ Update the connection counters.
+
+        :param reused: True if the request is sent over a HTTP connection already opened
+        :return: None
+        """
+        with self._lock:
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+
+    def evict_idle(self) -> None:
+        """ Close the proxies that have not been used for more than idle_timeout seconds.
+
+        :return: None
+        """
+        evicted = []
+        limit = monotonic() - self.idle_timeout
+        with self._lock:
+            for proxies in self.idle_proxies.values():
+                evicted.extend(proxy for last_use, proxy in proxies if last_use < limit)
+                proxies[:] = [(last_use, proxy) for last_use, proxy in proxies if last_use >= limit]
+        for proxy in evicted:
+            proxy('close')()
+
+    def close(self, address_names: Optional[Iterable[str]] = None) -> None:
+        """ Close the idle proxies to address_names, or all of them if address_names is not set.
+
+        :param address_names: the nodes whose proxies have to be closed
+        :return: None
+        """
+        with self._lock:
+            if address_names is None:
+                address_names = list(self.idle_proxies.keys())
+            closed = [proxy for address_name in address_names
+                      for _, proxy in self.idle_proxies.pop(address_name, [])]
+        for proxy in closed:
+            proxy('close')()
@@ -18,6 +18,7 @@
 # ======================================================================
 
 from collections import OrderedDict
+from copy import copy
 from distutils.util import strtobool
 from io import StringIO
 from sys import stderr
@@ -118,6 +119,8 @@ class Parser(object):
         elements = self.root.findall(".//pattern[@name]")
         self.patterns = {element.get('name'): element for element in elements}
         self.logger.debug('Parser.__init__: found patterns {}'.format(self.patterns.keys()))
+        # process rules shared by the processes resolving to the same program element
+        self.process_rules = {}
 
     def load_application_rules(self, application: ApplicationStatus) -> None:
         """ Find an entry corresponding to the application in the rules file, then load the parameters found.
@@ -140,6 +143,8 @@ class Parser(object):
 
     def load_process_rules(self, process: ProcessStatus) -> None:
         """ Find an entry corresponding to the process in the rules, then load the parameters found.
+        The rules loaded are shared with the other processes resolving to the same program element,
+        unless the '#' option is used.
         A final check is performed to detect inconsistencies.
 
         :param process: the process for which to find rules in the XML rules file
@@ -149,8 +154,17 @@ class Parser(object):
                           .format(process.namespec()))
         program_elt = self.get_program_element(process)
         if program_elt is not None:
-            # load element parameters into rules
-            self.load_model_rules(program_elt, process.rules, Parser.LOOP_CHECK)
+            # the default running failure strategy depends on the application
+            key = program_elt, process.rules.running_failure_strategy
+            rules = self.process_rules.get(key)
+            if rules is None:
+                # load element parameters into a copy of the default rules
+                rules = copy(process.rules)
+                self.load_model_rules(program_elt, rules, Parser.LOOP_CHECK)
+                # the '#' option is resolved per process so the rules cannot be shared
+                if not rules.hash_addresses:
+                    self.process_rules[key] = rules
+            process.rules = rules
             # check that rules are compliant with dependencies
             process.rules.check_dependencies(process.namespec())
             self.logger.debug('Parser.load_process_rules: process {} - rules {}'
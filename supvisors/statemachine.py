@@ -18,7 +18,7 @@
 # ======================================================================
 
 from time import time
-from typing import Any, Callable
+from typing import Any, Callable, Sequence, Tuple
 
 from supvisors.strategy import conciliate_conflicts
 from supvisors.ttypes import AddressStates, SupvisorsStates, Payload
@@ -106,18 +106,21 @@ class InitializationState(AbstractState):
         """ When entering in the INITIALIZATION state, reset the status of addresses. """
         self.context.master_address = ''
         self.start_date = int(time())
+        # wait for the nodes of the last working session
+        self.context.update_expected_addresses()
         # clear any existing job
         self.failure_handler.clear_jobs()
         # re-init addresses that are not isolated
         for status in self.context.addresses.values():
             if not status.in_isolation():
                 # do NOT use state setter as transition may be rejected
-                status._state = AddressStates.UNKNOWN
+                status.force_state(AddressStates.UNKNOWN)
 
     def next(self) -> int:
         """ Wait for nodes to publish until:
             - all are active,
             - or all defined in the optional *force_synchro_if* option are active,
+            - or all active in the last working session are active,
             - or timeout is reached.
 
         :return: the new Supvisors state
@@ -133,6 +136,10 @@ class InitializationState(AbstractState):
             if self.context.forced_addresses and len(self.context.unknown_forced_addresses()) == 0:
                 self.logger.info('InitializationState.next: all forced nodes are RUNNING')
                 return SupvisorsStates.DEPLOYMENT
+            # synchro done if the state of all nodes of the last working session is known
+            if self.context.expected_addresses and len(self.context.unknown_expected_addresses()) == 0:
+                self.logger.info('InitializationState.next: all nodes of the last session are RUNNING')
+                return SupvisorsStates.DEPLOYMENT
             # if synchro timeout reached, stop synchro and work with known addresses
             if (time() - self.start_date) > self.supvisors.options.synchro_timeout:
                 self.logger.warn('InitializationState.next: synchro timed out')
@@ -276,7 +283,15 @@ class ShutdownState(AbstractState):
 
 class FiniteStateMachine:
     """ This class implements a very simple behaviour of FiniteStateMachine based on a single event.
-    A state is able to evaluate itself for transitions. """
+    A state is able to evaluate itself for transitions.
+
+    The state is evaluated on the periodic timer event and also as soon as a process or authorization event
+    has changed something that may lead to a transition, as told by the dirty attribute.
+    Such a change is a node becoming RUNNING, the completion of the jobs of the starter or of the stopper,
+    or a change of the conflicts (all conflicts conciliated or a new conflict). """
+
+    # types for annotations
+    TransitionStatus = Tuple[bool, bool, int]
 
     def __init__(self, supvisors):
         """ Reset the state machine and the associated context """
@@ -284,6 +299,10 @@ class FiniteStateMachine:
         supvisors_shortcuts(self, ['context', 'failure_handler', 'starter', 'stopper', 'logger'])
         self.state = SupvisorsStates.INITIALIZATION
         self.instance = None
+        # True when an event may have made a transition possible since the last evaluation
+        self.dirty = False
+        # cached serializable form
+        self._serial = None
         # Trigger first state / INITIALIZATION
         self.update_instance(SupvisorsStates.INITIALIZATION)
 
@@ -294,8 +313,37 @@ class FiniteStateMachine:
     def next(self):
         """ Send the event to the state and transitions if possible.
         The state machine re-sends the event as long as it transitions. """
+        self.dirty = False
         self.set_state(self.instance.next())
 
+    def next_if_dirty(self) -> None:
+        """ Evaluate the state only if an event may have made a transition possible since the last evaluation.
+
+        :return: None
+        """
+        if self.dirty:
+            self.next()
+
+    def get_transition_status(self) -> TransitionStatus:
+        """ Get the part of the context that can make a transition possible upon a process event.
+
+        :return: the progress of the starter and of the stopper, and the number of conflicts
+        """
+        return bool(self.starter.in_progress()), bool(self.stopper.in_progress()), len(self.context.conflict_processes)
+
+    def update_dirty(self, status: TransitionStatus) -> None:
+        """ Set the dirty attribute if the jobs of the starter or of the stopper have been completed,
+        or if the conflicts have been all conciliated or increased since status has been taken.
+
+        :param status: the transition status taken before the process event
+        :return: None
+        """
+        starting, stopping, conflicts = status
+        new_starting, new_stopping, new_conflicts = self.get_transition_status()
+        if ((starting and not new_starting) or (stopping and not new_stopping)
+                or (conflicts and not new_conflicts) or new_conflicts > conflicts):
+            self.dirty = True
+
     def set_state(self, next_state):
         """ Send the event to the state and transitions if possible.
         The state machine re-sends the event as long as it transitions. """
@@ -321,12 +369,31 @@ class FiniteStateMachine:
         This is also the main event on this state machine. """
         self.context.on_timer_event()
         self.next()
+        # store the nodes of the working session for the next start
+        if self.state in FiniteStateMachine.WorkingStates:
+            self.context.save_membership()
         # fix failures if any (can happen after a node invalidation, a process crash or a conciliation request)
         self.failure_handler.trigger_jobs()
         # check if new isolating remotes and return the list of newly isolated addresses
         # TODO: create an internal event to confirm that socket has been disconnected ?
         return self.context.handle_isolation()
 
+    def on_heartbeat_timer(self) -> Sequence[str]:
+        """ Periodic task used to invalidate immediately the remote Supvisors instances that are suspected
+        to be inactive, so that their processes are handled without waiting for the next timer event.
+
+        :return: the newly isolated nodes
+        """
+        if self.context.on_heartbeat_timer():
+            self.next()
+            self.failure_handler.trigger_jobs()
+            return self.context.handle_isolation()
+        return []
+
+    def on_heartbeat_event(self, address: str, when: float) -> None:
+        """ This event is used to feed the failure detector of the address. """
+        self.context.on_heartbeat_event(address, when)
+
     def on_tick_event(self, address, when):
         """ This event is used to refresh the data related to the address. """
         self.context.on_tick_event(address, when)
@@ -335,19 +402,66 @@ class FiniteStateMachine:
     def on_process_event(self, address, event):
         """ This event is used to refresh the process data related to the event and address.
         This event also triggers the application starter and/or stopper. """
+        status = self.get_transition_status()
         process = self.context.on_process_event(address, event)
         if process:
-            # check if event is related to a starting or stopping application
-            starting = self.starter.has_application(process.application_name)
-            stopping = self.stopper.has_application(process.application_name)
-            # feed starter with event
-            self.starter.on_event(process)
-            # feed stopper with event
-            self.stopper.on_event(process)
-            # only the master is allowed to trigger an automatic behaviour for a running failure
-            if self.context.master and process.crashed() and not (starting or stopping):
-                self.failure_handler.add_default_job(process)
+            if self.on_process_update(process):
                 self.failure_handler.trigger_jobs()
+            self.update_dirty(status)
+            self.next_if_dirty()
+
+    def on_process_events(self, address, events):
+        """ This event is used to refresh the process data related to a batch of events sent by address.
+        The starter, the stopper and the running failure handler are fed with every event, in sequence.
+        The applications are refreshed only once, before the running failure strategies are applied. """
+        status = self.get_transition_status()
+        processes = []
+        failure = False
+        for event in events:
+            process = self.context.update_process(address, event)
+            if process:
+                processes.append(process)
+                failure = self.on_process_update(process) or failure
+        self.context.publish_process_updates(processes)
+        if failure:
+            self.failure_handler.trigger_jobs()
+        if processes:
+            self.update_dirty(status)
+            self.next_if_dirty()
+
+    def on_process_resync(self, address_name: str, info) -> None:
+        """ This event is used to refresh the processes of the node that have changed while internal messages
+        were lost. The starter, the stopper and the running failure handler are fed as if the events were received. """
+        status = self.get_transition_status()
+        processes = self.context.resync_processes(address_name, info)
+        failure = False
+        for process in processes:
+            failure = self.on_process_update(process) or failure
+        self.context.publish_process_updates(processes)
+        if failure:
+            self.failure_handler.trigger_jobs()
+        if processes:
+            self.update_dirty(status)
+            self.next_if_dirty()
+
+    def on_process_update(self, process) -> bool:
+        """ Feed the starter, the stopper and the running failure handler with the updated process.
+
+        :param process: the process updated by an event
+        :return: True if a running failure job has been added
+        """
+        # check if event is related to a starting or stopping application
+        starting = self.starter.has_application(process.application_name)
+        stopping = self.stopper.has_application(process.application_name)
+        # feed starter with event
+        self.starter.on_event(process)
+        # feed stopper with event
+        self.stopper.on_event(process)
+        # only the master is allowed to trigger an automatic behaviour for a running failure
+        if self.context.master and process.crashed() and not (starting or stopping):
+            self.failure_handler.add_default_job(process)
+            return True
+        return False
 
     def on_process_info(self, address_name: str, info) -> None:
         """ This event is used to fill the internal structures with processes available on node. """
@@ -366,6 +480,8 @@ class FiniteStateMachine:
         self.logger.info('FiniteStateMachine.on_authorization: address_name={} authorized={} master_address={}'
                          .format(address_name, authorized, master_address))
         if self.context.on_authorization(address_name, authorized):
+            # the node is now RUNNING, which may complete the INITIALIZATION state
+            self.dirty = True
             if master_address:
                 if not self.context.master_address:
                     # local Supvisors doesn't know about a master yet but remote Supvisors does
@@ -382,6 +498,7 @@ class FiniteStateMachine:
                                      ' local declares {} - remote ({}) declares {}'
                                      .format(self.context.master_address, address_name, master_address))
                     self.set_state(SupvisorsStates.INITIALIZATION)
+        self.next_if_dirty()
 
     def on_restart(self) -> None:
         """ This event is used to transition the state machine to the RESTARTING state.
@@ -400,10 +517,16 @@ class FiniteStateMachine:
     # serialization
     def serial(self) -> Payload:
         """ Return a serializable form of the SupvisorsState.
+        The result is cached until the state changes, so it must not be modified by the caller.
 
         :return: the Supvisors state as a dictionary
         """
-        return {'statecode': self.state, 'statename': self.state_string()}
+        if self._serial is None or self._serial['statecode'] != self.state:
+            self._serial = {'statecode': self.state, 'statename': self.state_string()}
+        return self._serial
+
+    # States where the RUNNING nodes are stored as the membership of the working session
+    WorkingStates = [SupvisorsStates.DEPLOYMENT, SupvisorsStates.OPERATION, SupvisorsStates.CONCILIATION]
 
     # Map between state enumerations and classes
     __StateInstances = {
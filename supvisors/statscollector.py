@@ -88,3 +88,18 @@ def instant_statistics(named_pid_list):
                        for process_name, pid in named_pid_list}
     return (time(), instant_cpu_statistics(), instant_memory_statistics(),
             instant_io_statistics(), proc_statistics)
+
+
+# Changes since a reference snapshot
+def delta_statistics(ref, stats):
+    """ Return the changes of the snapshot stats since the reference snapshot ref (the last keyframe).
+    CPU and memory measures are always provided. Only the interfaces and processes whose measures have changed
+    are provided, along with the names of the ones that have disappeared.
+    The date of the keyframe is inserted in front of the tuple. """
+    ref_date, _, _, ref_io, ref_proc = ref
+    date, cpu, memory, io, proc = stats
+    io_changes = {intf: values for intf, values in io.items() if ref_io.get(intf) != values}
+    io_removed = [intf for intf in ref_io if intf not in io]
+    proc_changes = {namespec: values for namespec, values in proc.items() if ref_proc.get(namespec) != values}
+    proc_removed = [namespec for namespec in ref_proc if namespec not in proc]
+    return ref_date, date, cpu, memory, io_changes, io_removed, proc_changes, proc_removed
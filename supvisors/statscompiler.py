@@ -88,6 +88,19 @@ def statistics(last, ref):
     return last[0], cpu, mem, io, proc
 
 
+# Rebuild a snapshot from a keyframe and a delta
+def rebuild_statistics(ref, delta):
+    """ Return the full series of measures from the reference snapshot (the last keyframe) and the changes
+    provided by statscollector.delta_statistics. """
+    _, date, cpu, mem, io_changes, io_removed, proc_changes, proc_removed = delta
+    io_removed, proc_removed = set(io_removed), set(proc_removed)
+    io = {intf: values for intf, values in ref[3].items() if intf not in io_removed}
+    io.update(io_changes)
+    proc = {namespec: values for namespec, values in ref[4].items() if namespec not in proc_removed}
+    proc.update(proc_changes)
+    return date, cpu, mem, io, proc
+
+
 # Class for statistics storage
 class StatisticsInstance(object):
     """ This class handles resources statistics for a given address and period. """
@@ -179,7 +192,8 @@ class StatisticsCompiler(object):
     Attributes are:
 
         - data: a dictionary containing a StatisticsInstance entry for each pair of address and period,
-        - cores: a dictionary giving the number of processor cores per address.
+        - cores: a dictionary giving the number of processor cores per address,
+        - keyframes: a dictionary giving the last full series of measures received per address.
         """
 
     def __init__(self, supvisors):
@@ -188,14 +202,36 @@ class StatisticsCompiler(object):
                                for period in supvisors.options.stats_periods}
                      for address in supvisors.address_mapper.addresses}
         self.nbcores = {address: 1 for address in supvisors.address_mapper.addresses}
+        self.keyframes = {address: None for address in supvisors.address_mapper.addresses}
 
     def clear(self, address):
         """ For a given address, clear the StatisticsInstance for all periods. """
         for period in self.data[address].values():
             period.clear()
+        self.keyframes[address] = None
 
     def push_statistics(self, address, stats):
-        """ Insert a new statistics measure for address. """
+        """ Insert a new statistics measure for address.
+        The measure is kept as keyframe for the following deltas. """
+        self.keyframes[address] = stats
+        self.add_statistics(address, stats)
+
+    def push_delta_statistics(self, address, delta):
+        """ Insert a new statistics measure for address, rebuilt from the changes since the last keyframe.
+        The delta is ignored if the keyframe it is based on has not been received.
+
+        :param address: the node that published the delta
+        :param delta: the changes since the last keyframe, as provided by statscollector.delta_statistics
+        :return: True if the statistics measure has been rebuilt
+        """
+        keyframe = self.keyframes[address]
+        if keyframe is None or keyframe[0] != delta[0]:
+            return False
+        self.add_statistics(address, rebuild_statistics(keyframe, delta))
+        return True
+
+    def add_statistics(self, address, stats):
+        """ Insert a full statistics measure for address in the StatisticsInstance of all periods. """
         for period in self.data[address].values():
             period.push_statistics(stats)
         # set the number of processor cores
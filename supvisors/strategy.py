@@ -40,21 +40,19 @@ class AbstractStartingStrategy(AbstractStrategy):
         """ Return True and current loading if remote Supvisors instance is active
         and can support the additional loading. """
         self.logger.trace('is_loading_valid address={} expected_loading={}'.format(address, expected_loading))
-        if address in self.context.addresses.keys():
-            status = self.context.addresses[address]
-            self.logger.trace('address {} state={}'.format(address, status.state_string()))
-            if status.state == AddressStates.RUNNING:
-                loading = status.loading()
-                self.logger.debug('address={} loading={} expected_loading={}'
-                                  .format(address, loading, expected_loading))
-                return loading + expected_loading < 100, loading
-            self.logger.trace('address {} not RUNNING'.format(address))
+        if address in self.context.state_addresses[AddressStates.RUNNING]:
+            loading = self.context.addresses[address].loading()
+            self.logger.debug('address={} loading={} expected_loading={}'
+                              .format(address, loading, expected_loading))
+            return loading + expected_loading < 100, loading
+        self.logger.trace('address {} not RUNNING'.format(address))
         return False, 0
 
     def get_loading_and_validity(self, addresses, expected_loading):
         """ Return the report of loading capability of all addresses iaw the additional loading required. """
         if '*' in addresses:
-            addresses = self.address_mapper.addresses
+            # only the RUNNING nodes can be valid
+            addresses = self.context.running_addresses()
         loading_validities = {address: self.is_loading_valid(address, expected_loading)
                               for address in addresses}
         self.logger.trace('loading_validities={}'.format(loading_validities))
@@ -140,7 +138,7 @@ class SenicideStrategy(AbstractStrategy):
             # uptime is used as there is guarantee that addresses are time synchonized
             # so comparing start dates may be irrelevant
             saved_address = min(process.addresses,
-                                key=lambda x: process.infos[x]['uptime'])
+                                key=lambda x: process.get_info(x)['uptime'])
             self.logger.warn('senicide conciliation: keep {} at {}'.format(
                 process.namespec(), saved_address))
             # stop other processes. work on copy as it may change during iteration
@@ -163,7 +161,7 @@ class InfanticideStrategy(AbstractStrategy):
         for process in conflicts:
             # determine running address with lower uptime (the youngest)
             saved_address = max(process.addresses,
-                                key=lambda x: process.infos[x]['uptime'])
+                                key=lambda x: process.get_info(x)['uptime'])
             self.logger.warn('infanticide conciliation: keep {} at {}'
                              .format(process.namespec(), saved_address))
             # stop other processes. work on copy as it may change during iteration
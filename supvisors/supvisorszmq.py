@@ -17,10 +17,15 @@
 # limitations under the License.
 # ======================================================================
 
+import json
 import zmq
 
+from typing import Dict, List, Optional, Tuple
+
 from supervisor.loggers import Logger
+from supervisor.options import split_namespec
 
+from supvisors.codec import InternalMessage, PickleCodec, create_codec
 from supvisors.ttypes import Payload
 from supvisors.utils import *
 
@@ -40,15 +45,25 @@ class InternalEventPublisher(object):
 
         - logger: a reference to the Supvisors logger,
         - address: the address name where this process is running,
+        - codec: the serializer of the internal messages,
+        - sequence: the sequence number of the last message published,
         - socket: the ZeroMQ socket with a PUBLISH pattern, bound on the internal_port defined in the ['supvisors'] section of the Supervisor configuration file.
+
+    Every message is stamped with a sequence number, so that the subscribers can detect the messages lost.
+    The sequence number starts at 1 and wraps at MAX_SEQUENCE, so that it fits in a XML-RPC integer.
     """
 
-    def __init__(self, address: str, port: int, logger: Logger) -> None:
+    # greatest sequence number
+    MAX_SEQUENCE = 0x7fffffff
+
+    def __init__(self, address: str, port: int, logger: Logger, codec=None) -> None:
         """ Initialization of the attributes. """
         # keep a reference to supvisors
         self.logger = logger
         # get local address
         self.address = address
+        self.codec = codec or PickleCodec()
+        self.sequence = 0
         # create ZMQ socket
         self.socket = ZmqContext.socket(zmq.PUB)
         url = 'tcp://*:{}'.format(port)
@@ -62,17 +77,42 @@ class InternalEventPublisher(object):
     def send_tick_event(self, payload: Payload) -> None:
         """ Publishes the tick event with ZeroMQ. """
         self.logger.trace('send TickEvent {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.TICK, self.address, payload))
+        self.send(InternalEventHeaders.TICK, payload)
 
     def send_process_event(self, payload: Payload) -> None:
         """ Publishes the process event with ZeroMQ. """
         self.logger.trace('send ProcessEvent {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.PROCESS, self.address, payload))
+        self.send(InternalEventHeaders.PROCESS, payload)
 
     def send_statistics(self, payload: Payload) -> None:
         """ Publishes the statistics with ZeroMQ. """
         self.logger.trace('send Statistics {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.STATISTICS, self.address, payload))
+        self.send(InternalEventHeaders.STATISTICS, payload)
+
+    def send_statistics_delta(self, payload: Payload) -> None:
+        """ Publishes the changes of the statistics since the last keyframe with ZeroMQ. """
+        self.logger.trace('send StatisticsDelta {}'.format(payload))
+        self.send(InternalEventHeaders.STATISTICS_DELTA, payload)
+
+    def send_heartbeat(self) -> None:
+        """ Publishes the heartbeat with ZeroMQ. """
+        self.logger.trace('send Heartbeat')
+        self.send(InternalEventHeaders.HEARTBEAT, None)
+
+    def send_process_events(self, payloads: List[Payload]) -> None:
+        """ Publishes a batch of process events in a single message with ZeroMQ. """
+        self.logger.trace('send ProcessEvents {}'.format(payloads))
+        self.send(InternalEventHeaders.PROCESS_BATCH, payloads)
+
+    def send(self, event_type: int, payload) -> None:
+        """ Serialize and publish the message, stamped with the next sequence number.
+
+        :param event_type: the message type, in InternalEventHeaders
+        :param payload: the message contents
+        :return: None
+        """
+        self.sequence = self.sequence % self.MAX_SEQUENCE + 1
+        self.socket.send(self.codec.encode(event_type, self.address, payload, self.sequence))
 
 
 class InternalEventSubscriber(object):
@@ -80,12 +120,23 @@ class InternalEventSubscriber(object):
 
     Attributes:
         - port: the port number used for internal events,
+        - codec: the de-serializer of the internal messages,
+        - sequences: the sequence number of the last message received, per node,
+        - gap: the node and the sequence number of the last message received before the messages lost,
+        set by the reception of the message following the loss,
         - socket: the PyZMQ subscriber.
+
+    A gap is detected when the sequence number received does not follow the last one received from the same node.
+    The sequence number 1 is considered as the restart of the remote publisher.
+    The messages without sequence number, sent by older Supvisors instances, are not checked.
     """
 
-    def __init__(self, addresses, port: int):
+    def __init__(self, addresses, port: int, codec=None):
         """ Initialization of the attributes. """
         self.port = port
+        self.codec = codec or PickleCodec()
+        self.sequences: Dict[str, int] = {}
+        self.gap: Optional[Tuple[str, int]] = None
         self.socket = ZmqContext.socket(zmq.SUB)
         # connect all addresses
         for address in addresses:
@@ -97,23 +148,59 @@ class InternalEventSubscriber(object):
         """ This method closes the PyZMQ socket. """
         self.socket.close(ZMQ_LINGER)
 
-    def receive(self):
-        """ Reception and pyobj de-serialization of one message. """
-        return self.socket.recv_pyobj(zmq.NOBLOCK)
+    def receive(self) -> InternalMessage:
+        """ Reception and de-serialization of one message.
+        The gap attribute is set if messages have been lost before this one. """
+        message, sequence = self.codec.decode(self.socket.recv(zmq.NOBLOCK))
+        address = message[1]
+        if sequence is None:
+            self.sequences.pop(address, None)
+            self.gap = None
+            return message
+        last_sequence = self.sequences.get(address)
+        self.sequences[address] = sequence
+        if last_sequence is None or sequence == 1 \
+                or sequence == last_sequence % InternalEventPublisher.MAX_SEQUENCE + 1:
+            self.gap = None
+        else:
+            self.gap = address, last_sequence
+        return message
 
     def disconnect(self, addresses) -> None:
         """ This method disconnects from the PyZMQ socket all addresses passed in parameter. """
         for address in addresses:
             url = 'tcp://{}:{}'.format(address, self.port)
             self.socket.disconnect(url)
+            # the sequence will restart from the next message received from this node
+            self.sequences.pop(address, None)
 
 
 class EventPublisher(object):
-    """ Class for ZMQ publication of Supvisors events. """
+    """ Class for ZMQ publication of Supvisors events.
+
+    Every message is published under a hierarchical topic, so that the ZeroMQ prefix subscription filters
+    the messages on the publisher side:
+
+        - supvisors/,
+        - address/<address_name>/,
+        - application/<application_name>/,
+        - process/<application_name>/<process_name>/,
+        - event/<application_name>/<process_name>/.
+
+    The topic is followed by the JSON payload, which includes the sequence number of the message under the key
+    'sequence'. The sequence number is used by the clients to combine the events with the snapshot
+    of the Supvisors state.
+
+    Attributes:
+        - logger: the reference to the logger,
+        - socket: the PyZMQ publisher,
+        - sequence: the sequence number of the last message published.
+    """
 
     def __init__(self, port, logger):
         """ Initialization of the attributes. """
         self.logger = logger
+        self.sequence = 0
         self.socket = ZmqContext.socket(zmq.PUB)
         # WARN: this is a local binding, only visible to processes located on the same address
         url = 'tcp://127.0.0.1:%d' % port
@@ -127,20 +214,17 @@ class EventPublisher(object):
     def send_supvisors_status(self, status: Payload) -> None:
         """ This method sends a serialized form of the supvisors status through the socket. """
         self.logger.trace('send SupvisorsStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.SUPVISORS, zmq.SNDMORE)
-        self.socket.send_json(status)
+        self.send(event_topic(EventHeaders.SUPVISORS), status)
 
     def send_address_status(self, status: Payload) -> None:
         """ This method sends a serialized form of the address status through the socket. """
         self.logger.trace('send AddressStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.ADDRESS, zmq.SNDMORE)
-        self.socket.send_json(status)
+        self.send(event_topic(EventHeaders.ADDRESS, status['address_name']), status)
 
     def send_application_status(self, status: Payload) -> None:
         """ This method sends a serialized form of the application status through the socket. """
         self.logger.trace('send ApplicationStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.APPLICATION, zmq.SNDMORE)
-        self.socket.send_json(status)
+        self.send(event_topic(EventHeaders.APPLICATION, status['application_name']), status)
 
     def send_process_event(self, address: str, event: Payload) -> None:
         """ This method sends a process event through the socket. """
@@ -148,14 +232,20 @@ class EventPublisher(object):
         evt = event.copy()
         evt['address'] = address
         self.logger.trace('send Process Event {}'.format(evt))
-        self.socket.send_string(EventHeaders.PROCESS_EVENT, zmq.SNDMORE)
-        self.socket.send_json(evt)
+        self.send(event_topic(EventHeaders.PROCESS_EVENT, evt['group'], evt['name']), evt)
 
     def send_process_status(self, status: Payload) -> None:
         """ This method sends a serialized form of the process status through the socket. """
         self.logger.trace('send Process Status {}'.format(status))
-        self.socket.send_string(EventHeaders.PROCESS_STATUS, zmq.SNDMORE)
-        self.socket.send_json(status)
+        self.send(event_topic(EventHeaders.PROCESS_STATUS, status['application_name'], status['process_name']),
+                  status)
+
+    def send(self, topic: str, payload: Payload) -> None:
+        """ This method sends the two-parts message through the socket.
+        The payload is copied as it may be cached by the sender. """
+        self.sequence += 1
+        self.socket.send_string(topic, zmq.SNDMORE)
+        self.socket.send_json(dict(payload, sequence=self.sequence))
 
 
 class EventSubscriber(object):
@@ -174,12 +264,14 @@ class EventSubscriber(object):
     Attributes:
 
         - logger: the reference to the logger,
-        - socket: the ZeroMQ socket connected to **Supvisors**.
+        - socket: the ZeroMQ socket connected to **Supvisors**,
+        - sequence: the sequence number of the last message received.
     """
 
     def __init__(self, zmq_context, port, logger):
         """ Initialization of the attributes. """
         self.logger = logger
+        self.sequence = 0
         # create ZeroMQ socket
         self.socket = zmq_context.socket(zmq.SUB)
         # WARN: this is a local binding, only visible to processes
@@ -218,6 +310,22 @@ class EventSubscriber(object):
         """ Subscription to Process Status messages. """
         self.subscribe(EventHeaders.PROCESS_STATUS)
 
+    def subscribe_address(self, address_name: str) -> None:
+        """ Subscription to the Address Status messages of the node. """
+        self.subscribe(event_topic(EventHeaders.ADDRESS, address_name))
+
+    def subscribe_application(self, application_name: str) -> None:
+        """ Subscription to the Application Status messages of the application,
+        and to the Process Status and Process Event messages of all its processes. """
+        for topic in self.application_topics(application_name):
+            self.subscribe(topic)
+
+    def subscribe_process(self, namespec: str) -> None:
+        """ Subscription to the Process Status and Process Event messages of the process.
+        A namespec like 'application:*' stands for all the processes of the application. """
+        for topic in self.process_topics(namespec):
+            self.subscribe(topic)
+
     def subscribe(self, code):
         """ Subscription to the event named code. """
         self.socket.setsockopt(zmq.SUBSCRIBE, code.encode('utf-8'))
@@ -247,18 +355,122 @@ class EventSubscriber(object):
         """ Subscription to Process Status messages. """
         self.unsubscribe(EventHeaders.PROCESS_STATUS)
 
+    def unsubscribe_address(self, address_name: str) -> None:
+        """ Remove subscription to the Address Status messages of the node. """
+        self.unsubscribe(event_topic(EventHeaders.ADDRESS, address_name))
+
+    def unsubscribe_application(self, application_name: str) -> None:
+        """ Remove subscription to the messages related to the application. """
+        for topic in self.application_topics(application_name):
+            self.unsubscribe(topic)
+
+    def unsubscribe_process(self, namespec: str) -> None:
+        """ Remove subscription to the messages related to the process. """
+        for topic in self.process_topics(namespec):
+            self.unsubscribe(topic)
+
     def unsubscribe(self, code):
         """ Remove subscription to the event named code. """
         self.socket.setsockopt(zmq.UNSUBSCRIBE, code.encode('utf-8'))
 
+    # topics part
+    @staticmethod
+    def application_topics(application_name: str) -> List[str]:
+        """ Return the topics of the messages related to the application. """
+        return [event_topic(header, application_name)
+                for header in [EventHeaders.APPLICATION, EventHeaders.PROCESS_STATUS, EventHeaders.PROCESS_EVENT]]
+
+    @staticmethod
+    def process_topics(namespec: str) -> List[str]:
+        """ Return the topics of the messages related to the process. """
+        names = [name for name in split_namespec(namespec) if name]
+        return [event_topic(header, *names) for header in [EventHeaders.PROCESS_STATUS, EventHeaders.PROCESS_EVENT]]
+
     # reception part
     def receive(self):
         """ Reception of two-parts message:
 
-            - header as an unicode string,
-            - data encoded in JSON.
+            - header as an unicode string, i.e. the first level of the topic,
+            - data encoded in JSON, including the sequence number, stored in the sequence attribute.
         """
-        return self.socket.recv_string(), self.socket.recv_json()
+        topic = self.socket.recv_string()
+        data = self.socket.recv_json()
+        self.sequence = data.get('sequence', 0)
+        return topic.split(EventHeaders.SEPARATOR, 1)[0], data
+
+
+class SnapshotServer(object):
+    """ Class for the reception of the snapshot requests and the emission of the snapshots.
+    The socket is used from the Supvisors thread, whereas the snapshots are built in the Supervisor thread.
+
+    Attributes:
+        - socket: the PyZMQ router.
+    """
+
+    def __init__(self, port):
+        """ Initialization of the attributes. """
+        self.socket = ZmqContext.socket(zmq.ROUTER)
+        # WARN: this is a local binding, only visible to processes located on the same address
+        self.socket.bind('tcp://127.0.0.1:%d' % port)
+
+    def close(self):
+        """ This method closes the PyZMQ socket. """
+        self.socket.close(ZMQ_LINGER)
+
+    def receive(self) -> bytes:
+        """ Reception of a snapshot request.
+        The request contents is not used.
+
+        :return: the identity of the requester
+        """
+        identity, *_ = self.socket.recv_multipart()
+        return identity
+
+    def send(self, identity: bytes, snapshot: Payload) -> None:
+        """ Emission of the snapshot encoded in JSON to the requester. """
+        self.socket.send_multipart([identity, b'', json.dumps(snapshot).encode('utf-8')])
+
+
+class SnapshotRequester(object):
+    """ The SnapshotRequester wraps the ZeroMQ socket that requests the current state of **Supvisors**.
+
+    The TCP socket is configured with a ZeroMQ ``DEALER`` pattern.
+    It is connected to the **Supvisors** instance running on the localhost and bound on the snapshot port.
+
+    The snapshot is a dictionary containing the sequence number of the last event published
+    and the current status of **Supvisors**, addresses, applications and processes.
+
+    Attributes:
+
+        - logger: the reference to the logger,
+        - socket: the ZeroMQ socket connected to **Supvisors**.
+    """
+
+    def __init__(self, zmq_context, port, logger):
+        """ Initialization of the attributes. """
+        self.logger = logger
+        self.socket = zmq_context.socket(zmq.DEALER)
+        # WARN: this is a local binding, only visible to processes
+        # located on the same address
+        url = 'tcp://127.0.0.1:%d' % port
+        self.logger.info('connecting SnapshotRequester to Supvisors at %s' % url)
+        self.socket.connect(url)
+
+    def close(self):
+        """ Close the ZeroMQ socket. """
+        self.socket.close(ZMQ_LINGER)
+
+    def request(self, timeout: int = 5000) -> Optional[Payload]:
+        """ Request the current state of **Supvisors**.
+
+        :param timeout: the maximum time to wait for the snapshot, in milliseconds
+        :return: the snapshot, or None if not received in time
+        """
+        self.socket.send_multipart([b'', b'snapshot'])
+        if self.socket.poll(timeout, zmq.POLLIN):
+            _, data = self.socket.recv_multipart()
+            return json.loads(data.decode('utf-8'))
+        self.logger.error('SnapshotRequester.request: no snapshot received')
 
 
 class RequestPuller(object):
@@ -356,6 +568,15 @@ class RequestPusher(object):
         except zmq.error.Again:
             self.logger.error('RESTART not sent')
 
+    def send_snapshot(self, identity: str, snapshot: Payload) -> None:
+        """ Send the snapshot to be forwarded to the requester, identified as an hexadecimal string. """
+        self.logger.trace('send SEND_SNAPSHOT sequence={}'.format(snapshot['sequence']))
+        try:
+            self.socket.send_pyobj((DeferredRequestHeaders.SEND_SNAPSHOT, (identity, snapshot)),
+                                   zmq.NOBLOCK)
+        except zmq.error.Again:
+            self.logger.error('SEND_SNAPSHOT not sent')
+
     def send_shutdown(self, address_name):
         """ Send request to shutdown a Supervisor. """
         self.logger.trace('send SHUTDOWN {}'.format(address_name))
@@ -376,7 +597,9 @@ class SupervisorZmq(object):
         self.publisher = EventPublisher(supvisors.options.event_port, supvisors.logger)
         self.internal_publisher = InternalEventPublisher(supvisors.address_mapper.local_address,
                                                          supvisors.options.internal_port,
-                                                         supvisors.logger)
+                                                         supvisors.logger,
+                                                         create_codec(supvisors.options.internal_codec,
+                                                                      supvisors.address_mapper.addresses))
         self.pusher = RequestPusher(supvisors.logger)
 
     def close(self):
@@ -394,10 +617,17 @@ class SupvisorsZmq(object):
         """ Create the sockets.
         The Supervisor logger cannot be used here (not thread-safe). """
         self.internal_subscriber = InternalEventSubscriber(supvisors.address_mapper.addresses,
-                                                           supvisors.options.internal_port)
+                                                           supvisors.options.internal_port,
+                                                           create_codec(supvisors.options.internal_codec,
+                                                                        supvisors.address_mapper.addresses))
         self.puller = RequestPuller()
+        self.snapshot_server = None
+        if supvisors.options.snapshot_port:
+            self.snapshot_server = SnapshotServer(supvisors.options.snapshot_port)
 
     def close(self):
         """ Close the sockets. """
+        if self.snapshot_server:
+            self.snapshot_server.close()
         self.puller.close()
         self.internal_subscriber.close()
@@ -38,13 +38,14 @@ class DummyAddressMapper:
     def __init__(self):
         self.addresses = ['127.0.0.1', '10.0.0.1', '10.0.0.2', '10.0.0.3',
                           '10.0.0.4', '10.0.0.5']
+        self.node_ids = {address: node_id for node_id, address in enumerate(self.addresses)}
         self.local_address = '127.0.0.1'
 
     def filter(self, address_list):
         return address_list
 
     def valid(self, address):
-        return address in self.addresses
+        return address in self.node_ids
 
 
 class DummyOptions:
@@ -55,14 +56,22 @@ class DummyOptions:
         self.address_list = [gethostname()]
         self.internal_port = 65100
         self.event_port = 65200
+        self.snapshot_port = 65201
+        self.internal_codec = 0
+        self.process_batch_window = 0
+        self.request_fanout = 4
         self.synchro_timeout = 10
         self.force_synchro_if = []
+        self.membership_file = None
         self.auto_fence = True
+        self.heartbeat_period = 0
+        self.phi_threshold = 0
         self.rules_file = ''
         self.starting_strategy = 0
         self.conciliation_strategy = 0
         self.stats_periods = 5, 15, 60
         self.stats_histo = 10
+        self.stats_keyframe = 0
         # logger options
         self.logfile = Automatic
         self.logfile_maxbytes = 10000
@@ -101,7 +110,7 @@ class MockedSupvisors:
         # mock by spec
         from supvisors.listener import SupervisorListener
         self.listener = Mock(spec=SupervisorListener)
-        self.logger = Mock(spec=Logger)
+        self.logger = Mock(spec=Logger, level=LevelsByName.INFO)
         from supvisors.sparser import Parser
         self.parser = Mock(spec=Parser)
         from supvisors.commander import Starter, Stopper
@@ -73,14 +73,22 @@ port=:60000
 address_list=cliche01,cliche03,cliche02
 rules_file=my_movies.xml
 auto_fence=true
+heartbeat_period=200
+phi_threshold=8
 internal_port=60001
 event_port=60002
+snapshot_port=60003
+internal_codec=BINARY
+process_batch_window=20
+request_fanout=50
 synchro_timeout=20
 force_synchro_if=cliche01,cliche03
+membership_file=/tmp/supvisors.membership
 starting_strategy=MOST_LOADED
 conciliation_strategy=SENICIDE
 stats_periods=5,60,600
 stats_histo=100
+stats_keyframe=12
 stats_irix_mode=true
 logfile=/tmp/supvisors.log
 logfile_maxbytes=50KB
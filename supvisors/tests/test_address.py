@@ -22,6 +22,8 @@ import sys
 import time
 import unittest
 
+from unittest.mock import patch, Mock
+
 from supvisors.tests.base import (MockedSupvisors,
                                   any_process_info,
                                   database_copy,
@@ -49,6 +51,38 @@ class AddressTest(CompatTestCase):
         self.assertEqual(0, status.remote_time)
         self.assertEqual(0, status.local_time)
         self.assertDictEqual({}, status.processes)
+        self.assertIsNone(status.state_index)
+        # test with state index
+        state_index = {state: set() for state in self.all_states}
+        status = AddressStatus('10.0.0.1', self.supvisors.logger, state_index)
+        self.assertIs(state_index, status.state_index)
+        self.assertSetEqual({'10.0.0.1'}, state_index[AddressStates.UNKNOWN])
+
+    def test_state_index(self):
+        """ Test that the state index is updated on every state change. """
+        from supvisors.address import AddressStatus
+        from supvisors.ttypes import AddressStates
+        state_index = {state: set() for state in self.all_states}
+        status_1 = AddressStatus('10.0.0.1', self.supvisors.logger, state_index)
+        status_2 = AddressStatus('10.0.0.2', self.supvisors.logger, state_index)
+        self.assertSetEqual({'10.0.0.1', '10.0.0.2'}, state_index[AddressStates.UNKNOWN])
+        # test state setter
+        status_1.state = AddressStates.CHECKING
+        status_1.state = AddressStates.RUNNING
+        self.assertSetEqual({'10.0.0.2'}, state_index[AddressStates.UNKNOWN])
+        self.assertSetEqual(set(), state_index[AddressStates.CHECKING])
+        self.assertSetEqual({'10.0.0.1'}, state_index[AddressStates.RUNNING])
+        # test forced state
+        status_2.force_state(AddressStates.ISOLATED)
+        status_1.force_state(AddressStates.UNKNOWN)
+        self.assertSetEqual({'10.0.0.1'}, state_index[AddressStates.UNKNOWN])
+        self.assertSetEqual(set(), state_index[AddressStates.RUNNING])
+        self.assertSetEqual({'10.0.0.2'}, state_index[AddressStates.ISOLATED])
+        # test forced state without index
+        status = AddressStatus('10.0.0.3', self.supvisors.logger)
+        status.force_state(AddressStates.SILENT)
+        self.assertEqual(AddressStates.SILENT, status.state)
+        self.assertFalse(any('10.0.0.3' in address_names for address_names in state_index.values()))
 
     def test_isolation(self):
         """ Test the in_isolation method. """
@@ -80,6 +114,24 @@ class AddressTest(CompatTestCase):
         dumped = pickle.dumps(serialized)
         loaded = pickle.loads(dumped)
         self.assertDictEqual(serialized, loaded)
+        # test that the serialized form is cached
+        self.assertIs(serialized, status.serial())
+        # test that the cache is reset when a serialized attribute changes
+        status.update_times(70, 80)
+        serialized = status.serial()
+        self.assertEqual(70, serialized['remote_time'])
+        self.assertEqual(80, serialized['local_time'])
+        status.force_state(AddressStates.SILENT)
+        serialized = status.serial()
+        self.assertEqual('SILENT', serialized['statename'])
+        # test that the cache is kept when the loading does not change
+        process = Mock(rules=Mock(expected_loading=10), **{'namespec.return_value': 'dummy_proc',
+                                                           'running_on.return_value': False})
+        status.update_loading(process)
+        self.assertIs(serialized, status.serial())
+        process.running_on.return_value = True
+        status.update_loading(process)
+        self.assertEqual(10, status.serial()['loading'])
 
     def test_transitions(self):
         """ Test the state transitions of AddressStatus. """
@@ -111,6 +163,8 @@ class AddressTest(CompatTestCase):
         # check that process is stored
         self.assertIn(process.namespec(), status.processes.keys())
         self.assertIs(process, status.processes[process.namespec()])
+        # check that the process notifies the address
+        self.assertDictEqual({'10.0.0.1': status}, process.address_statuses)
 
     def test_times(self):
         """ Test the update_times method. """
@@ -132,10 +186,15 @@ class AddressTest(CompatTestCase):
         status.update_times(now + 10, now)
         self.assertEqual(now + 10, status.remote_time)
         self.assertEqual(now, status.local_time)
-        # test process times: only RUNNING and STOPPING have a positive uptime
+        # test that the process times are not updated on tick
         new_data = {process.namespec(): (process.state, info['now'], info['uptime'])
                     for process in status.processes.values()
                     for info in [process.infos['10.0.0.1']]}
+        self.assertDictEqual(ref_data, new_data)
+        # test process times when read: only RUNNING and STOPPING have a positive uptime
+        new_data = {process.namespec(): (process.state, info['now'], info['uptime'])
+                    for process in status.processes.values()
+                    for info in [process.get_info('10.0.0.1')]}
         for namespec, new_info in new_data.items():
             ref_info = ref_data[namespec]
             self.assertEqual(new_info[0], ref_info[0])
@@ -147,6 +206,7 @@ class AddressTest(CompatTestCase):
 
     def test_running_process(self):
         """ Test the running_process method. """
+        from supervisor.states import ProcessStates
         from supvisors.address import AddressStatus
         from supvisors.process import ProcessStatus
         status = AddressStatus('10.0.0.1', self.supvisors.logger)
@@ -157,6 +217,18 @@ class AddressTest(CompatTestCase):
         # check the name of the running processes
         self.assertItemsEqual(['late_segv', 'segv', 'xfontsel', 'yeux_01'],
                               [proc.process_name for proc in status.running_processes()])
+        # check that the running processes are maintained upon process updates
+        process = status.processes['sample_test_1:xfontsel']
+        process.update_status('10.0.0.1', ProcessStates.STOPPED, True)
+        self.assertItemsEqual(['late_segv', 'segv', 'yeux_01'],
+                              [proc.process_name for proc in status.running_processes()])
+        process.update_status('10.0.0.1', ProcessStates.STARTING, True)
+        self.assertItemsEqual(['late_segv', 'segv', 'xfontsel', 'yeux_01'],
+                              [proc.process_name for proc in status.running_processes()])
+        # check that the processes that are not running are not scanned
+        with patch.object(ProcessStatus, 'running_on') as mocked_running:
+            self.assertEqual(4, len(status.running_processes()))
+            self.assertFalse(mocked_running.called)
 
     def test_pid_process(self):
         """ Test the pid_process method. """
@@ -173,6 +245,7 @@ class AddressTest(CompatTestCase):
 
     def test_loading(self):
         """ Test the loading method. """
+        from supervisor.states import ProcessStates
         from supvisors.address import AddressStatus
         from supvisors.process import ProcessStatus
         status = AddressStatus('10.0.0.1', self.supvisors.logger)
@@ -182,14 +255,59 @@ class AddressTest(CompatTestCase):
             status.add_process(process)
         # check the loading of the address: gives 5 (1 per running process) by default because no rule has been loaded
         self.assertEqual(4, status.loading())
+        self.assertTrue(status.check_loading())
         # change expected_loading of any stopped process
         process = random.choice([proc for proc in status.processes.values() if proc.stopped()])
         process.rules.expected_loading = 50
+        process.update_loading()
         self.assertEqual(4, status.loading())
         # change expected_loading of any running process
         process = random.choice([proc for proc in status.processes.values() if proc.running()])
         process.rules.expected_loading = 50
+        process.update_loading()
+        self.assertEqual(53, status.loading())
+        self.assertTrue(status.check_loading())
+        # stop the process
+        process.update_status('10.0.0.1', ProcessStates.STOPPED, True)
+        self.assertEqual(3, status.loading())
+        self.assertDictEqual({}, {namespec: loading for namespec, loading in status.loadings.items()
+                                  if loading != 1})
+        # invalidate the address
+        process = random.choice([proc for proc in status.processes.values() if proc.running()])
+        process.invalidate_address('10.0.0.1', False)
+        self.assertEqual(2, status.loading())
+        self.assertTrue(status.check_loading())
+
+    def test_check_loading(self):
+        """ Test the consistency check of the loading. """
+        from supervisor.loggers import LevelsByName
+        from supvisors.address import AddressStatus
+        from supvisors.process import ProcessStatus
+        status = AddressStatus('10.0.0.1', self.supvisors.logger)
+        for info in database_copy():
+            process = ProcessStatus(info['group'], info['name'], self.supvisors)
+            process.add_info('10.0.0.1', info)
+            status.add_process(process)
+        # change expected_loading of any running process without notification
+        process = random.choice([proc for proc in status.processes.values() if proc.running()])
+        process.rules.expected_loading = 50
+        # the check is not performed out of debug mode
+        self.assertEqual(4, status.loading())
+        self.assertFalse(self.supvisors.logger.error.called)
+        # the check is performed in debug mode
+        self.supvisors.logger.level = LevelsByName.DEBG
+        self.assertEqual(4, status.loading())
+        self.assertEqual(1, self.supvisors.logger.error.call_count)
+        self.assertFalse(status.check_loading())
+        # the check succeeds after notification
+        self.supvisors.logger.error.reset_mock()
+        process.update_loading()
         self.assertEqual(53, status.loading())
+        self.assertFalse(self.supvisors.logger.error.called)
+        # the check fails if the running index is not consistent
+        del status.running_index[process.namespec()]
+        self.assertFalse(status.check_loading())
+        self.assertEqual(1, self.supvisors.logger.error.call_count)
 
 
 def test_suite():
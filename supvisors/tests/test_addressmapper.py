@@ -42,6 +42,7 @@ class AddressMapperTest(CompatTestCase):
         mapper = AddressMapper(self.logger)
         self.assertIs(self.logger, mapper.logger)
         self.assertFalse(mapper.addresses)
+        self.assertDictEqual({}, mapper.node_ids)
         self.assertIsNone(mapper.local_address)
         # check that hostname is part of the local addresses
         self.assertIn(socket.gethostname(), mapper.local_addresses)
@@ -55,12 +56,15 @@ class AddressMapperTest(CompatTestCase):
         address_lst = [hostname, '292.168.0.1', '292.168.0.2']
         mapper.addresses = address_lst
         self.assertListEqual(address_lst, mapper.addresses)
+        self.assertDictEqual({hostname: 0, '292.168.0.1': 1, '292.168.0.2': 2}, mapper.node_ids)
         # check that hostname is the local address
         self.assertEqual(hostname, mapper.local_address)
         # set addresses with invalid IP addresses only
-        address_lst = ['292.168.0.1', '292.168.0.2']
+        address_lst = ['292.168.0.1', '292.168.0.2', '292.168.0.1']
         mapper.addresses = address_lst
         self.assertListEqual(address_lst, mapper.addresses)
+        # check that the first occurrence of a duplicate address is kept as node identifier
+        self.assertDictEqual({'292.168.0.1': 0, '292.168.0.2': 1}, mapper.node_ids)
         # check that the local address is not set
         self.assertIsNone(mapper.local_address)
 
@@ -21,6 +21,8 @@ import random
 import sys
 import unittest
 
+from unittest.mock import Mock
+
 from supvisors.tests.base import (MockedSupvisors, database_copy,
                                   any_process_info, any_stopped_process_info, any_running_process_info)
 
@@ -143,6 +145,16 @@ class ApplicationStatusTest(unittest.TestCase):
         dumped = pickle.dumps(serialized)
         loaded = pickle.loads(dumped)
         self.assertDictEqual(serialized, loaded)
+        # test that the serialized form is cached
+        self.assertIs(serialized, application.serial())
+        # test that the cache is reset when a serialized attribute changes
+        application.update_status()
+        serialized = application.serial()
+        self.assertDictEqual(serialized, {'application_name': 'ApplicationTest',
+                                          'statecode': 0, 'statename': 'STOPPED',
+                                          'major_failure': False, 'minor_failure': False})
+        application.update_status()
+        self.assertIs(serialized, application.serial())
 
     def test_add_process(self):
         """ Test the add_process method. """
@@ -157,6 +169,63 @@ class ApplicationStatusTest(unittest.TestCase):
         # check that process is stored
         self.assertIn(process.process_name, application.processes.keys())
         self.assertIs(process, application.processes[process.process_name])
+        # check that the application is notified by the process
+        self.assertIs(application, process.application_status)
+        self.assertEqual(application.get_contribution(process),
+                         application.contributions.get(process.process_name, ApplicationStatus.NoContribution))
+
+    def test_get_contribution(self):
+        """ Test the contribution of a process to the counters of the application. """
+        from supervisor.states import ProcessStates
+        from supvisors.application import ApplicationStatus
+        # test running states
+        for state, contribution in [(ProcessStates.RUNNING, (False, True, False, False, False)),
+                                    (ProcessStates.STARTING, (True, False, False, False, False)),
+                                    (ProcessStates.BACKOFF, (True, False, False, False, False)),
+                                    (ProcessStates.STOPPING, (False, False, True, False, False))]:
+            for required in [True, False]:
+                process = Mock(state=state, expected_exit=True, rules=Mock(required=required))
+                self.assertTupleEqual(contribution, ApplicationStatus.get_contribution(process))
+        # test stopped states for a required process
+        for state, expected, contribution in [(ProcessStates.STOPPED, True, (False, False, False, True, False)),
+                                              (ProcessStates.FATAL, True, (False, False, False, True, False)),
+                                              (ProcessStates.EXITED, True, (False, False, False, False, False)),
+                                              (ProcessStates.EXITED, False, (False, False, False, True, False))]:
+            process = Mock(state=state, expected_exit=expected, rules=Mock(required=True))
+            self.assertTupleEqual(contribution, ApplicationStatus.get_contribution(process))
+        # test stopped states for an optional process
+        for state, expected, contribution in [(ProcessStates.STOPPED, True, (False, False, False, False, False)),
+                                              (ProcessStates.FATAL, True, (False, False, False, False, True)),
+                                              (ProcessStates.EXITED, True, (False, False, False, False, False)),
+                                              (ProcessStates.EXITED, False, (False, False, False, False, True))]:
+            process = Mock(state=state, expected_exit=expected, rules=Mock(required=False))
+            self.assertTupleEqual(contribution, ApplicationStatus.get_contribution(process))
+
+    def test_update_process(self):
+        """ Test the update of the counters upon process changes. """
+        from supervisor.states import ProcessStates
+        from supvisors.application import ApplicationStatus
+        application = ApplicationStatus('ApplicationTest', self.supvisors.logger)
+        self.assertDictEqual({}, application.contributions)
+        self.assertListEqual([0, 0, 0, 0, 0], application.counters)
+        # add 2 processes
+        process_1 = Mock(process_name='dummy_1', state=ProcessStates.RUNNING, rules=Mock(required=False))
+        application.add_process(process_1)
+        process_2 = Mock(process_name='dummy_2', state=ProcessStates.STARTING, rules=Mock(required=False))
+        application.add_process(process_2)
+        self.assertListEqual([1, 1, 0, 0, 0], application.counters)
+        # update processes
+        process_2.state = ProcessStates.RUNNING
+        application.update_process(process_2)
+        self.assertListEqual([0, 2, 0, 0, 0], application.counters)
+        process_1.state = ProcessStates.FATAL
+        application.update_process(process_1)
+        self.assertListEqual([0, 1, 0, 0, 1], application.counters)
+        # update with no change
+        application.update_process(process_1)
+        self.assertListEqual([0, 1, 0, 0, 1], application.counters)
+        self.assertDictEqual({'dummy_1': (False, False, False, False, True),
+                              'dummy_2': (False, True, False, False, False)}, application.contributions)
 
     def test_update_sequences(self):
         """ Test the sequencing of the update_sequences method. """
@@ -215,6 +284,7 @@ class ApplicationStatusTest(unittest.TestCase):
         fatal_process = next(
             (process for process in application.processes.values() if process.state == ProcessStates.FATAL), None)
         fatal_process.rules.required = True
+        application.update_process(fatal_process)
         # update status. major failure is now expected
         application.update_status()
         self.assertEqual(ApplicationStates.STARTING, application.state)
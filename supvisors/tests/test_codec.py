@@ -0,0 +1,166 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import sys
+import unittest
+
+from supvisors.utils import InternalEventHeaders
+
+
+class PickleCodecTest(unittest.TestCase):
+    """ Test case for the PickleCodec class of the codec module. """
+
+    def test_round_trip(self):
+        """ Test the serialization and de-serialization of a message. """
+        from supvisors.codec import PickleCodec
+        codec = PickleCodec()
+        payload = {'name': 'dummy_program', 'state': 'running'}
+        message = codec.encode(InternalEventHeaders.PROCESS, '10.0.0.1', payload, 28)
+        self.assertIsInstance(message, bytes)
+        self.assertTupleEqual(((InternalEventHeaders.PROCESS, '10.0.0.1', payload), 28), codec.decode(message))
+
+    def test_compatibility(self):
+        """ Test the messages exchanged with the Supvisors instances that do not send sequence numbers. """
+        import pickle
+        from supvisors.codec import PickleCodec
+        codec = PickleCodec()
+        payload = {'name': 'dummy_program', 'state': 'running'}
+        # the older Supvisors instances read the message and ignore the sequence number
+        message = codec.encode(InternalEventHeaders.PROCESS, '10.0.0.1', payload, 28)
+        self.assertTupleEqual((InternalEventHeaders.PROCESS, '10.0.0.1', payload), pickle.loads(message))
+        # the messages of the older Supvisors instances have no sequence number
+        message = pickle.dumps((InternalEventHeaders.PROCESS, '10.0.0.1', payload))
+        self.assertTupleEqual(((InternalEventHeaders.PROCESS, '10.0.0.1', payload), None), codec.decode(message))
+
+
+class BinaryCodecTest(unittest.TestCase):
+    """ Test case for the BinaryCodec class of the codec module. """
+
+    def setUp(self):
+        """ Create the codec. """
+        from supvisors.codec import BinaryCodec
+        self.addresses = ['10.0.0.1', '10.0.0.2', '10.0.0.3']
+        self.codec = BinaryCodec(self.addresses)
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertIs(self.addresses, self.codec.addresses)
+        self.assertDictEqual({'10.0.0.1': 0, '10.0.0.2': 1, '10.0.0.3': 2}, self.codec.indexes)
+
+    def test_sequence(self):
+        """ Test the serialization and de-serialization of the sequence number. """
+        message = self.codec.encode(InternalEventHeaders.TICK, '10.0.0.1', {'when': 1234})
+        self.assertTupleEqual((1, InternalEventHeaders.TICK, 0, 0), self.codec.Header.unpack_from(message))
+        self.assertEqual(0, self.codec.decode(message)[1])
+        message = self.codec.encode(InternalEventHeaders.TICK, '10.0.0.1', {'when': 1234}, 0x7fffffff)
+        self.assertTupleEqual((1, InternalEventHeaders.TICK, 0, 0x7fffffff), self.codec.Header.unpack_from(message))
+        self.assertTupleEqual(((InternalEventHeaders.TICK, '10.0.0.1', {'when': 1234}), 0x7fffffff),
+                              self.codec.decode(message))
+
+    def test_version(self):
+        """ Test the rejection of a message having an unexpected version. """
+        message = bytearray(self.codec.encode(InternalEventHeaders.TICK, '10.0.0.1', {'when': 1234}))
+        message[0] = 2
+        with self.assertRaisesRegex(ValueError, 'unsupported internal message version: 2'):
+            self.codec.decode(bytes(message))
+
+    def test_tick(self):
+        """ Test the serialization and de-serialization of a tick message. """
+        message = self.codec.encode(InternalEventHeaders.TICK, '10.0.0.2', {'when': 1234})
+        self.assertEqual(self.codec.Header.size + self.codec.TickBody.size, len(message))
+        self.assertTupleEqual((InternalEventHeaders.TICK, '10.0.0.2', {'when': 1234}), self.codec.decode(message)[0])
+
+    def test_heartbeat(self):
+        """ Test the serialization and de-serialization of a heartbeat. """
+        message = self.codec.encode(InternalEventHeaders.HEARTBEAT, '10.0.0.2', None, 7)
+        self.assertEqual(self.codec.Header.size, len(message))
+        self.assertTupleEqual(((InternalEventHeaders.HEARTBEAT, '10.0.0.2', None), 7), self.codec.decode(message))
+
+    def test_process(self):
+        """ Test the serialization and de-serialization of a process event. """
+        from supvisors.codec import PickleCodec
+        payload = {'name': 'dummy_proc', 'group': 'dummy_appli', 'state': 20, 'extra_args': '-x 2',
+                   'now': 1234, 'pid': 4321, 'expected': True, 'spawnerr': ''}
+        message = self.codec.encode(InternalEventHeaders.PROCESS, '10.0.0.3', payload)
+        self.assertLess(len(message), len(PickleCodec.encode(InternalEventHeaders.PROCESS, '10.0.0.3', payload)))
+        self.assertTupleEqual((InternalEventHeaders.PROCESS, '10.0.0.3', payload), self.codec.decode(message)[0])
+        # missing fields are replaced by default values
+        message = self.codec.encode(InternalEventHeaders.PROCESS, '10.0.0.3', {'name': 'dummy_proc', 'state': 100})
+        self.assertDictEqual({'name': 'dummy_proc', 'group': '', 'state': 100, 'extra_args': '',
+                              'now': 0, 'pid': 0, 'expected': False, 'spawnerr': ''},
+                             self.codec.decode(message)[0][2])
+
+    def test_process_batch(self):
+        """ Test the serialization and de-serialization of a batch of process events. """
+        payloads = [{'name': 'dummy_proc_%d' % idx, 'group': 'dummy_appli', 'state': 20, 'extra_args': '',
+                     'now': 1234, 'pid': 4321 + idx, 'expected': True, 'spawnerr': ''} for idx in range(3)]
+        message = self.codec.encode(InternalEventHeaders.PROCESS_BATCH, '10.0.0.2', payloads)
+        self.assertTupleEqual((InternalEventHeaders.PROCESS_BATCH, '10.0.0.2', payloads), self.codec.decode(message)[0])
+        # test empty batch
+        message = self.codec.encode(InternalEventHeaders.PROCESS_BATCH, '10.0.0.2', [])
+        self.assertTupleEqual((InternalEventHeaders.PROCESS_BATCH, '10.0.0.2', []), self.codec.decode(message)[0])
+
+    def test_statistics(self):
+        """ Test the serialization and de-serialization of a statistics message. """
+        from supvisors.codec import PickleCodec
+        payload = (1234.5, [(100.0, 200.0), (40.0, 60.0)], 25.0,
+                   {'lo': (1000, 2000), 'eth0': (3000, 4000)},
+                   {'dummy_appli:dummy_proc_%d' % idx: (1000 + idx, (0.5 * idx, 1.5)) for idx in range(100)})
+        message = self.codec.encode(InternalEventHeaders.STATISTICS, '10.0.0.1', payload)
+        self.assertLess(len(message), len(PickleCodec.encode(InternalEventHeaders.STATISTICS, '10.0.0.1', payload)))
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS, '10.0.0.1', payload), self.codec.decode(message)[0])
+        # test empty statistics
+        payload = (1234.5, [], 25.0, {}, {})
+        message = self.codec.encode(InternalEventHeaders.STATISTICS, '10.0.0.1', payload)
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS, '10.0.0.1', payload), self.codec.decode(message)[0])
+
+    def test_statistics_delta(self):
+        """ Test the serialization and de-serialization of a statistics delta message. """
+        payload = (1234.5, 1239.5, [(100.0, 200.0), (40.0, 60.0)], 25.0,
+                   {'eth0': (3000, 4000)}, ['lo'],
+                   {'dummy_appli:dummy_proc_1': (1001, (0.5, 1.5))}, ['dummy_appli:dummy_proc_2', 'dummy_proc_3'])
+        message = self.codec.encode(InternalEventHeaders.STATISTICS_DELTA, '10.0.0.2', payload)
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS_DELTA, '10.0.0.2', payload),
+                              self.codec.decode(message)[0])
+        # test delta without change
+        payload = (1234.5, 1239.5, [], 25.0, {}, [], {}, [])
+        message = self.codec.encode(InternalEventHeaders.STATISTICS_DELTA, '10.0.0.2', payload)
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS_DELTA, '10.0.0.2', payload),
+                              self.codec.decode(message)[0])
+
+
+class CodecFactoryTest(unittest.TestCase):
+    """ Test case for the create_codec function of the codec module. """
+
+    def test_create_codec(self):
+        """ Test the codec selection. """
+        from supvisors.codec import BinaryCodec, PickleCodec, create_codec
+        from supvisors.ttypes import InternalCodecs
+        self.assertIsInstance(create_codec(InternalCodecs.PICKLE, ['10.0.0.1']), PickleCodec)
+        codec = create_codec(InternalCodecs.BINARY, ['10.0.0.1'])
+        self.assertIsInstance(codec, BinaryCodec)
+        self.assertListEqual(['10.0.0.1'], codec.addresses)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
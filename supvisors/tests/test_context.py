@@ -17,8 +17,10 @@
 # limitations under the License.
 # ======================================================================
 
+import os
 import random
 import sys
+import tempfile
 import time
 import unittest
 
@@ -42,6 +44,7 @@ class ContextTest(CompatTestCase):
         """ Test the values set at construction. """
         from supvisors.address import AddressStatus
         from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
         context = Context(self.supvisors)
         self.assertIs(self.supvisors, context.supvisors)
         self.assertIs(self.supvisors.address_mapper, context.address_mapper)
@@ -50,10 +53,25 @@ class ContextTest(CompatTestCase):
         for address_name, address in context.addresses.items():
             self.assertEqual(address_name, address.address_name)
             self.assertIsInstance(address, AddressStatus)
+            self.assertIs(context.state_addresses, address.state_index)
+        self.assertSetEqual(set(DummyAddressMapper().addresses), context.state_addresses[AddressStates.UNKNOWN])
+        self.assertTrue(all(not address_names for state, address_names in context.state_addresses.items()
+                            if state != AddressStates.UNKNOWN))
         self.assertDictEqual({}, context.applications)
         self.assertDictEqual({}, context.processes)
         self.assertEqual('', context._master_address)
         self.assertFalse(context.master)
+        self.assertListEqual([], context.membership)
+        self.assertDictEqual({}, context.expected_addresses)
+        self.assertDictEqual({}, context.detectors)
+        # test with heartbeat
+        from supvisors.detector import PhiAccrualDetector
+        self.supvisors.options.heartbeat_period = 200
+        context = Context(self.supvisors)
+        self.assertItemsEqual(DummyAddressMapper().addresses, context.detectors.keys())
+        for detector in context.detectors.values():
+            self.assertIsInstance(detector, PhiAccrualDetector)
+            self.assertEqual(0.2, detector.period)
 
     def test_master_address(self):
         """ Test the access to master address. """
@@ -85,11 +103,11 @@ class ContextTest(CompatTestCase):
         self.assertEqual([], context.addresses_by_states([AddressStates.SILENT]))
         self.assertEqual(DummyAddressMapper().addresses, context.addresses_by_states([AddressStates.UNKNOWN]))
         # change states
-        context.addresses['127.0.0.1']._state = AddressStates.RUNNING
-        context.addresses['10.0.0.1']._state = AddressStates.SILENT
-        context.addresses['10.0.0.2']._state = AddressStates.ISOLATING
-        context.addresses['10.0.0.3']._state = AddressStates.ISOLATED
-        context.addresses['10.0.0.4']._state = AddressStates.RUNNING
+        context.addresses['127.0.0.1'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.1'].force_state(AddressStates.SILENT)
+        context.addresses['10.0.0.2'].force_state(AddressStates.ISOLATING)
+        context.addresses['10.0.0.3'].force_state(AddressStates.ISOLATED)
+        context.addresses['10.0.0.4'].force_state(AddressStates.RUNNING)
         # test new states
         self.assertEqual(['10.0.0.5'], context.unknown_addresses())
         self.assertEqual([], context.unknown_forced_addresses())
@@ -111,19 +129,114 @@ class ContextTest(CompatTestCase):
         self.assertEqual(DummyAddressMapper().addresses, context.unknown_addresses())
         self.assertEqual(['10.0.0.1', '10.0.0.4'], context.unknown_forced_addresses())
         # change states
-        context.addresses['127.0.0.1']._state = AddressStates.RUNNING
-        context.addresses['10.0.0.2']._state = AddressStates.ISOLATING
-        context.addresses['10.0.0.3']._state = AddressStates.ISOLATED
-        context.addresses['10.0.0.4']._state = AddressStates.RUNNING
+        context.addresses['127.0.0.1'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.2'].force_state(AddressStates.ISOLATING)
+        context.addresses['10.0.0.3'].force_state(AddressStates.ISOLATED)
+        context.addresses['10.0.0.4'].force_state(AddressStates.RUNNING)
         # test new states
         self.assertEqual(['10.0.0.1', '10.0.0.5'], context.unknown_addresses())
         self.assertEqual(['10.0.0.1'], context.unknown_forced_addresses())
         # change states
-        context.addresses['10.0.0.1']._state = AddressStates.SILENT
+        context.addresses['10.0.0.1'].force_state(AddressStates.SILENT)
         # test new states
         self.assertEqual(['10.0.0.5'], context.unknown_addresses())
         self.assertEqual([], context.unknown_forced_addresses())
 
+    def test_unknown_expected_addresses(self):
+        """ Test the access to the nodes of the last working session in unknown state. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        with patch.object(Context, 'load_membership', return_value=['127.0.0.1', '10.0.0.4']):
+            context = Context(self.supvisors)
+        self.assertListEqual(['127.0.0.1', '10.0.0.4'], context.membership)
+        self.assertDictEqual({'127.0.0.1': context.addresses['127.0.0.1'],
+                              '10.0.0.4': context.addresses['10.0.0.4']}, context.expected_addresses)
+        # test initial states
+        self.assertEqual(['127.0.0.1', '10.0.0.4'], context.unknown_expected_addresses())
+        # change states
+        context.addresses['127.0.0.1'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.1'].force_state(AddressStates.RUNNING)
+        self.assertEqual(['10.0.0.4'], context.unknown_expected_addresses())
+        context.addresses['10.0.0.4'].force_state(AddressStates.RUNNING)
+        self.assertEqual([], context.unknown_expected_addresses())
+
+    def test_load_membership(self):
+        """ Test the reading of the nodes of the last working session. """
+        from supvisors.context import Context
+        context = Context(self.supvisors)
+        # test without membership file
+        self.assertListEqual([], context.load_membership())
+        with tempfile.TemporaryDirectory() as folder:
+            # test with membership file not existing yet
+            self.supvisors.options.membership_file = os.path.join(folder, 'membership')
+            self.assertListEqual([], context.load_membership())
+            # test with membership file unreadable
+            self.supvisors.options.membership_file = folder
+            self.assertListEqual([], context.load_membership())
+            self.assertTrue(self.supvisors.logger.error.called)
+            # test with membership file including an unknown node
+            self.supvisors.options.membership_file = os.path.join(folder, 'membership')
+            with open(self.supvisors.options.membership_file, 'w') as stream:
+                stream.write('10.0.0.2\n192.168.0.1\n127.0.0.1\n')
+            self.assertListEqual(['10.0.0.2', '127.0.0.1'], context.load_membership())
+
+    def test_save_membership(self):
+        """ Test the storage of the nodes of the working session. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        context = Context(self.supvisors)
+        context.addresses['127.0.0.1'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.3'].force_state(AddressStates.RUNNING)
+        # test without membership file
+        context.save_membership()
+        self.assertListEqual([], context.membership)
+        with tempfile.TemporaryDirectory() as folder:
+            membership_file = os.path.join(folder, 'membership')
+            self.supvisors.options.membership_file = membership_file
+            # test with membership file
+            context.save_membership()
+            self.assertListEqual(['127.0.0.1', '10.0.0.3'], context.membership)
+            with open(membership_file) as stream:
+                self.assertEqual('127.0.0.1\n10.0.0.3\n', stream.read())
+            self.assertListEqual(['127.0.0.1', '10.0.0.3'], context.load_membership())
+            # test that the file is not written again if the RUNNING nodes are unchanged
+            os.remove(membership_file)
+            context.save_membership()
+            self.assertFalse(os.path.exists(membership_file))
+            # test that the file is updated when the RUNNING nodes change
+            context.addresses['10.0.0.3'].force_state(AddressStates.SILENT)
+            context.save_membership()
+            self.assertListEqual(['127.0.0.1'], context.membership)
+            with open(membership_file) as stream:
+                self.assertEqual('127.0.0.1\n', stream.read())
+            # test error when writing the file
+            context.addresses['10.0.0.3'].force_state(AddressStates.RUNNING)
+            self.supvisors.options.membership_file = os.path.join(folder, 'unknown', 'membership')
+            context.save_membership()
+            self.assertTrue(self.supvisors.logger.error.called)
+            self.assertListEqual(['127.0.0.1'], context.membership)
+
+    def test_update_expected_addresses(self):
+        """ Test that the nodes expected are rebuilt from the membership of the current session. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        with tempfile.TemporaryDirectory() as folder:
+            membership_file = os.path.join(folder, 'membership')
+            with open(membership_file, 'w') as stream:
+                stream.write('10.0.0.1\n10.0.0.2\n')
+            self.supvisors.options.membership_file = membership_file
+            context = Context(self.supvisors)
+            self.assertItemsEqual(['10.0.0.1', '10.0.0.2'], context.expected_addresses.keys())
+            # the membership changes during the session
+            context.addresses['127.0.0.1'].force_state(AddressStates.RUNNING)
+            context.addresses['10.0.0.3'].force_state(AddressStates.RUNNING)
+            context.save_membership()
+            self.assertItemsEqual(['10.0.0.1', '10.0.0.2'], context.expected_addresses.keys())
+            # new synchronization phase
+            context.update_expected_addresses()
+            self.assertDictEqual({'127.0.0.1': context.addresses['127.0.0.1'],
+                                  '10.0.0.3': context.addresses['10.0.0.3']}, context.expected_addresses)
+
     @staticmethod
     def random_fill_processes( context):
         """ Pushes ProcessInfoDatabase process info in AddressStatus. """
@@ -159,7 +272,7 @@ class ContextTest(CompatTestCase):
             self.assertEqual([call(address_name, False)],
                              proc_2.invalidate_address.call_args_list)
             # restore address state
-            address_status._state = AddressStates.UNKNOWN
+            address_status.force_state(AddressStates.UNKNOWN)
 
         # test address state with auto_fence and local_address
         check_address_status('127.0.0.1', AddressStates.SILENT)
@@ -171,6 +284,10 @@ class ContextTest(CompatTestCase):
             check_address_status('127.0.0.1', AddressStates.SILENT)
             # test address state without auto_fence and other than local_address
             check_address_status('10.0.0.2', AddressStates.SILENT)
+        # test that the failure detector is reset
+        context.detectors = {'10.0.0.2': Mock()}
+        context.invalid(context.addresses['10.0.0.2'])
+        self.assertEqual([call()], context.detectors['10.0.0.2'].reset.call_args_list)
 
     def test_end_synchro(self):
         """ Test the end of synchronization phase. """
@@ -180,8 +297,8 @@ class ContextTest(CompatTestCase):
         # choose two addresses and change their state
         for address_status in context.addresses.values():
             self.assertEqual(AddressStates.UNKNOWN, address_status.state)
-        context.addresses['10.0.0.2']._state = AddressStates.RUNNING
-        context.addresses['10.0.0.4']._state = AddressStates.ISOLATED
+        context.addresses['10.0.0.2'].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.4'].force_state(AddressStates.ISOLATED)
         # call end of synchro with auto_fence activated
         context.end_synchro()
         # check that UNKNOWN addresses became ISOLATING, but local address
@@ -194,9 +311,9 @@ class ContextTest(CompatTestCase):
         self.assertEqual(AddressStates.ISOLATING,
                          context.addresses['10.0.0.5'].state)
         # reset states and set (local excepted)
-        context.addresses['10.0.0.1']._state = AddressStates.UNKNOWN
-        context.addresses['10.0.0.3']._state = AddressStates.UNKNOWN
-        context.addresses['10.0.0.5']._state = AddressStates.UNKNOWN
+        context.addresses['10.0.0.1'].force_state(AddressStates.UNKNOWN)
+        context.addresses['10.0.0.3'].force_state(AddressStates.UNKNOWN)
+        context.addresses['10.0.0.5'].force_state(AddressStates.UNKNOWN)
         with patch.object(self.supvisors.options, 'auto_fence', False):
             # call end of synchro with auto_fencing deactivated
             context.end_synchro()
@@ -211,39 +328,94 @@ class ContextTest(CompatTestCase):
     def test_conflicts(self):
         """ Test the detection of conflicting processes. """
         from supvisors.context import Context
+        from supvisors.ttypes import ProcessStates
         context = Context(self.supvisors)
         # add processes to context
         self.random_fill_processes(context)
         # test no conflict
         self.assertFalse(context.conflicting())
         self.assertListEqual([], context.conflicts())
-        # add addresses to one process
+        self.assertDictEqual({}, context.conflict_processes)
+
+        def running_info(process):
+            info = next(iter(process.infos.values())).serial()
+            info['state'] = ProcessStates.RUNNING
+            return info
+        # add a running instance of one running process on another node
         process1 = next(process
                         for process in context.processes.values()
                         if process.running())
-        process1.addresses.update(context.addresses.keys())
+        address1 = next(address for address in context.addresses if address not in process1.addresses)
+        process1.add_info(address1, running_info(process1))
         # test conflict is detected
         self.assertTrue(context.conflicting())
         self.assertListEqual([process1], context.conflicts())
-        # add addresses to one other process
+        # add running instances of one stopped process on two nodes
         process2 = next(process
                         for process in context.processes.values()
                         if process.stopped())
-        process2.addresses.update(context.addresses.keys())
+        address2, address3 = [address for address in context.addresses if address not in process2.infos][:2]
+        process2.add_info(address2, running_info(process2))
+        self.assertListEqual([process1], context.conflicts())
+        process2.add_info(address3, running_info(process2))
         # test conflict is detected
         self.assertTrue(context.conflicting())
         self.assertListEqual([process1, process2], context.conflicts())
-        # empty addresses of first process list
-        process1.addresses.clear()
+        # invalidate the additional node of first process
+        process1.invalidate_address(address1, False)
         # test conflict is still detected
         self.assertTrue(context.conflicting())
         self.assertListEqual([process2], context.conflicts())
-        # empty addresses of second process list
-        process2.addresses.clear()
+        # stop one instance of second process
+        process2.update_status(address3, ProcessStates.STOPPED, True)
         # test no conflict
         self.assertFalse(context.conflicting())
         self.assertListEqual([], context.conflicts())
 
+    def test_filter_processes(self):
+        """ Test the selection of the processes using the context indexes. """
+        from supvisors.context import Context
+        from supvisors.ttypes import ProcessStates
+        context = Context(self.supvisors)
+        context.load_processes('10.0.0.1', database_copy())
+        # the state index is shared by the processes
+        for process in context.processes.values():
+            self.assertIs(context.state_processes, process.state_index)
+            self.assertIs(process, context.state_processes[process.state][process.namespec()])
+
+        def check_filter(expected, **filters):
+            self.assertListEqual(expected, [process.namespec() for process in context.filter_processes(**filters)])
+        # test without filter
+        check_filter(sorted(context.processes.keys()))
+        # test single filters
+        check_filter(['crash:late_segv', 'crash:segv'], application='crash')
+        check_filter(['sample_test_1:xclock', 'sample_test_1:xfontsel', 'sample_test_1:xlogo',
+                      'sample_test_2:sleep', 'sample_test_2:yeux_00', 'sample_test_2:yeux_01'], application='sample*')
+        check_filter([], application='dummy')
+        check_filter(['firefox', 'sample_test_2:yeux_00'], states=[ProcessStates.EXITED])
+        check_filter(['sample_test_1:xfontsel', 'sample_test_2:sleep', 'sample_test_2:yeux_01'],
+                     states=[ProcessStates.RUNNING, ProcessStates.FATAL])
+        check_filter(['crash:late_segv', 'crash:segv', 'sample_test_1:xfontsel', 'sample_test_2:yeux_01'],
+                     address_name='10.0.0.1')
+        check_filter([], address_name='10.0.0.2')
+        check_filter([], conflicting=True)
+        check_filter(['sample_test_2:sleep'], crashed=True)
+        # test combined filters
+        check_filter(['sample_test_1:xfontsel', 'sample_test_2:yeux_01'],
+                     application='sample*', states=[ProcessStates.RUNNING], address_name='10.0.0.1')
+        check_filter(['sample_test_2:sleep'], application='sample_test_2', crashed=True)
+        check_filter([], application='crash', crashed=True)
+        # add a running instance of a running process on another node to create a conflict
+        info = next(info for info in database_copy() if info['name'] == 'yeux_01')
+        context.load_processes('10.0.0.2', [info])
+        check_filter(['sample_test_2:yeux_01'], conflicting=True)
+        check_filter(['sample_test_2:yeux_01'], address_name='10.0.0.2')
+        check_filter([], conflicting=True, application='crash')
+        # an unexpected EXITED process is crashed
+        process = context.processes['sample_test_2:yeux_00']
+        process.update_status('10.0.0.1', ProcessStates.EXITED, False)
+        check_filter(['sample_test_2:sleep', 'sample_test_2:yeux_00'], crashed=True)
+
     def test_setdefault_application(self):
         """ Test the access / creation of an application status. """
         from supvisors.context import Context
@@ -269,6 +441,7 @@ class ContextTest(CompatTestCase):
     def test_setdefault_process(self):
         """ Test the access / creation of a process status. """
         from supvisors.context import Context
+        from supvisors.ttypes import RunningFailureStrategies
         context = Context(self.supvisors)
         # check application list
         self.assertDictEqual({}, context.applications)
@@ -292,12 +465,62 @@ class ContextTest(CompatTestCase):
                        'name': process1.process_name}
         process3 = context.setdefault_process(dummy_info3)
         self.assertIs(process1, process3)
+        # check that the default rules are shared
+        self.assertIs(process1.rules, process2.rules)
+        self.assertIs(context.default_rules[RunningFailureStrategies.CONTINUE], process1.rules)
         # check application and process list
         self.assertItemsEqual(['dummy_application_1', 'dummy_application_2'], context.applications.keys())
         self.assertDictEqual({'dummy_application_1:dummy_process_1': process1,
                               'dummy_application_2:dummy_process_2': process2},
                              context.processes)
 
+    def test_default_process_rules(self):
+        """ Test the access / creation of the default process rules. """
+        from supvisors.context import Context
+        from supvisors.ttypes import RunningFailureStrategies
+        context = Context(self.supvisors)
+        self.assertDictEqual({}, context.default_rules)
+        # test creation
+        rules = context.default_process_rules(RunningFailureStrategies.RESTART_PROCESS)
+        self.assertEqual(RunningFailureStrategies.RESTART_PROCESS, rules.running_failure_strategy)
+        self.assertEqual(['*'], rules.addresses)
+        self.assertDictEqual({RunningFailureStrategies.RESTART_PROCESS: rules}, context.default_rules)
+        # test access
+        self.assertIs(rules, context.default_process_rules(RunningFailureStrategies.RESTART_PROCESS))
+        other_rules = context.default_process_rules(RunningFailureStrategies.CONTINUE)
+        self.assertIsNot(rules, other_rules)
+        self.assertEqual(RunningFailureStrategies.CONTINUE, other_rules.running_failure_strategy)
+
+    def test_resync_processes(self):
+        """ Test the reload of the processes that have changed on a given address. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates, ProcessStates
+        context = Context(self.supvisors)
+        context.load_processes('10.0.0.1', database_copy())
+        info = next(info for info in database_copy() if info['name'] == 'xclock')
+        info['state'] = ProcessStates.STOPPED
+        info['extra_args'] = '-x 2'
+        # test with unknown address
+        self.assertListEqual([], context.resync_processes('10.0.0.0', [info]))
+        # test with address not RUNNING
+        process = context.processes['sample_test_1:xclock']
+        self.assertEqual(ProcessStates.STOPPING, process.infos['10.0.0.1']['state'])
+        self.assertListEqual([], context.resync_processes('10.0.0.1', [info]))
+        self.assertEqual(ProcessStates.STOPPING, process.infos['10.0.0.1']['state'])
+        # test with address RUNNING
+        context.addresses['10.0.0.1'].force_state(AddressStates.RUNNING)
+        self.assertListEqual([process], context.resync_processes('10.0.0.1', [info]))
+        self.assertEqual(ProcessStates.STOPPED, process.infos['10.0.0.1']['state'])
+        self.assertEqual(ProcessStates.STOPPED, process.state)
+        # test that the extra arguments are kept and not reset in the meantime
+        self.assertEqual('-x 2', process.extra_args)
+        self.assertEqual([call('sample_test_1:xclock', '-x 2')],
+                         self.supvisors.info_source.update_extra_args.call_args_list)
+        self.supvisors.info_source.update_extra_args.reset_mock()
+        context.resync_processes('10.0.0.1', [info])
+        self.assertEqual('-x 2', process.extra_args)
+        self.assertFalse(self.supvisors.info_source.update_extra_args.called)
+
     def test_load_processes(self):
         """ Test the storage of processes handled by Supervisor on a given
         address. """
@@ -403,7 +626,7 @@ class ContextTest(CompatTestCase):
                              context.addresses['10.0.0.4'].state)
         # check exception if not authorized and auto fencing activated and
         # current is SILENT
-        context.addresses['10.0.0.4']._state = AddressStates.SILENT
+        context.addresses['10.0.0.4'].force_state(AddressStates.SILENT)
         with self.assertRaises(InvalidTransition):
             context.on_authorization('10.0.0.4', True)
         self.assertEqual(AddressStates.SILENT,
@@ -524,6 +747,30 @@ class ContextTest(CompatTestCase):
                                    'extra_args': ''}),
                              mocked_publisher.send_process_status.call_args)
 
+    def test_publish_process_updates(self):
+        """ Test the publication of the processes and applications updated by a batch of process events. """
+        from supvisors.context import Context
+        context = Context(self.supvisors)
+        mocked_publisher = self.supvisors.zmq.publisher
+        # fill context with applications
+        appli_1 = context.applications['appli_1'] = Mock(**{'serial.return_value': 'appli_1'})
+        appli_2 = context.applications['appli_2'] = Mock(**{'serial.return_value': 'appli_2'})
+        process_1 = Mock(application_name='appli_1', **{'serial.return_value': 'proc_1'})
+        process_2 = Mock(application_name='appli_2', **{'serial.return_value': 'proc_2'})
+        process_3 = Mock(application_name='appli_1', **{'serial.return_value': 'proc_3'})
+        # test with no process
+        context.publish_process_updates([])
+        self.assertFalse(mocked_publisher.send_process_status.called)
+        self.assertFalse(mocked_publisher.send_application_status.called)
+        # test with duplicates
+        context.publish_process_updates([process_1, process_2, process_1, process_3, process_2])
+        self.assertEqual([call('proc_1'), call('proc_2'), call('proc_3')],
+                         mocked_publisher.send_process_status.call_args_list)
+        self.assertEqual([call('appli_1'), call('appli_2')],
+                         mocked_publisher.send_application_status.call_args_list)
+        self.assertEqual(1, appli_1.update_status.call_count)
+        self.assertEqual(1, appli_2.update_status.call_count)
+
     @patch('supvisors.context.time', return_value=3600)
     def test_timer_event(self, mocked_time):
         """ Test the handling of a timer event. """
@@ -541,7 +788,7 @@ class ContextTest(CompatTestCase):
         test_addresses = ['10.0.0.1', '10.0.0.3', '10.0.0.5']
         for address_name in test_addresses:
             address = context.addresses[address_name]
-            address._state = AddressStates.RUNNING
+            address.force_state(AddressStates.RUNNING)
             address.local_time = time.time()
         context.on_timer_event()
         for address_name in test_addresses:
@@ -585,6 +832,54 @@ class ContextTest(CompatTestCase):
         self.assertTrue([call(payload2), call(payload3)] == send_calls or
                         [call(payload3), call(payload2)] == send_calls)
 
+    @patch('supvisors.context.monotonic', return_value=50.0)
+    def test_heartbeat_event(self, _):
+        """ Test the handling of a heartbeat event. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        context = Context(self.supvisors)
+        # test without detector
+        context.on_heartbeat_event('10.0.0.1', 49.5)
+        # test with detector and address not RUNNING
+        detector = Mock()
+        context.detectors = {'10.0.0.1': detector}
+        context.on_heartbeat_event('10.0.0.1', 49.5)
+        self.assertFalse(detector.heartbeat.called)
+        # test with detector and address RUNNING
+        # the arrival time set by the main loop is used, not the time of the processing
+        context.addresses['10.0.0.1'].force_state(AddressStates.RUNNING)
+        context.on_heartbeat_event('10.0.0.1', 49.5)
+        self.assertEqual([call(49.5)], detector.heartbeat.call_args_list)
+
+    @patch('supvisors.context.monotonic', return_value=50.0)
+    def test_heartbeat_timer(self, _):
+        """ Test the invalidation of the addresses suspected by the failure detector. """
+        from supvisors.context import Context
+        from supvisors.ttypes import AddressStates
+        context = Context(self.supvisors)
+        mocked_send = self.supvisors.zmq.publisher.send_address_status
+        context.detectors = {address_name: Mock(**{'phi.return_value': 2.0})
+                             for address_name in ['127.0.0.1', '10.0.0.1', '10.0.0.2', '10.0.0.3']}
+        for address_name in context.detectors:
+            context.addresses[address_name].force_state(AddressStates.RUNNING)
+        context.addresses['10.0.0.3'].force_state(AddressStates.SILENT)
+        context.detectors['127.0.0.1'].phi.return_value = 12.0
+        context.detectors['10.0.0.2'].phi.return_value = 12.0
+        context.detectors['10.0.0.3'].phi.return_value = 12.0
+        # test without threshold
+        self.supvisors.options.phi_threshold = 0
+        self.assertListEqual([], context.on_heartbeat_timer())
+        self.assertFalse(mocked_send.called)
+        # test with threshold: the local address and the addresses not RUNNING are not considered
+        self.supvisors.options.phi_threshold = 8
+        with patch.object(context, 'invalid') as mocked_invalid:
+            self.assertListEqual(['10.0.0.2'], context.on_heartbeat_timer())
+            self.assertEqual([call(context.addresses['10.0.0.2'])], mocked_invalid.call_args_list)
+        self.assertEqual([call(50.0)], context.detectors['10.0.0.2'].phi.call_args_list)
+        self.assertFalse(context.detectors['127.0.0.1'].phi.called)
+        self.assertFalse(context.detectors['10.0.0.3'].phi.called)
+        self.assertEqual(1, mocked_send.call_count)
+
     def test_handle_isolation(self):
         """ Test the isolation of addresses. """
         from supvisors.context import Context
@@ -592,12 +887,12 @@ class ContextTest(CompatTestCase):
         context = Context(self.supvisors)
         with patch.object(self.supvisors.zmq.publisher, 'send_address_status') as mocked_send:
             # update address states
-            context.addresses['127.0.0.1']._state = AddressStates.CHECKING
-            context.addresses['10.0.0.1']._state = AddressStates.RUNNING
-            context.addresses['10.0.0.2']._state = AddressStates.SILENT
-            context.addresses['10.0.0.3']._state = AddressStates.ISOLATED
-            context.addresses['10.0.0.4']._state = AddressStates.ISOLATING
-            context.addresses['10.0.0.5']._state = AddressStates.ISOLATING
+            context.addresses['127.0.0.1'].force_state(AddressStates.CHECKING)
+            context.addresses['10.0.0.1'].force_state(AddressStates.RUNNING)
+            context.addresses['10.0.0.2'].force_state(AddressStates.SILENT)
+            context.addresses['10.0.0.3'].force_state(AddressStates.ISOLATED)
+            context.addresses['10.0.0.4'].force_state(AddressStates.ISOLATING)
+            context.addresses['10.0.0.5'].force_state(AddressStates.ISOLATING)
             # call method and check result
             result = context.handle_isolation()
             self.assertEqual(AddressStates.CHECKING, context.addresses['127.0.0.1'].state)
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+import sys
+import unittest
+
+
+class PhiAccrualDetectorTest(unittest.TestCase):
+    """ Test case for the detector module. """
+
+    def setUp(self):
+        """ Create the detector. """
+        from supvisors.detector import PhiAccrualDetector
+        self.detector = PhiAccrualDetector(0.2)
+
+    def feed(self, intervals):
+        """ Send heartbeats separated by the intervals and return the time of the last one. """
+        now = 100.0
+        self.detector.heartbeat(now)
+        for interval in intervals:
+            now += interval
+            self.detector.heartbeat(now)
+        return now
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertEqual(0.2, self.detector.period)
+        self.assertListEqual([0.2], list(self.detector.intervals))
+        self.assertIsNone(self.detector.last_arrival)
+
+    def test_heartbeat(self):
+        """ Test the storage of the heartbeat intervals. """
+        self.detector.heartbeat(100.0)
+        self.assertEqual(100.0, self.detector.last_arrival)
+        self.assertListEqual([0.2], list(self.detector.intervals))
+        self.detector.heartbeat(100.25)
+        self.assertEqual(100.25, self.detector.last_arrival)
+        self.assertListEqual([0.2, 0.25], [round(x, 3) for x in self.detector.intervals])
+        # test that the window is bounded
+        self.feed([0.2] * 150)
+        self.assertEqual(self.detector.WINDOW_SIZE, len(self.detector.intervals))
+
+    def test_reset(self):
+        """ Test the reset of the heartbeat history. """
+        self.feed([0.3, 0.4])
+        self.detector.reset()
+        self.assertListEqual([0.2], list(self.detector.intervals))
+        self.assertIsNone(self.detector.last_arrival)
+
+    def test_phi(self):
+        """ Test the evaluation of the suspicion level. """
+        # no heartbeat received
+        self.assertEqual(0.0, self.detector.phi(1000.0))
+        # regular heartbeats
+        last = self.feed([0.2] * 20)
+        self.assertLess(self.detector.phi(last + 0.1), 0.1)
+        self.assertAlmostEqual(0.30103, self.detector.phi(last + 0.2), 4)
+        # the suspicion level increases with the silence
+        values = [self.detector.phi(last + delay) for delay in [0.3, 0.4, 0.5, 1.0]]
+        self.assertListEqual(sorted(values), values)
+        self.assertLess(values[1], 8)
+        self.assertGreater(values[2], 8)
+        # the suspicion level is bounded
+        self.assertEqual(self.detector.MAX_PHI, self.detector.phi(last + 100))
+
+    def test_phi_jitter(self):
+        """ Test that the suspicion level adapts to irregular heartbeats. """
+        last = self.feed([0.2] * 20)
+        regular_phi = self.detector.phi(last + 0.5)
+        self.detector.reset()
+        last = self.feed([0.1, 0.5, 0.2, 0.6, 0.1, 0.3] * 4)
+        self.assertLess(self.detector.phi(last + 0.5), regular_phi)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2017 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+import os
+import sys
+import unittest
+
+from unittest.mock import call, patch, Mock
+
+from supervisor.medusa.asyncore_25 import socket_map
+
+from supvisors.tests.base import MockedSupvisors
+
+
+class EventQueueTest(unittest.TestCase):
+    """ Test case for the eventqueue module. """
+
+    def setUp(self):
+        """ Create the event queue. """
+        from supvisors.eventqueue import SupvisorsEventQueue
+        self.supvisors = MockedSupvisors()
+        self.callback = Mock()
+        self.queue = SupvisorsEventQueue(self.callback, self.supvisors.logger)
+
+    def tearDown(self):
+        """ Close the event queue. """
+        self.queue.close()
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertIs(self.callback, self.queue.callback)
+        self.assertIs(self.supvisors.logger, self.queue.logger)
+        self.assertTrue(self.queue.queue.empty())
+        self.assertFalse(self.queue.closed)
+        self.assertFalse(os.get_blocking(self.queue.wakeup_fd))
+        self.assertIs(self.queue, socket_map[self.queue.fileno()])
+        self.assertTrue(self.queue.readable())
+        self.assertFalse(self.queue.writable())
+
+    def test_push_read(self):
+        """ Test the handover of events between threads. """
+        # nothing to read
+        self.queue.handle_read()
+        self.assertFalse(self.callback.called)
+        # push events
+        self.assertTrue(self.queue.push('event', (0, '10.0.0.1', {'when': 1234})))
+        self.assertTrue(self.queue.push('auth', ('10.0.0.1', True, '')))
+        self.queue.handle_read()
+        self.assertEqual([call('event', (0, '10.0.0.1', {'when': 1234})),
+                          call('auth', ('10.0.0.1', True, ''))],
+                         self.callback.call_args_list)
+        self.assertTrue(self.queue.queue.empty())
+        self.callback.reset_mock()
+        # test that an exception in callback does not prevent the other events to be processed
+        self.callback.side_effect = [KeyError, None]
+        self.assertTrue(self.queue.push('info', ('10.0.0.1', [])))
+        self.assertTrue(self.queue.push('info', ('10.0.0.2', [])))
+        self.queue.handle_read()
+        self.assertEqual([call('info', ('10.0.0.1', [])), call('info', ('10.0.0.2', []))],
+                         self.callback.call_args_list)
+        self.assertEqual(1, self.supvisors.logger.error.call_count)
+
+    def test_close(self):
+        """ Test the closure of the event queue. """
+        fd = self.queue.fileno()
+        self.queue.close()
+        self.assertTrue(self.queue.closed)
+        self.assertNotIn(fd, socket_map)
+        self.assertFalse(self.queue.readable())
+        # push is rejected without writing to the closed pipe
+        with patch('supvisors.eventqueue.os.write') as mocked_write:
+            self.assertFalse(self.queue.push('event', None))
+            self.assertFalse(mocked_write.called)
+        self.assertTrue(self.queue.queue.empty())
+        # second call has no effect
+        self.queue.close()
+
+    def test_push_write_failure(self):
+        """ Test that an event queued is reported as such even if the pipe cannot be written,
+        so that it is not sent again by another way. """
+        for exception in [BlockingIOError, OSError]:
+            with patch('supvisors.eventqueue.os.write', side_effect=exception):
+                self.assertTrue(self.queue.push('event', exception.__name__))
+        self.assertEqual([('event', 'BlockingIOError'), ('event', 'OSError')],
+                         [self.queue.queue.get_nowait() for _ in range(2)])
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -41,9 +41,16 @@ class ListenerTest(unittest.TestCase):
         # check attributes
         self.assertIs(self.supvisors, listener.supvisors)
         self.assertIsNone(listener.collector)
+        self.assertIsNone(listener.delta_collector)
         self.assertEqual('127.0.0.1', listener.address)
         self.assertIsNone(listener.publisher)
         self.assertIsNone(listener.main_loop)
+        self.assertIsNone(listener.event_queue)
+        self.assertListEqual([], listener.process_events)
+        self.assertIsNone(listener.batch_timer)
+        self.assertDictEqual({}, listener.process_sequences)
+        self.assertIsNone(listener.stats_keyframe)
+        self.assertEqual(0, listener.stats_ticks)
         # test that callbacks are set in Supervisor
         self.assertIn((SupervisorRunningEvent, listener.on_running), callbacks)
         self.assertIn((SupervisorStoppingEvent, listener.on_stopping), callbacks)
@@ -61,9 +68,15 @@ class ListenerTest(unittest.TestCase):
         # check attributes
         self.assertIs(self.supvisors, listener.supvisors)
         self.assertTrue(listener.collector())
+        self.assertIsNotNone(listener.delta_collector)
         self.assertEqual('127.0.0.1', listener.address)
         self.assertIsNone(listener.publisher)
         self.assertIsNone(listener.main_loop)
+        self.assertIsNone(listener.event_queue)
+        self.assertListEqual([], listener.process_events)
+        self.assertIsNone(listener.batch_timer)
+        self.assertIsNone(listener.stats_keyframe)
+        self.assertEqual(0, listener.stats_ticks)
         # test that callbacks are set in Supervisor
         self.assertIn((SupervisorRunningEvent, listener.on_running), callbacks)
         self.assertIn((SupervisorStoppingEvent, listener.on_stopping), callbacks)
@@ -80,14 +93,25 @@ class ListenerTest(unittest.TestCase):
         with patch.object(self.supvisors.info_source, 'replace_default_handler') as mocked_infosource:
             with patch('supvisors.listener.SupervisorZmq') as mocked_zmq:
                 with patch('supvisors.listener.SupvisorsMainLoop') as mocked_loop:
-                    listener.on_running('')
-                    # test attributes and calls
-                    self.assertTrue(mocked_infosource.called)
-                    self.assertTrue(mocked_zmq.called)
-                    self.assertIsNot(ref_publisher, listener.publisher)
-                    self.assertTrue(mocked_loop.called)
-                    self.assertIsNot(ref_main_loop, listener.main_loop)
-                    self.assertTrue(listener.main_loop.start.called)
+                    with patch('supvisors.listener.SupvisorsEventQueue') as mocked_queue:
+                        listener.on_running('')
+                        # test attributes and calls
+                        self.assertTrue(mocked_infosource.called)
+                        self.assertTrue(mocked_zmq.called)
+                        self.assertIsNot(ref_publisher, listener.publisher)
+                        self.assertEqual([call(listener.on_queued_event, listener.logger)],
+                                         mocked_queue.call_args_list)
+                        self.assertIs(mocked_queue.return_value, listener.event_queue)
+                        self.assertEqual([call(self.supvisors, listener.event_queue)], mocked_loop.call_args_list)
+                        self.assertIsNot(ref_main_loop, listener.main_loop)
+                        self.assertTrue(listener.main_loop.start.called)
+                        mocked_loop.reset_mock()
+                        # test fallback when event queue cannot be created
+                        mocked_queue.side_effect = OSError
+                        listener.event_queue = None
+                        listener.on_running('')
+                        self.assertIsNone(listener.event_queue)
+                        self.assertEqual([call(self.supvisors, None)], mocked_loop.call_args_list)
 
     def test_on_stopping(self):
         """ Test the reception of a Supervisor STOPPING event. """
@@ -95,12 +119,16 @@ class ListenerTest(unittest.TestCase):
         listener = SupervisorListener(self.supvisors)
         # create a main_loop patch
         listener.main_loop = Mock(**{'stop.return_value': None})
-        with patch.object(self.supvisors.info_source, 'close_httpservers') as mocked_infosource:
+        listener.event_queue = Mock()
+        with patch.object(self.supvisors.info_source, 'close_httpservers') as mocked_infosource, \
+                patch.object(listener, 'flush_process_events') as mocked_flush:
             # 1. test with unmarked logger, i.e. meant to be the supervisor logger
             listener.on_stopping('')
             self.assertEqual([], callbacks)
+            self.assertEqual([call()], mocked_flush.call_args_list)
             self.assertTrue(mocked_infosource.called)
             self.assertTrue(listener.main_loop.stop.called)
+            self.assertTrue(listener.event_queue.close.called)
             self.assertTrue(self.supvisors.zmq.close.called)
             self.assertFalse(self.supvisors.logger.close.called)
             # reset mocks
@@ -122,7 +150,7 @@ class ListenerTest(unittest.TestCase):
         from supvisors.listener import SupervisorListener
         listener = SupervisorListener(self.supvisors)
         # create a publisher patch
-        listener.publisher = Mock(**{'send_process_event.return_value': None})
+        listener.publisher = Mock(sequence=12, **{'send_process_event.return_value': None})
         # test non-process event
         with self.assertRaises(AttributeError):
             listener.on_process(Tick60Event(0, None))
@@ -142,6 +170,59 @@ class ListenerTest(unittest.TestCase):
                                 'expected': True,
                                 'spawnerr': 'resource not available'})],
                          listener.publisher.send_process_event.call_args_list)
+        self.assertDictEqual({'dummy_group:dummy_process': 12}, listener.process_sequences)
+        listener.publisher.send_process_event.reset_mock()
+        # test process event with batch window but without event queue
+        self.supvisors.options.process_batch_window = 20
+        listener.on_process(event)
+        self.assertEqual(1, listener.publisher.send_process_event.call_count)
+        self.assertListEqual([], listener.process_events)
+        listener.publisher.send_process_event.reset_mock()
+        # test process event with batch window and event queue
+        listener.event_queue = Mock()
+        with patch('supvisors.listener.Timer') as mocked_timer:
+            listener.on_process(event)
+            listener.on_process(event)
+            # the timer is started with the first event only
+            self.assertEqual([call(0.02, listener.event_queue.push, ('flush', None))], mocked_timer.call_args_list)
+            self.assertIs(mocked_timer.return_value, listener.batch_timer)
+            self.assertTrue(listener.batch_timer.daemon)
+            self.assertEqual(1, listener.batch_timer.start.call_count)
+        self.assertFalse(listener.publisher.send_process_event.called)
+        self.assertEqual(2, len(listener.process_events))
+        self.assertEqual('dummy_process', listener.process_events[1]['name'])
+
+    def test_flush_process_events(self):
+        """ Test the publication of the process events collected during the batch window. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        listener.publisher = Mock(sequence=5)
+        # test without event
+        listener.flush_process_events()
+        self.assertFalse(listener.publisher.send_process_event.called)
+        self.assertFalse(listener.publisher.send_process_events.called)
+        # test with a single event
+        mocked_timer = listener.batch_timer = Mock()
+        listener.process_events = [{'group': 'appli', 'name': 'dummy_1'}]
+        listener.flush_process_events()
+        self.assertEqual(1, mocked_timer.cancel.call_count)
+        self.assertIsNone(listener.batch_timer)
+        self.assertIsNone(listener.stats_keyframe)
+        self.assertEqual(0, listener.stats_ticks)
+        self.assertEqual([call({'group': 'appli', 'name': 'dummy_1'})], listener.publisher.send_process_event.call_args_list)
+        self.assertFalse(listener.publisher.send_process_events.called)
+        self.assertListEqual([], listener.process_events)
+        self.assertDictEqual({'appli:dummy_1': 5}, listener.process_sequences)
+        listener.publisher.send_process_event.reset_mock()
+        # test with several events
+        listener.publisher.sequence = 6
+        listener.process_events = [{'group': 'appli', 'name': 'dummy_1'}, {'group': 'appli', 'name': 'dummy_2'}]
+        listener.flush_process_events()
+        self.assertFalse(listener.publisher.send_process_event.called)
+        self.assertEqual([call([{'group': 'appli', 'name': 'dummy_1'}, {'group': 'appli', 'name': 'dummy_2'}])],
+                         listener.publisher.send_process_events.call_args_list)
+        self.assertListEqual([], listener.process_events)
+        self.assertDictEqual({'appli:dummy_1': 6, 'appli:dummy_2': 6}, listener.process_sequences)
 
     @patch.dict('sys.modules',
                 **{'supvisors.statscollector': Mock(
@@ -169,6 +250,47 @@ class ListenerTest(unittest.TestCase):
         self.assertEqual([call(['10.0.0.1', '10.0.0.4'])],
                          self.supvisors.zmq.pusher.send_isolate_addresses.call_args_list)
 
+    def test_on_heartbeat(self):
+        """ Test the periodic publication of the heartbeat. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        listener.publisher = Mock()
+        mocked_isolate = self.supvisors.zmq.pusher.send_isolate_addresses
+        # test without node isolated
+        listener.fsm.on_heartbeat_timer.return_value = []
+        listener.on_heartbeat()
+        self.assertEqual([call()], listener.publisher.send_heartbeat.call_args_list)
+        self.assertEqual([call()], listener.fsm.on_heartbeat_timer.call_args_list)
+        self.assertFalse(mocked_isolate.called)
+        # test with nodes isolated
+        listener.fsm.on_heartbeat_timer.return_value = ['10.0.0.2']
+        listener.on_heartbeat()
+        self.assertEqual(2, listener.publisher.send_heartbeat.call_count)
+        self.assertEqual([call(['10.0.0.2'])], mocked_isolate.call_args_list)
+
+    def test_publish_statistics(self):
+        """ Test the publication of the statistics, in full or as delta. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        listener.publisher = Mock()
+        listener.delta_collector = Mock(side_effect=lambda ref, stats: ('delta', ref, stats))
+        # test without keyframe period: all snapshots are published in full
+        for stats in ['stats_1', 'stats_2']:
+            listener.publish_statistics(stats)
+        self.assertEqual([call('stats_1'), call('stats_2')], listener.publisher.send_statistics.call_args_list)
+        self.assertFalse(listener.publisher.send_statistics_delta.called)
+        listener.publisher.send_statistics.reset_mock()
+        # test with keyframe period: a keyframe every 3 ticks
+        self.supvisors.options.stats_keyframe = 3
+        for stats in ['stats_3', 'stats_4', 'stats_5', 'stats_6', 'stats_7']:
+            listener.publish_statistics(stats)
+        self.assertEqual([call('stats_5')], listener.publisher.send_statistics.call_args_list)
+        self.assertEqual([call(('delta', 'stats_2', 'stats_3')), call(('delta', 'stats_2', 'stats_4')),
+                          call(('delta', 'stats_5', 'stats_6')), call(('delta', 'stats_5', 'stats_7'))],
+                         listener.publisher.send_statistics_delta.call_args_list)
+        self.assertEqual('stats_5', listener.stats_keyframe)
+        self.assertEqual(3, listener.stats_ticks)
+
     def test_unstack_event(self):
         """ Test the processing of a Supvisors event. """
         from supvisors.listener import SupervisorListener
@@ -187,12 +309,80 @@ class ListenerTest(unittest.TestCase):
                          listener.fsm.on_process_event.call_args_list)
         self.assertFalse(listener.statistician.push_statistics.called)
         listener.fsm.on_process_event.reset_mock()
+        # test heartbeat
+        listener.unstack_event('[5, "10.0.0.2", 49.5]')
+        self.assertEqual([call('10.0.0.2', 49.5)], listener.fsm.on_heartbeat_event.call_args_list)
+        self.assertFalse(listener.fsm.on_tick_event.called)
+        self.assertFalse(listener.fsm.on_process_event.called)
         # test statistics event
         listener.unstack_event('[2, "10.0.0.3", [0, [[20, 30]], {"lo": [100, 200]}, {}]]')
         self.assertFalse(listener.fsm.on_tick_event.called)
         self.assertFalse(listener.fsm.on_process_event.called)
         self.assertEqual([call('10.0.0.3', [0, [[20, 30]], {"lo": [100, 200]}, {}])],
                          listener.statistician.push_statistics.call_args_list)
+        listener.statistician.push_statistics.reset_mock()
+        # test batch of process events
+        listener.unstack_event('[3, "10.0.0.4", [{"name": "dummy_1"}, {"name": "dummy_2"}]]')
+        self.assertFalse(listener.fsm.on_tick_event.called)
+        self.assertFalse(listener.fsm.on_process_event.called)
+        self.assertFalse(listener.statistician.push_statistics.called)
+        self.assertEqual([call('10.0.0.4', [{"name": "dummy_1"}, {"name": "dummy_2"}])],
+                         listener.fsm.on_process_events.call_args_list)
+        listener.fsm.on_process_events.reset_mock()
+        # test statistics delta event
+        for result in [True, False]:
+            listener.statistician.push_delta_statistics.return_value = result
+            listener.unstack_event('[4, "10.0.0.3", [0, 5, [[20, 30]], 10, {}, [], {}, []]]')
+            self.assertFalse(listener.fsm.on_process_events.called)
+            self.assertFalse(listener.statistician.push_statistics.called)
+            self.assertEqual([call('10.0.0.3', [0, 5, [[20, 30]], 10, {}, [], {}, []])],
+                             listener.statistician.push_delta_statistics.call_args_list)
+            listener.statistician.push_delta_statistics.reset_mock()
+
+    def test_on_queued_event(self):
+        """ Test the reception of an event handed over through the event queue. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        with patch.multiple(listener, process_event=DEFAULT, process_info=DEFAULT):
+            # test unknown type
+            listener.on_queued_event('unknown', None)
+            listener.process_event.assert_not_called()
+            listener.process_info.assert_not_called()
+            listener.fsm.on_authorization.assert_not_called()
+            # test event
+            listener.on_queued_event('event', (2, '10.0.0.3', (0, [(20, 30)], 10, {'lo': (100, 200)}, {})))
+            self.assertEqual([call(2, '10.0.0.3', (0, [(20, 30)], 10, {'lo': (100, 200)}, {}))],
+                             listener.process_event.call_args_list)
+            listener.process_info.assert_not_called()
+            listener.fsm.on_authorization.assert_not_called()
+            listener.process_event.reset_mock()
+            # test info
+            listener.on_queued_event('info', ('10.0.0.4', [{'name': 'dummy'}]))
+            listener.process_event.assert_not_called()
+            self.assertEqual([call('10.0.0.4', [{'name': 'dummy'}])], listener.process_info.call_args_list)
+            listener.fsm.on_authorization.assert_not_called()
+            listener.process_info.reset_mock()
+            # test authorization
+            listener.on_queued_event('auth', ('10.0.0.5', True, '10.0.0.1'))
+            listener.process_event.assert_not_called()
+            listener.process_info.assert_not_called()
+            self.assertEqual([call('10.0.0.5', True, '10.0.0.1')], listener.fsm.on_authorization.call_args_list)
+            # test flush of process events
+            with patch.object(listener, 'flush_process_events') as mocked_flush:
+                listener.on_queued_event('flush', None)
+                self.assertEqual([call()], mocked_flush.call_args_list)
+            # test heartbeat
+            with patch.object(listener, 'on_heartbeat') as mocked_heartbeat:
+                listener.on_queued_event('heartbeat', None)
+                self.assertEqual([call()], mocked_heartbeat.call_args_list)
+            # test snapshot request
+            with patch.object(listener, 'send_snapshot') as mocked_snapshot:
+                listener.on_queued_event('snapshot', '00ab')
+                self.assertEqual([call('00ab')], mocked_snapshot.call_args_list)
+            # test resynchronization
+            with patch.object(listener, 'process_resync') as mocked_resync:
+                listener.on_queued_event('resync', ('10.0.0.4', [{'name': 'dummy'}]))
+                self.assertEqual([call('10.0.0.4', [{'name': 'dummy'}])], mocked_resync.call_args_list)
 
     def test_unstack_info(self):
         """ Test the processing of a Supvisors information. """
@@ -203,6 +393,13 @@ class ListenerTest(unittest.TestCase):
         self.assertEqual([call('10.0.0.4', {"name": "dummy"})],
                          listener.fsm.on_process_info.call_args_list)
 
+    def test_process_resync(self):
+        """ Test the processing of the process information received after a loss of messages. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        listener.process_resync('10.0.0.4', [{'name': 'dummy'}])
+        self.assertEqual([call('10.0.0.4', [{'name': 'dummy'}])], listener.fsm.on_process_resync.call_args_list)
+
     def test_authorization(self):
         """ Test the processing of a Supvisors authorization. """
         from supvisors.listener import SupervisorListener
@@ -246,6 +443,33 @@ class ListenerTest(unittest.TestCase):
             listener.unstack_info.assert_not_called()
             self.assertEqual([call(('10.0.0.1', True))],
                              listener.authorization.call_args_list)
+            # test snapshot request
+            with patch.object(listener, 'send_snapshot') as mocked_snapshot:
+                listener.on_remote_event(Mock(type='snapshot', data='"00ab"'))
+                self.assertEqual([call('00ab')], mocked_snapshot.call_args_list)
+            # test resynchronization
+            with patch.object(listener, 'process_resync') as mocked_resync:
+                listener.on_remote_event(Mock(type='resync', data='["10.0.0.4", [{"name": "dummy"}]]'))
+                self.assertEqual([call('10.0.0.4', [{'name': 'dummy'}])], mocked_resync.call_args_list)
+
+    def test_send_snapshot(self):
+        """ Test the building of the snapshot of the Supvisors state. """
+        from supvisors.listener import SupervisorListener
+        listener = SupervisorListener(self.supvisors)
+        self.supvisors.zmq.publisher.sequence = 28
+        listener.fsm.serial.return_value = {'statename': 'OPERATION'}
+        context = self.supvisors.context
+        context.addresses = {'10.0.0.1': Mock(**{'serial.return_value': 'address_1'})}
+        context.applications = {'appli': Mock(**{'serial.return_value': 'appli'})}
+        context.processes = {'appli:proc_1': Mock(**{'serial.return_value': 'proc_1'}),
+                             'appli:proc_2': Mock(**{'serial.return_value': 'proc_2'})}
+        listener.send_snapshot('00ab')
+        self.assertEqual([call('00ab', {'sequence': 28,
+                                        'supvisors': {'statename': 'OPERATION'},
+                                        'addresses': ['address_1'],
+                                        'applications': ['appli'],
+                                        'processes': ['proc_1', 'proc_2']})],
+                         self.supvisors.zmq.pusher.send_snapshot.call_args_list)
 
     @patch('supvisors.listener.time.time', return_value=56)
     def test_force_process_state(self, mocked_time):
@@ -254,8 +478,12 @@ class ListenerTest(unittest.TestCase):
         listener = SupervisorListener(self.supvisors)
         # patch publisher
         listener.publisher = Mock(**{'send_process_event.return_value': None})
+        listener.process_events = [{'name': 'process', 'group': 'appli'}, {'name': 'process', 'group': 'appli'}]
         # test the call
         listener.force_process_state('appli:process', 200)
+        # the pending events are published before
+        self.assertEqual([call([{'name': 'process', 'group': 'appli'}, {'name': 'process', 'group': 'appli'}])],
+                         listener.publisher.send_process_events.call_args_list)
         self.assertEqual([call({'processname': 'process', 'groupname': 'appli', 'state': 200,
                                 'now': 56, 'pid': 0, 'expected': False})],
                          listener.publisher.send_process_event.call_args_list)
@@ -21,7 +21,7 @@ import sys
 import unittest
 
 from unittest.mock import call, patch, Mock, DEFAULT
-from threading import Thread
+from threading import Barrier, Event, Thread
 
 from supvisors.tests.base import MockedSupvisors, DummyRpcInterface
 
@@ -30,18 +30,21 @@ class MainLoopTest(unittest.TestCase):
     """ Test case for the mainloop module. """
 
     def setUp(self):
-        """ Create a Supvisors-like structure and patch getRPCInterface. """
+        """ Create a Supvisors-like structure and patch getRPCInterface and RPCProxyPool. """
         self.supvisors = MockedSupvisors()
         self.rpc_patch = patch('supvisors.mainloop.getRPCInterface')
         self.mocked_rpc = self.rpc_patch.start()
+        self.pool_patch = patch('supvisors.mainloop.RPCProxyPool')
+        self.mocked_pool = self.pool_patch.start()
 
     def tearDown(self):
-        """ Remove patch of getRPCInterface. """
+        """ Remove patch of getRPCInterface and RPCProxyPool. """
+        self.pool_patch.stop()
         self.rpc_patch.stop()
 
     def test_creation(self):
         """ Test the values set at construction. """
-        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.mainloop import DeferredRequestExecutor, SupvisorsMainLoop
         main_loop = SupvisorsMainLoop(self.supvisors)
         self.assertIsInstance(main_loop, Thread)
         self.assertIs(self.supvisors, main_loop.supvisors)
@@ -53,6 +56,26 @@ class MainLoopTest(unittest.TestCase):
         self.assertEqual(1, self.mocked_rpc.call_count)
         self.assertEqual(call('localhost', main_loop.env),
                          self.mocked_rpc.call_args)
+        self.assertEqual([call(main_loop.env)], self.mocked_pool.call_args_list)
+        self.assertIs(self.mocked_pool.return_value, main_loop.proxies)
+        self.assertIsInstance(main_loop.executor, DeferredRequestExecutor)
+        self.assertEqual(4, main_loop.executor.executor._max_workers)
+        self.assertDictEqual({}, main_loop.batches)
+        self.assertIsNone(main_loop.batch_deadline)
+        self.assertIsNone(main_loop.event_queue)
+        self.assertEqual(0, main_loop.heartbeat_period)
+        self.assertIsNone(main_loop.heartbeat_deadline)
+        # test with event queue
+        main_loop = SupvisorsMainLoop(self.supvisors, 'event queue')
+        self.assertEqual('event queue', main_loop.event_queue)
+        self.assertEqual(0, main_loop.heartbeat_period)
+        # test with heartbeat, that requires the event queue
+        self.supvisors.options.heartbeat_period = 200
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        self.assertEqual(0, main_loop.heartbeat_period)
+        main_loop = SupvisorsMainLoop(self.supvisors, 'event queue')
+        self.assertEqual(0.2, main_loop.heartbeat_period)
+        self.assertIsNone(main_loop.heartbeat_deadline)
 
     def test_stopping(self):
         """ Test the get_loop method. """
@@ -77,31 +100,40 @@ class MainLoopTest(unittest.TestCase):
                 self.assertTrue(main_loop.stop_event.is_set())
                 self.assertEqual(1, mocked_join.call_count)
 
+    @patch('supvisors.mainloop.SupvisorsMainLoop.check_snapshots')
     @patch('supvisors.mainloop.SupvisorsMainLoop.check_events')
     @patch('supvisors.mainloop.SupvisorsMainLoop.check_requests')
     @patch.multiple('supvisors.mainloop.zmq.Poller', register=DEFAULT,
                     unregister=DEFAULT, poll=DEFAULT)
-    def test_run(self, check_evt, check_rqt, register, unregister, poll):
+    def test_run(self, check_evt, check_rqt, check_snap, register, unregister, poll):
         """ Test the running of the main loop thread. """
         from supvisors.mainloop import SupvisorsMainLoop
         main_loop = SupvisorsMainLoop(self.supvisors)
+        mocked_shutdown = main_loop.executor.shutdown = Mock()
         # patch one loops
         with patch.object(main_loop, 'stopping',
                           side_effect=[False, False, True]):
             main_loop.run()
-        # test that register was called twice
-        self.assertEqual(2, register.call_count)
+        # test that register was called three times (including the snapshot server)
+        self.assertEqual(3, register.call_count)
         # test that poll was called once
         self.assertEqual([call(500)], poll.call_args_list)
         # test that check_events was called once
         self.assertEqual(1, check_evt.call_count)
         # test that check_requests was called once
         self.assertEqual(1, check_rqt.call_count)
-        # test that unregister was called twice
-        self.assertEqual(2, unregister.call_count)
+        # test that check_snapshots was called once
+        self.assertEqual(1, check_snap.call_count)
+        # test that unregister was called three times
+        self.assertEqual(3, unregister.call_count)
+        # test that idle proxies were evicted once and that all proxies were closed at the end
+        self.assertEqual(1, main_loop.proxies.evict_idle.call_count)
+        self.assertEqual([call()], main_loop.proxies.close.call_args_list)
+        # test that the executor was shut down
+        self.assertEqual([call()], mocked_shutdown.call_args_list)
 
     @patch('supvisors.mainloop.stderr')
-    @patch('supvisors.mainloop.SupvisorsMainLoop.send_remote_comm_event')
+    @patch('supvisors.mainloop.SupvisorsMainLoop.post_event')
     def test_check_events(self, mocked_send, mocked_stderr):
         """ Test the processing of the events received. """
         from supvisors.mainloop import SupvisorsMainLoop
@@ -121,19 +153,37 @@ class MainLoopTest(unittest.TestCase):
         self.assertEqual(0, mocked_send.call_count)
         mocked_subscriber.receive.reset_mock()
         # test with appropriate socks and without exception
+        mocked_submit = main_loop.executor.submit = Mock()
         mocked_subscriber = Mock(
-            socket='zmq socket', **{'receive.return_value': 'a zmq message'})
+            socket='zmq socket', gap=None, **{'receive.return_value': 'a zmq message'})
         main_loop.check_events(mocked_subscriber, socks)
         self.assertEqual(1, mocked_subscriber.receive.call_count)
-        self.assertEqual([call('event', '"a zmq message"')],
+        self.assertEqual([call('event', 'a zmq message')],
+                         mocked_send.call_args_list)
+        self.assertFalse(mocked_submit.called)
+        mocked_send.reset_mock()
+        # test with messages lost before the message received
+        mocked_subscriber.gap = ('10.0.0.2', 12)
+        main_loop.check_events(mocked_subscriber, socks)
+        self.assertEqual([call('event', 'a zmq message')], mocked_send.call_args_list)
+        self.assertEqual([call('10.0.0.2', main_loop.resync_address, '10.0.0.2', 12)],
+                         mocked_submit.call_args_list)
+        mocked_send.reset_mock()
+        # test that the heartbeat is stamped on reception
+        from supvisors.utils import InternalEventHeaders
+        mocked_subscriber = Mock(socket='zmq socket', gap=None,
+                                 **{'receive.return_value': (InternalEventHeaders.HEARTBEAT, '10.0.0.2', None)})
+        with patch('supvisors.mainloop.monotonic', return_value=49.5):
+            main_loop.check_events(mocked_subscriber, socks)
+        self.assertEqual([call('event', (InternalEventHeaders.HEARTBEAT, '10.0.0.2', 49.5))],
                          mocked_send.call_args_list)
 
     @patch('supvisors.mainloop.stderr')
-    @patch('supvisors.mainloop.SupvisorsMainLoop.send_request')
-    def test_check_requests(self, mocked_send, mocked_stderr):
+    def test_check_requests(self, mocked_stderr):
         """ Test the processing of the requests received. """
         from supvisors.mainloop import SupvisorsMainLoop
         main_loop = SupvisorsMainLoop(self.supvisors)
+        mocked_send = main_loop.executor.submit = Mock()
         # mock parameters
         mocked_sockets = Mock(
             puller=Mock(socket='zmq socket',
@@ -156,68 +206,312 @@ class MainLoopTest(unittest.TestCase):
         mocked_receive.reset_mock()
         # test with appropriate socks and without exception
         mocked_receive.side_effect = None
-        mocked_receive.return_value = ('a zmq header', 'a zmq message')
+        mocked_receive.return_value = ('a zmq header', ('10.0.0.1', 'a zmq message'))
         main_loop.check_requests(mocked_sockets, socks)
-        self.assertEqual([call('a zmq header', 'a zmq message')],
+        self.assertEqual([call('10.0.0.1', main_loop.send_request, 'a zmq header', ('10.0.0.1', 'a zmq message'))],
                          mocked_send.call_args_list)
         self.assertEqual(0, mocked_disconnect.call_count)
         mocked_receive.reset_mock()
         mocked_send.reset_mock()
+        # test start and stop requests: batched
+        with patch.object(main_loop, 'batch_request') as mocked_batch:
+            for header in [2, 3]:
+                mocked_receive.return_value = (header, ('10.0.0.1', 'dummy_process'))
+                main_loop.check_requests(mocked_sockets, socks)
+                self.assertEqual([call(header, ('10.0.0.1', 'dummy_process'))], mocked_batch.call_args_list)
+                self.assertEqual(0, mocked_send.call_count)
+                mocked_batch.reset_mock()
+        # test other request: the batch of the node is sent before
+        main_loop.batches = {'10.0.0.1': [(2, ('10.0.0.1', 'dummy_process', ''))]}
+        mocked_receive.return_value = (0, ('10.0.0.1',))
+        main_loop.check_requests(mocked_sockets, socks)
+        self.assertEqual([call('10.0.0.1', main_loop.send_request, 2, ('10.0.0.1', 'dummy_process', '')),
+                          call('10.0.0.1', main_loop.send_request, 0, ('10.0.0.1',))],
+                         mocked_send.call_args_list)
+        self.assertDictEqual({}, main_loop.batches)
+        mocked_receive.reset_mock()
+        mocked_send.reset_mock()
         # test disconnection request
         mocked_receive.return_value = (1, 'an address')
         main_loop.check_requests(mocked_sockets, socks)
         self.assertEqual(1, mocked_receive.call_count)
         self.assertEqual([call('an address')],
                          mocked_disconnect.call_args_list)
+        self.assertEqual([call('an address')], main_loop.proxies.close.call_args_list)
+        self.assertEqual(0, mocked_send.call_count)
+        mocked_receive.reset_mock()
+        # test snapshot request: the snapshot is sent to the requester
+        mocked_receive.return_value = (6, ('00ab', {'sequence': 12}))
+        main_loop.check_requests(mocked_sockets, socks)
+        self.assertEqual([call(b'\x00\xab', {'sequence': 12})], mocked_sockets.snapshot_server.send.call_args_list)
         self.assertEqual(0, mocked_send.call_count)
 
     @patch('supvisors.mainloop.stderr')
-    @patch('supvisors.mainloop.SupvisorsMainLoop.send_remote_comm_event')
+    @patch('supvisors.mainloop.SupvisorsMainLoop.post_event')
+    def test_check_snapshots(self, mocked_post, mocked_stderr):
+        """ Test the processing of the snapshot requests received. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        # test without snapshot server
+        main_loop.check_snapshots(None, {})
+        self.assertFalse(mocked_post.called)
+        # test with empty socks
+        mocked_server = Mock(socket='zmq socket', **{'receive.side_effect': Exception})
+        main_loop.check_snapshots(mocked_server, {})
+        self.assertFalse(mocked_server.receive.called)
+        self.assertFalse(mocked_post.called)
+        # test with appropriate socks but with exception
+        socks = {'zmq socket': 1}
+        main_loop.check_snapshots(mocked_server, socks)
+        self.assertEqual(1, mocked_server.receive.call_count)
+        self.assertFalse(mocked_post.called)
+        # test with appropriate socks and without exception
+        mocked_server.receive.side_effect = None
+        mocked_server.receive.return_value = b'\x00\xab'
+        main_loop.check_snapshots(mocked_server, socks)
+        self.assertEqual([call('snapshot', '00ab')], mocked_post.call_args_list)
+
+    @patch('supvisors.mainloop.stderr')
+    @patch('supvisors.mainloop.SupvisorsMainLoop.post_event')
     def test_check_address(self, mocked_evt: Mock, mocked_stderr: Mock):
         """ Test the protocol to get the processes handled by a remote Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
-        from supvisors.ttypes import AddressStates
         main_loop = SupvisorsMainLoop(self.supvisors)
+        mocked_proxy = main_loop.proxies.proxy
+        rpc_intf = mocked_proxy.return_value.__enter__.return_value
+        # test rpc error: no event is sent to local Supervisor
+        with patch.object(main_loop, 'get_handshake', side_effect=Exception) as mocked_handshake:
+            main_loop.check_address('10.0.0.1')
+            self.assertEqual([call('10.0.0.1')], mocked_proxy.call_args_list)
+            self.assertEqual([call(rpc_intf, '10.0.0.1')], mocked_handshake.call_args_list)
+            self.assertEqual(0, mocked_evt.call_count)
+        mocked_proxy.reset_mock()
+        # test with address in isolation
+        with patch.object(main_loop, 'get_handshake', return_value=('10.0.0.5', False, None)):
+            main_loop.check_address('10.0.0.1')
+            self.assertEqual([call('10.0.0.1')], mocked_proxy.call_args_list)
+            self.assertEqual([call('auth', ('10.0.0.1', False, '10.0.0.5'))], mocked_evt.call_args_list)
+        mocked_proxy.reset_mock()
+        mocked_evt.reset_mock()
+        # test with address not in isolation
+        dummy_info = [{'name': 'proc', 'group': 'appli', 'state': 10, 'start': 5,
+                       'now': 10, 'pid': 1234, 'spawnerr': ''}]
+        with patch.object(main_loop, 'get_handshake', return_value=('10.0.0.5', True, dummy_info)):
+            main_loop.check_address('10.0.0.1')
+            self.assertEqual([call('10.0.0.1')], mocked_proxy.call_args_list)
+            self.assertEqual([call('info', ('10.0.0.1', dummy_info)),
+                              call('auth', ('10.0.0.1', True, '10.0.0.5'))],
+                             mocked_evt.call_args_list)
+
+    @patch('supvisors.mainloop.stderr')
+    @patch('supvisors.mainloop.SupvisorsMainLoop.post_event')
+    def test_resync_address(self, mocked_evt: Mock, mocked_stderr: Mock):
+        """ Test the protocol to get the processes of a remote Supervisor that have changed. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        mocked_proxy = main_loop.proxies.proxy
+        rpc_intf = mocked_proxy.return_value.__enter__.return_value.supvisors
         # test rpc error: no event is sent to local Supervisor
-        self.mocked_rpc.side_effect = Exception
-        main_loop.check_address('10.0.0.1')
-        self.assertEqual(2, self.mocked_rpc.call_count)
-        self.assertEqual(call('10.0.0.1', main_loop.env), self.mocked_rpc.call_args)
+        rpc_intf.get_local_process_info_since.side_effect = Exception
+        main_loop.resync_address('10.0.0.1', 12)
+        self.assertEqual([call('10.0.0.1')], mocked_proxy.call_args_list)
+        self.assertEqual([call(12)], rpc_intf.get_local_process_info_since.call_args_list)
         self.assertEqual(0, mocked_evt.call_count)
-        # test with a mocked rpc interface
+        rpc_intf.get_local_process_info_since.reset_mock()
+        # test normal behaviour
+        dummy_info = [{'name': 'proc', 'group': 'appli', 'state': 10}]
+        rpc_intf.get_local_process_info_since.side_effect = None
+        rpc_intf.get_local_process_info_since.return_value = dummy_info
+        main_loop.resync_address('10.0.0.1', 12)
+        self.assertEqual([call(12)], rpc_intf.get_local_process_info_since.call_args_list)
+        self.assertEqual([call('resync', ('10.0.0.1', dummy_info))], mocked_evt.call_args_list)
+        rpc_intf.get_local_process_info_since.reset_mock()
+        mocked_evt.reset_mock()
+        # test with an older Supvisors version
+        main_loop.legacy_addresses.add('10.0.0.1')
+        rpc_intf.get_all_local_process_info.return_value = dummy_info
+        main_loop.resync_address('10.0.0.1', 12)
+        self.assertFalse(rpc_intf.get_local_process_info_since.called)
+        self.assertEqual([call()], rpc_intf.get_all_local_process_info.call_args_list)
+        self.assertEqual([call('resync', ('10.0.0.1', dummy_info))], mocked_evt.call_args_list)
+
+    def test_get_handshake(self):
+        """ Test the composite and legacy protocols to get the master, the authorization and the process info. """
+        import json
+        import zlib
+        from supervisor.compat import xmlrpclib
+        from supervisor.xmlrpc import Faults
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.ttypes import AddressStates
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        self.assertSetEqual(set(), main_loop.legacy_addresses)
         dummy_info = [{'name': 'proc', 'group': 'appli', 'state': 10, 'start': 5,
                        'now': 10, 'pid': 1234, 'spawnerr': ''}]
         rpc_intf = DummyRpcInterface()
-        mocked_all = rpc_intf.supervisor.getAllProcessInfo = Mock()
-        mocked_local = rpc_intf.supvisors.get_all_local_process_info = Mock(return_value=dummy_info)
+        mocked_handshake = rpc_intf.supvisors.get_node_handshake = Mock()
+        mocked_master = rpc_intf.supvisors.get_master_address = Mock(return_value='10.0.0.5')
         mocked_addr = rpc_intf.supvisors.get_address_info = Mock()
-        rpc_intf.supvisors.get_master_address = Mock(return_value='10.0.0.5')
-        self.mocked_rpc.return_value = rpc_intf
-        self.mocked_rpc.side_effect = None
-        self.mocked_rpc.reset_mock()
-        # test with address in isolation
+        mocked_local = rpc_intf.supvisors.get_all_local_process_info = Mock(return_value=dummy_info)
+        # test composite protocol
+        mocked_handshake.return_value = {'master_address': '10.0.0.5', 'authorized': True,
+                                         'process_info': xmlrpclib.Binary(zlib.compress(
+                                             json.dumps(dummy_info).encode('utf-8')))}
+        self.assertTupleEqual(('10.0.0.5', True, dummy_info), main_loop.get_handshake(rpc_intf, '10.0.0.1'))
+        self.assertEqual([call('10.0.0.1', True)], mocked_handshake.call_args_list)
+        self.assertFalse(mocked_master.called)
+        mocked_handshake.reset_mock()
+        # test unexpected fault
+        mocked_handshake.side_effect = xmlrpclib.Fault(Faults.BAD_NAME, 'BAD_NAME')
+        with self.assertRaises(xmlrpclib.Fault):
+            main_loop.get_handshake(rpc_intf, '10.0.0.1')
+        self.assertSetEqual(set(), main_loop.legacy_addresses)
+        mocked_handshake.reset_mock()
+        # test remote not supporting the composite protocol
+        mocked_handshake.side_effect = xmlrpclib.Fault(Faults.UNKNOWN_METHOD, 'UNKNOWN_METHOD')
         for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
             mocked_addr.return_value = {'statecode': state}
-            main_loop.check_address('10.0.0.1')
-            self.assertEqual([call('10.0.0.1', main_loop.env)], self.mocked_rpc.call_args_list)
-            self.assertEqual([call('auth', 'address_name:10.0.0.1 authorized:False master_address:10.0.0.5')],
-                             mocked_evt.call_args_list)
-            self.assertFalse(mocked_all.called)
-            # reset counters
-            mocked_evt.reset_mock()
-            self.mocked_rpc.reset_mock()
-        # test with address not in isolation
+            self.assertTupleEqual(('10.0.0.5', False, None), main_loop.get_handshake(rpc_intf, '10.0.0.1'))
+            self.assertSetEqual({'10.0.0.1'}, main_loop.legacy_addresses)
+            self.assertEqual([call('10.0.0.1')], mocked_addr.call_args_list)
+            self.assertFalse(mocked_local.called)
+            mocked_addr.reset_mock()
+        self.assertEqual(1, mocked_handshake.call_count)
         for state in [AddressStates.UNKNOWN, AddressStates.CHECKING, AddressStates.RUNNING, AddressStates.SILENT]:
             mocked_addr.return_value = {'statecode': state}
-            main_loop.check_address('10.0.0.1')
-            self.assertEqual(1, self.mocked_rpc.call_count)
-            self.assertEqual(call('10.0.0.1', main_loop.env), self.mocked_rpc.call_args)
-            self.assertEqual(2, mocked_evt.call_count)
+            self.assertTupleEqual(('10.0.0.5', True, dummy_info), main_loop.get_handshake(rpc_intf, '10.0.0.1'))
             self.assertEqual(1, mocked_local.call_count)
-            # reset counters
-            mocked_evt.reset_mock()
             mocked_local.reset_mock()
-            self.mocked_rpc.reset_mock()
+        # the composite protocol is not tried again
+        self.assertEqual(1, mocked_handshake.call_count)
+
+    def check_remote_call(self, main_loop, request, args, rpc_namespace, rpc_method, rpc_args):
+        """ Test the protocol of a XML-RPC sent to a remote Supervisor through the pool of proxies. """
+        mocked_proxy = main_loop.proxies.proxy
+        # test rpc error
+        mocked_proxy.side_effect = Exception
+        request('10.0.0.1', *args)
+        self.assertEqual([call('10.0.0.1')], mocked_proxy.call_args_list)
+        mocked_proxy.reset_mock()
+        # test with a mocked rpc interface
+        rpc_intf = DummyRpcInterface()
+        mocked_proxy.side_effect = None
+        mocked_proxy.return_value.__enter__.return_value = rpc_intf
+        with patch.object(getattr(rpc_intf, rpc_namespace), rpc_method) as mocked_rpc:
+            request('10.0.0.1', *args)
+            self.assertEqual([call('10.0.0.1')], mocked_proxy.call_args_list)
+            self.assertEqual([call(*rpc_args)], mocked_rpc.call_args_list)
+
+    @patch('supvisors.mainloop.monotonic', return_value=100)
+    def test_batch_request(self, _):
+        """ Test the collection of the start and stop requests. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        self.assertEqual(500, main_loop.get_poll_timeout())
+        # the first request starts the batch window
+        main_loop.batch_request(2, ('10.0.0.1', 'dummy_process_1', ''))
+        self.assertEqual(100 + SupvisorsMainLoop.BATCH_WINDOW, main_loop.batch_deadline)
+        self.assertEqual(int(SupvisorsMainLoop.BATCH_WINDOW * 1000), main_loop.get_poll_timeout())
+        # the next requests do not change the batch window
+        with patch('supvisors.mainloop.monotonic', return_value=100.02):
+            main_loop.batch_request(3, ('10.0.0.2', 'dummy_process_2'))
+            main_loop.batch_request(3, ('10.0.0.1', 'dummy_process_3'))
+            self.assertEqual(100 + SupvisorsMainLoop.BATCH_WINDOW, main_loop.batch_deadline)
+            self.assertAlmostEqual((SupvisorsMainLoop.BATCH_WINDOW - 0.02) * 1000, main_loop.get_poll_timeout(),
+                                   delta=1)
+        self.assertDictEqual({'10.0.0.1': [(2, ('10.0.0.1', 'dummy_process_1', '')),
+                                           (3, ('10.0.0.1', 'dummy_process_3'))],
+                              '10.0.0.2': [(3, ('10.0.0.2', 'dummy_process_2'))]},
+                             main_loop.batches)
+        # the poll timeout cannot be negative
+        with patch('supvisors.mainloop.monotonic', return_value=101):
+            self.assertEqual(0, main_loop.get_poll_timeout())
+        # the nearest deadline is considered
+        main_loop.heartbeat_deadline = 100
+        with patch('supvisors.mainloop.monotonic', return_value=99.75):
+            self.assertEqual(250, main_loop.get_poll_timeout())
+        main_loop.batch_deadline = None
+        main_loop.heartbeat_deadline = 101
+        with patch('supvisors.mainloop.monotonic', return_value=100.75):
+            self.assertEqual(250, main_loop.get_poll_timeout())
+        # the poll timeout never exceeds the default one
+        with patch('supvisors.mainloop.monotonic', return_value=99):
+            self.assertEqual(500, main_loop.get_poll_timeout())
+
+    def test_check_heartbeat(self):
+        """ Test the triggering of the heartbeats. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        self.supvisors.options.heartbeat_period = 200
+        main_loop = SupvisorsMainLoop(self.supvisors, Mock())
+        mocked_push = main_loop.event_queue.push
+        # test without deadline
+        main_loop.check_heartbeat()
+        self.assertFalse(mocked_push.called)
+        # test with period not over
+        main_loop.heartbeat_deadline = 100
+        with patch('supvisors.mainloop.monotonic', return_value=99.99):
+            main_loop.check_heartbeat()
+        self.assertFalse(mocked_push.called)
+        self.assertEqual(100, main_loop.heartbeat_deadline)
+        # test with period over
+        with patch('supvisors.mainloop.monotonic', return_value=100.05):
+            main_loop.check_heartbeat()
+        self.assertEqual([call('heartbeat', None)], mocked_push.call_args_list)
+        self.assertAlmostEqual(100.2, main_loop.heartbeat_deadline)
+        mocked_push.reset_mock()
+        # test with loop delayed by more than a period
+        with patch('supvisors.mainloop.monotonic', return_value=101):
+            main_loop.check_heartbeat()
+        self.assertEqual([call('heartbeat', None)], mocked_push.call_args_list)
+        self.assertAlmostEqual(101.2, main_loop.heartbeat_deadline)
+
+    def test_check_batches(self):
+        """ Test the sending of the batches when the batch window is over. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        mocked_send = main_loop.executor.submit = Mock()
+        # test without batch
+        main_loop.check_batches()
+        self.assertEqual(0, mocked_send.call_count)
+        # test with batches and window not over
+        requests = [(2, ('10.0.0.1', 'dummy_process_1', '')), (3, ('10.0.0.1', 'dummy_process_3'))]
+        main_loop.batches = {'10.0.0.1': requests, '10.0.0.2': [(3, ('10.0.0.2', 'dummy_process_2'))]}
+        main_loop.batch_deadline = 100
+        with patch('supvisors.mainloop.monotonic', return_value=99.99):
+            main_loop.check_batches()
+        self.assertEqual(0, mocked_send.call_count)
+        # test with batches and window over
+        with patch('supvisors.mainloop.monotonic', return_value=100):
+            main_loop.check_batches()
+        self.assertEqual([call('10.0.0.1', main_loop.multicall, '10.0.0.1', requests),
+                          call('10.0.0.2', main_loop.send_request, 3, ('10.0.0.2', 'dummy_process_2'))],
+                         mocked_send.call_args_list)
+        self.assertDictEqual({}, main_loop.batches)
+        self.assertIsNone(main_loop.batch_deadline)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_multicall(self, mocked_stderr):
+        """ Test the protocol to start and stop processes in a single XML-RPC. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        mocked_proxy = main_loop.proxies.proxy
+        requests = [(2, ('10.0.0.1', 'dummy_process_1', '-x 1')), (3, ('10.0.0.1', 'dummy_process_2'))]
+        expected = [{'methodName': 'supvisors.start_args', 'params': ['dummy_process_1', '-x 1', False]},
+                    {'methodName': 'supervisor.stopProcess', 'params': ['dummy_process_2', False]}]
+        # test rpc error
+        mocked_proxy.side_effect = Exception
+        main_loop.multicall('10.0.0.1', requests)
+        self.assertEqual([call('10.0.0.1')], mocked_proxy.call_args_list)
+        self.assertTrue(mocked_stderr.write.called)
+        mocked_proxy.reset_mock()
+        # test with a mocked rpc interface and a fault on one of the calls
+        mocked_proxy.side_effect = None
+        mocked_multicall = mocked_proxy.return_value.__enter__.return_value.system.multicall
+        mocked_multicall.return_value = [True, {'faultCode': 70, 'faultString': 'NOT_RUNNING'}]
+        with patch('builtins.print') as mocked_print:
+            main_loop.multicall('10.0.0.1', requests)
+            self.assertEqual([call(expected)], mocked_multicall.call_args_list)
+            self.assertEqual(1, mocked_print.call_count)
+            self.assertIn('dummy_process_2', mocked_print.call_args[0][0])
 
     @patch('supvisors.mainloop.stderr')
     def test_start_process(self, mocked_stderr):
@@ -225,25 +519,8 @@ class MainLoopTest(unittest.TestCase):
         Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
         main_loop = SupvisorsMainLoop(self.supvisors)
-        # test rpc error
-        self.mocked_rpc.side_effect = Exception
-        main_loop.start_process('10.0.0.1', 'dummy_process', 'extra args')
-        self.assertEqual(2, self.mocked_rpc.call_count)
-        self.assertEqual(call('10.0.0.1', main_loop.env),
-                         self.mocked_rpc.call_args)
-        # test with a mocked rpc interface
-        rpc_intf = DummyRpcInterface()
-        self.mocked_rpc.side_effect = None
-        self.mocked_rpc.return_value = rpc_intf
-        with patch.object(rpc_intf.supvisors,
-                          'start_args') as mocked_supvisors:
-            main_loop.start_process('10.0.0.1', 'dummy_process', 'extra args')
-            self.assertEqual(3, self.mocked_rpc.call_count)
-            self.assertEqual(call('10.0.0.1', main_loop.env),
-                             self.mocked_rpc.call_args)
-            self.assertEqual(1, mocked_supvisors.call_count)
-            self.assertEqual(call('dummy_process', 'extra args', False),
-                             mocked_supvisors.call_args)
+        self.check_remote_call(main_loop, main_loop.start_process, ('dummy_process', 'extra args'),
+                               'supvisors', 'start_args', ('dummy_process', 'extra args', False))
 
     @patch('supvisors.mainloop.stderr')
     def test_stop_process(self, mocked_stderr):
@@ -251,72 +528,50 @@ class MainLoopTest(unittest.TestCase):
         Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
         main_loop = SupvisorsMainLoop(self.supvisors)
-        # test rpc error
-        self.mocked_rpc.side_effect = Exception
-        main_loop.stop_process('10.0.0.1', 'dummy_process')
-        self.assertEqual(2, self.mocked_rpc.call_count)
-        self.assertEqual(call('10.0.0.1', main_loop.env),
-                         self.mocked_rpc.call_args)
-        # test with a mocked rpc interface
-        rpc_intf = DummyRpcInterface()
-        self.mocked_rpc.side_effect = None
-        self.mocked_rpc.return_value = rpc_intf
-        with patch.object(rpc_intf.supervisor,
-                          'stopProcess') as mocked_supervisor:
-            main_loop.stop_process('10.0.0.1', 'dummy_process')
-            self.assertEqual(3, self.mocked_rpc.call_count)
-            self.assertEqual(call('10.0.0.1', main_loop.env),
-                             self.mocked_rpc.call_args)
-            self.assertEqual(1, mocked_supervisor.call_count)
-            self.assertEqual(call('dummy_process', False),
-                             mocked_supervisor.call_args)
+        self.check_remote_call(main_loop, main_loop.stop_process, ('dummy_process',),
+                               'supervisor', 'stopProcess', ('dummy_process', False))
 
     @patch('supvisors.mainloop.stderr')
     def test_restart(self, mocked_stderr):
         """ Test the protocol to restart a remote Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
         main_loop = SupvisorsMainLoop(self.supvisors)
-        # test rpc error
-        self.mocked_rpc.side_effect = Exception
-        main_loop.restart('10.0.0.1')
-        self.assertEqual(2, self.mocked_rpc.call_count)
-        self.assertEqual(call('10.0.0.1', main_loop.env),
-                         self.mocked_rpc.call_args)
-        # test with a mocked rpc interface
-        rpc_intf = DummyRpcInterface()
-        self.mocked_rpc.side_effect = None
-        self.mocked_rpc.return_value = rpc_intf
-        with patch.object(rpc_intf.supervisor,
-                          'restart') as mocked_supervisor:
-            main_loop.restart('10.0.0.1')
-            self.assertEqual(3, self.mocked_rpc.call_count)
-            self.assertEqual(call('10.0.0.1', main_loop.env),
-                             self.mocked_rpc.call_args)
-            self.assertEqual(1, mocked_supervisor.call_count)
-            self.assertEqual(call(), mocked_supervisor.call_args)
+        self.check_remote_call(main_loop, main_loop.restart, (), 'supervisor', 'restart', ())
 
     @patch('supvisors.mainloop.stderr')
     def test_shutdown(self, mocked_stderr):
         """ Test the protocol to shutdown a remote Supervisor. """
         from supvisors.mainloop import SupvisorsMainLoop
         main_loop = SupvisorsMainLoop(self.supvisors)
-        # test rpc error
-        self.mocked_rpc.side_effect = Exception
-        main_loop.shutdown('10.0.0.1')
-        self.assertEqual(2, self.mocked_rpc.call_count)
-        self.assertEqual(call('10.0.0.1', main_loop.env),
-                         self.mocked_rpc.call_args)
-        # test with a mocked rpc interface
-        rpc_intf = DummyRpcInterface()
-        self.mocked_rpc.side_effect = None
-        self.mocked_rpc.return_value = rpc_intf
-        with patch.object(rpc_intf.supervisor, 'shutdown') as mocked_shutdown:
-            main_loop.shutdown('10.0.0.1')
-            self.assertEqual(3, self.mocked_rpc.call_count)
-            self.assertEqual(call('10.0.0.1', main_loop.env),
-                             self.mocked_rpc.call_args)
-            self.assertEqual(1, mocked_shutdown.call_count)
-            self.assertEqual(call(), mocked_shutdown.call_args)
+        self.check_remote_call(main_loop, main_loop.shutdown, (), 'supervisor', 'shutdown', ())
+
+    @patch('supvisors.mainloop.SupvisorsMainLoop.send_remote_comm_event')
+    def test_post_event(self, mocked_send):
+        """ Test the handover of an event to the Supervisor thread. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        # test without event queue: fallback to RemoteCommunicationEvent
+        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop.post_event('event', (0, '10.0.0.1', {'when': 1234}))
+        main_loop.post_event('info', ('10.0.0.1', [{'name': 'dummy'}]))
+        main_loop.post_event('auth', ('10.0.0.1', True, '10.0.0.2'))
+        self.assertEqual([call('event', '[0, "10.0.0.1", {"when": 1234}]'),
+                          call('info', '["10.0.0.1", [{"name": "dummy"}]]'),
+                          call('auth', 'address_name:10.0.0.1 authorized:True master_address:10.0.0.2')],
+                         mocked_send.call_args_list)
+        mocked_send.reset_mock()
+        # test with event queue accepting the event
+        mocked_queue = Mock(**{'push.return_value': True})
+        main_loop = SupvisorsMainLoop(self.supvisors, mocked_queue)
+        main_loop.post_event('event', (0, '10.0.0.1', {'when': 1234}))
+        self.assertEqual([call('event', (0, '10.0.0.1', {'when': 1234}))], mocked_queue.push.call_args_list)
+        self.assertFalse(mocked_send.called)
+        mocked_queue.push.reset_mock()
+        # test with event queue rejecting the event
+        mocked_queue.push.return_value = False
+        main_loop.post_event('auth', ('10.0.0.1', False, ''))
+        self.assertEqual([call('auth', ('10.0.0.1', False, ''))], mocked_queue.push.call_args_list)
+        self.assertEqual([call('auth', 'address_name:10.0.0.1 authorized:False master_address:')],
+                         mocked_send.call_args_list)
 
     @patch('supvisors.mainloop.stderr')
     def test_comm_event(self, mocked_stderr):
@@ -380,6 +635,109 @@ class MainLoopTest(unittest.TestCase):
                             ('10.0.0.2',))
 
 
+class DeferredRequestExecutorTest(unittest.TestCase):
+    """ Test case for the DeferredRequestExecutor class of the mainloop module. """
+
+    def setUp(self):
+        """ Create the executor. """
+        from supvisors.mainloop import DeferredRequestExecutor
+        self.executor = DeferredRequestExecutor(2)
+
+    def tearDown(self):
+        """ Shutdown the executor. """
+        self.executor.shutdown()
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        from concurrent.futures import ThreadPoolExecutor
+        self.assertIsInstance(self.executor.executor, ThreadPoolExecutor)
+        self.assertEqual(2, self.executor.executor._max_workers)
+        self.assertDictEqual({}, self.executor.pending)
+        self.assertSetEqual(set(), self.executor.futures)
+
+    def test_per_node_ordering(self):
+        """ Test that the requests to the same node are executed in sequence,
+        while a blocked node does not delay the other nodes. """
+        blocker, done = Event(), Event()
+        results = []
+        # block the first node
+        self.executor.submit('10.0.0.1', blocker.wait, 5)
+        for idx in range(3):
+            self.executor.submit('10.0.0.1', results.append, ('10.0.0.1', idx))
+        self.assertEqual(3, len(self.executor.pending['10.0.0.1']))
+        # the requests to the second node are not delayed
+        for idx in range(3):
+            self.executor.submit('10.0.0.2', results.append, ('10.0.0.2', idx))
+        self.executor.submit('10.0.0.2', done.set)
+        self.assertTrue(done.wait(5))
+        self.assertEqual([('10.0.0.2', 0), ('10.0.0.2', 1), ('10.0.0.2', 2)], results)
+        # unblock the first node
+        done.clear()
+        self.executor.submit('10.0.0.1', done.set)
+        blocker.set()
+        self.assertTrue(done.wait(5))
+        self.assertEqual([('10.0.0.1', 0), ('10.0.0.1', 1), ('10.0.0.1', 2)], results[3:])
+        # pending is emptied once all requests are completed
+        self.executor.executor.shutdown(wait=True)
+        self.assertDictEqual({}, self.executor.pending)
+
+    def test_fanout(self):
+        """ Test that the requests to different nodes are executed concurrently, up to the fan-out,
+        and that the result of every node is available as soon as its request is completed. """
+        # the barrier is passed only if both nodes are requested at the same time
+        barrier = Barrier(2, timeout=5)
+        done = Event()
+        results = []
+
+        def handshake(address_name):
+            barrier.wait()
+            results.append(address_name)
+        self.executor.submit('10.0.0.1', handshake, '10.0.0.1')
+        self.executor.submit('10.0.0.2', handshake, '10.0.0.2')
+        # the third node is requested when a worker thread is released
+        self.executor.submit('10.0.0.3', done.set)
+        self.assertTrue(done.wait(5))
+        self.executor.executor.shutdown(wait=True)
+        self.assertFalse(barrier.broken)
+        self.assertCountEqual(['10.0.0.1', '10.0.0.2'], results)
+
+    @patch('supvisors.mainloop.stderr')
+    def test_failure(self, mocked_stderr):
+        """ Test that a failing request does not prevent the next ones. """
+        done = Event()
+        self.executor.submit('10.0.0.1', Mock(side_effect=Exception))
+        self.executor.submit('10.0.0.1', done.set)
+        self.assertTrue(done.wait(5))
+
+    def test_shutdown(self):
+        """ Test that the pending requests are cancelled on shutdown. """
+        blocker = Event()
+        mocked_job = Mock()
+        self.executor.submit('10.0.0.1', blocker.wait, 5)
+        self.executor.submit('10.0.0.1', mocked_job)
+        self.executor.shutdown()
+        blocker.set()
+        self.executor.executor.shutdown(wait=True)
+        self.assertFalse(mocked_job.called)
+
+    def test_shutdown_submitted(self):
+        """ Test that the requests submitted to the pool but not started yet are cancelled on shutdown. """
+        blockers = [Event(), Event()]
+        mocked_job = Mock()
+        # block both worker threads
+        for idx, blocker in enumerate(blockers):
+            self.executor.submit('10.0.0.{}'.format(idx), blocker.wait, 5)
+        # the request to a third node waits for a worker thread in the pool
+        self.executor.submit('10.0.0.3', mocked_job)
+        self.assertEqual(3, len(self.executor.futures))
+        self.executor.shutdown()
+        for blocker in blockers:
+            blocker.set()
+        self.executor.executor.shutdown(wait=True)
+        self.assertFalse(mocked_job.called)
+        self.assertSetEqual(set(), self.executor.futures)
+
+
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
 
@@ -40,13 +40,21 @@ class SupvisorsOptionsTest(unittest.TestCase):
         self.assertIsNone(opt.rules_file)
         self.assertIsNone(opt.internal_port)
         self.assertIsNone(opt.event_port)
+        self.assertIsNone(opt.snapshot_port)
+        self.assertIsNone(opt.internal_codec)
+        self.assertIsNone(opt.process_batch_window)
+        self.assertIsNone(opt.request_fanout)
+        self.assertIsNone(opt.heartbeat_period)
+        self.assertIsNone(opt.phi_threshold)
         self.assertIsNone(opt.auto_fence)
         self.assertIsNone(opt.synchro_timeout)
         self.assertIsNone(opt.force_synchro_if)
+        self.assertIsNone(opt.membership_file)
         self.assertIsNone(opt.conciliation_strategy)
         self.assertIsNone(opt.starting_strategy)
         self.assertIsNone(opt.stats_periods)
         self.assertIsNone(opt.stats_histo)
+        self.assertIsNone(opt.stats_keyframe)
         self.assertIsNone(opt.stats_irix_mode)
         self.assertIsNone(opt.logfile)
         self.assertIsNone(opt.logfile_maxbytes)
@@ -58,9 +66,10 @@ class SupvisorsOptionsTest(unittest.TestCase):
         from supvisors.options import SupvisorsOptions
         opt = SupvisorsOptions()
         self.assertEqual('address_list=None rules_file=None '
-                         'internal_port=None event_port=None auto_fence=None '
-                         'synchro_timeout=None force_synchro_if=None conciliation_strategy=None '
-                         'starting_strategy=None stats_periods=None stats_histo=None '
+                         'internal_port=None event_port=None snapshot_port=None internal_codec=None process_batch_window=None '
+                         'request_fanout=None auto_fence=None heartbeat_period=None phi_threshold=None '
+                         'synchro_timeout=None force_synchro_if=None membership_file=None conciliation_strategy=None '
+                         'starting_strategy=None stats_periods=None stats_histo=None stats_keyframe=None '
                          'stats_irix_mode=None logfile=None logfile_maxbytes=None '
                          'logfile_backups=None loglevel=None', str(opt))
 
@@ -102,6 +111,75 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
         self.assertEqual(15, SupvisorsServerOptions.to_timeout('15'))
         self.assertEqual(1200, SupvisorsServerOptions.to_timeout('1200'))
 
+    def test_batch_window(self):
+        """ Test the conversion of a string to a batch window. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('process_batch_window')
+        # test invalid values
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_batch_window('-1')
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_batch_window('1001')
+        # test valid values
+        self.assertEqual(0, SupvisorsServerOptions.to_batch_window('0'))
+        self.assertEqual(1000, SupvisorsServerOptions.to_batch_window('1000'))
+
+    def test_request_fanout(self):
+        """ Test the conversion of a string to a request fan-out. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('request_fanout')
+        # test invalid values
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_request_fanout('0')
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_request_fanout('257')
+        # test valid values
+        self.assertEqual(1, SupvisorsServerOptions.to_request_fanout('1'))
+        self.assertEqual(256, SupvisorsServerOptions.to_request_fanout('256'))
+
+    def test_heartbeat_period(self):
+        """ Test the conversion of a string to a heartbeat period. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('heartbeat_period')
+        # test invalid values
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_heartbeat_period('-1')
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_heartbeat_period('1001')
+        # test valid values
+        self.assertEqual(0, SupvisorsServerOptions.to_heartbeat_period('0'))
+        self.assertEqual(1000, SupvisorsServerOptions.to_heartbeat_period('1000'))
+
+    def test_phi_threshold(self):
+        """ Test the conversion of a string to a suspicion threshold. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('phi_threshold')
+        # test invalid values
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_phi_threshold('-0.5')
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_phi_threshold('100.5')
+        with self.assertRaises(ValueError):
+            SupvisorsServerOptions.to_phi_threshold('high')
+        # test valid values
+        self.assertEqual(0, SupvisorsServerOptions.to_phi_threshold('0'))
+        self.assertEqual(8.5, SupvisorsServerOptions.to_phi_threshold('8.5'))
+        self.assertEqual(100, SupvisorsServerOptions.to_phi_threshold('100'))
+
+    def test_internal_codec(self):
+        """ Test the conversion of a string to an internal codec. """
+        from supvisors.options import SupvisorsServerOptions
+        from supvisors.ttypes import InternalCodecs
+        error_message = self.common_error_message.format('internal_codec')
+        # test invalid values
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_internal_codec('1')
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_internal_codec('json')
+        # test valid values
+        self.assertEqual(InternalCodecs.PICKLE, SupvisorsServerOptions.to_internal_codec('PICKLE'))
+        self.assertEqual(InternalCodecs.BINARY, SupvisorsServerOptions.to_internal_codec('BINARY'))
+
     def test_conciliation_strategy(self):
         """ Test the conversion of a string to a conciliation strategy. """
         from supvisors.options import SupvisorsServerOptions
@@ -181,6 +259,19 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
         self.assertEqual(10, SupvisorsServerOptions.to_histo('10'))
         self.assertEqual(1500, SupvisorsServerOptions.to_histo('1500'))
 
+    def test_keyframe(self):
+        """ Test the conversion of a string to a keyframe period. """
+        from supvisors.options import SupvisorsServerOptions
+        error_message = self.common_error_message.format('stats_keyframe')
+        # test invalid values
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_keyframe('-1')
+        with self.assertRaisesRegex(ValueError, error_message):
+            SupvisorsServerOptions.to_keyframe('721')
+        # test valid values
+        self.assertEqual(0, SupvisorsServerOptions.to_keyframe('0'))
+        self.assertEqual(720, SupvisorsServerOptions.to_keyframe('720'))
+
     def test_incorrect_supvisors(self):
         """ Test that exception is raised when the supvisors section is missing. """
         with self.assertRaises(ValueError):
@@ -195,20 +286,28 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
     def test_default_options(self):
         """ Test the default values of options with empty Supvisors configuration. """
         from supervisor.datatypes import Automatic
-        from supvisors.ttypes import ConciliationStrategies, StartingStrategies
+        from supvisors.ttypes import ConciliationStrategies, InternalCodecs, StartingStrategies
         server = self.create_server(DefaultOptionConfiguration)
         opt = server.supvisors_options
         self.assertListEqual([gethostname()], opt.address_list)
         self.assertIsNone(opt.rules_file)
         self.assertEqual(65001, opt.internal_port)
         self.assertEqual(65002, opt.event_port)
+        self.assertIsNone(opt.snapshot_port)
+        self.assertEqual(InternalCodecs.PICKLE, opt.internal_codec)
+        self.assertEqual(0, opt.process_batch_window)
+        self.assertEqual(8, opt.request_fanout)
         self.assertFalse(opt.auto_fence)
+        self.assertEqual(0, opt.heartbeat_period)
+        self.assertEqual(0, opt.phi_threshold)
         self.assertEqual(15, opt.synchro_timeout)
         self.assertEqual([], opt.force_synchro_if)
+        self.assertIsNone(opt.membership_file)
         self.assertEqual(ConciliationStrategies.USER, opt.conciliation_strategy)
         self.assertEqual(StartingStrategies.CONFIG, opt.starting_strategy)
         self.assertListEqual([10], opt.stats_periods)
         self.assertEqual(200, opt.stats_histo)
+        self.assertEqual(0, opt.stats_keyframe)
         self.assertFalse(opt.stats_irix_mode)
         self.assertEqual(Automatic, opt.logfile)
         self.assertEqual(50 * 1024 * 1024, opt.logfile_maxbytes)
@@ -217,20 +316,28 @@ class SupvisorsServerOptionsTest(unittest.TestCase):
 
     def test_defined_options(self):
         """ Test the values of options with defined Supvisors configuration. """
-        from supvisors.ttypes import ConciliationStrategies, StartingStrategies
+        from supvisors.ttypes import ConciliationStrategies, InternalCodecs, StartingStrategies
         server = self.create_server(DefinedOptionConfiguration)
         opt = server.supvisors_options
         self.assertEqual(['cliche01', 'cliche03', 'cliche02'], opt.address_list)
         self.assertEqual('my_movies.xml', opt.rules_file)
         self.assertEqual(60001, opt.internal_port)
         self.assertEqual(60002, opt.event_port)
+        self.assertEqual(60003, opt.snapshot_port)
+        self.assertEqual(InternalCodecs.BINARY, opt.internal_codec)
+        self.assertEqual(20, opt.process_batch_window)
+        self.assertEqual(50, opt.request_fanout)
         self.assertTrue(opt.auto_fence)
+        self.assertEqual(200, opt.heartbeat_period)
+        self.assertEqual(8.0, opt.phi_threshold)
         self.assertEqual(20, opt.synchro_timeout)
         self.assertEqual(['cliche01', 'cliche03'], opt.force_synchro_if)
+        self.assertEqual('/tmp/supvisors.membership', opt.membership_file)
         self.assertEqual(ConciliationStrategies.SENICIDE, opt.conciliation_strategy)
         self.assertEqual(StartingStrategies.MOST_LOADED, opt.starting_strategy)
         self.assertListEqual([5, 60, 600], opt.stats_periods)
         self.assertEqual(100, opt.stats_histo)
+        self.assertEqual(12, opt.stats_keyframe)
         self.assertTrue(opt.stats_irix_mode)
         self.assertEqual('/tmp/supvisors.log', opt.logfile)
         self.assertEqual(50 * 1024, opt.logfile_maxbytes)
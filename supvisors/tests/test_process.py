@@ -18,9 +18,10 @@
 # ======================================================================
 
 import sys
+import tracemalloc
 import unittest
 
-from unittest.mock import call, patch
+from unittest.mock import call, patch, Mock
 
 from supvisors.tests.base import (MockedSupvisors,
                                   any_stopped_process_info,
@@ -39,6 +40,7 @@ class ProcessRulesTest(unittest.TestCase):
         """ Test the values set at construction. """
         from supvisors.process import ProcessRules
         rules = ProcessRules(self.supvisors)
+        self.assertFalse(hasattr(rules, '__dict__'))
         self.assertIs(self.supvisors, rules.supvisors)
         self.assertListEqual(['*'], rules.addresses)
         self.assertEqual(0, rules.start_sequence)
@@ -135,6 +137,69 @@ class ProcessRulesTest(unittest.TestCase):
                 mocked_disable.reset_mock()
 
 
+class ProcessInfoTest(unittest.TestCase):
+    """ Test case for the ProcessInfo class of the process module. """
+
+    def test_create(self):
+        """ Test the values set at construction. """
+        from supvisors.process import ProcessInfo
+        payload = process_info_by_name('xclock')
+        payload['extra_args'] = '-x dummy'
+        info = ProcessInfo(payload)
+        self.assertFalse(hasattr(info, '__dict__'))
+        # the entries not used by Supvisors are not stored
+        self.assertDictEqual({'name': 'xclock', 'state': payload['state'], 'start': payload['start'],
+                              'stop': payload['stop'], 'now': payload['now'], 'pid': payload['pid'],
+                              'spawnerr': payload['spawnerr'], 'expected': payload['expected'],
+                              'local_time': None, 'uptime': None, 'description': payload['description']},
+                             info.serial())
+        self.assertEqual(str(info.serial()), repr(info))
+
+    def test_access(self):
+        """ Test the dictionary-like access to the record. """
+        from supvisors.process import ProcessInfo
+        info = ProcessInfo(process_info_by_name('xclock'))
+        # test read access
+        self.assertEqual('xclock', info['name'])
+        self.assertEqual('xclock', info.get('name'))
+        self.assertIsNone(info.get('group'))
+        self.assertEqual('dummy', info.get('group', 'dummy'))
+        with self.assertRaises(KeyError):
+            info['group']
+        # test write access
+        info['uptime'] = 10
+        self.assertEqual(10, info.uptime)
+        with self.assertRaises(KeyError):
+            info['group'] = 'sample_test_1'
+        # test update
+        info.update({'state': 20, 'now': 1234, 'extra_args': '-x dummy'})
+        self.assertEqual(20, info['state'])
+        self.assertEqual(1234, info['now'])
+        self.assertIsNone(info.get('extra_args'))
+
+    def test_memory(self):
+        """ Benchmark the memory used by the records against the Supervisor process information dictionaries. """
+        from supvisors.process import ProcessInfo
+        payloads = []
+        for _ in range(1000):
+            payload = process_info_by_name('xclock')
+            payload.update({'extra_args': '', 'local_time': 0, 'uptime': 0})
+            payloads.append(payload)
+        # measure the dictionaries
+        tracemalloc.start()
+        dicts = [payload.copy() for payload in payloads]
+        dicts_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # measure the records
+        tracemalloc.start()
+        records = [ProcessInfo(payload) for payload in payloads]
+        records_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.assertEqual(len(dicts), len(records))
+        # the records are expected to take less than half of the memory used by the dictionaries
+        self.assertLess(records_size, dicts_size / 2)
+
+
 class ProcessTest(unittest.TestCase):
     """ Test case for the ProcessStatus class of the process module. """
 
@@ -148,6 +213,7 @@ class ProcessTest(unittest.TestCase):
         from supvisors.process import ProcessRules, ProcessStatus
         info = any_stopped_process_info()
         process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        self.assertFalse(hasattr(process, '__dict__'))
         # check application default attributes
         self.assertIs(self.supvisors, process.supvisors)
         self.assertEqual(info['group'], process.application_name)
@@ -158,9 +224,11 @@ class ProcessTest(unittest.TestCase):
         self.assertEqual('', process.extra_args)
         self.assertEqual(set(), process.addresses)
         self.assertEqual({}, process.infos)
+        self.assertIsNone(process.conflict_index)
+        self.assertDictEqual({}, process.address_statuses)
         # rules part
-        self.assertDictEqual(ProcessRules(self.supvisors).__dict__,
-                             process.rules.__dict__)
+        self.assertDictEqual(ProcessRules(self.supvisors).serial(), process.rules.serial())
+        self.assertIsNone(process.rules.hash_addresses)
 
     def test_namespec(self):
         """ Test of the process namspec. """
@@ -259,12 +327,25 @@ class ProcessTest(unittest.TestCase):
         dumped = pickle.dumps(serialized)
         loaded = pickle.loads(dumped)
         self.assertDictEqual(serialized, loaded)
+        # test that the serialized form is cached
+        self.assertIs(serialized, process.serial())
+        # test that the cache is reset when a serialized attribute changes
+        process.extra_args = '-x dummy'
+        serialized = process.serial()
+        self.assertEqual('-x dummy', serialized['extra_args'])
+        self.assertIs(serialized, process.serial())
+        process.update_info('10.0.0.1', {'state': ProcessStates.STARTING, 'now': 10, 'extra_args': '-x dummy'})
+        serialized = process.serial()
+        self.assertEqual('STARTING', serialized['statename'])
+        self.assertEqual(['10.0.0.1'], serialized['addresses'])
+        process.invalidate_address('10.0.0.1', False)
+        self.assertEqual([], process.serial()['addresses'])
 
     @patch('supvisors.process.ProcessStatus.resolve_hash_address')
     def test_add_info(self, mocked_resolve):
         """ Test the addition of a process info into the ProcessStatus. """
         from supervisor.states import ProcessStates
-        from supvisors.process import ProcessStatus
+        from supvisors.process import ProcessInfo, ProcessStatus
         # get a process info and complement extra_args
         info = process_info_by_name('xclock')
         info['extra_args'] = '-x dummy'
@@ -276,17 +357,20 @@ class ProcessTest(unittest.TestCase):
         # check last event info
         self.assertGreater(process.last_event_time, 0)
         last_event_time = process.last_event_time
-        self.assertEqual(info['local_time'], last_event_time)
         # check contents
         self.assertEqual(1, len(process.infos))
-        self.assertIs(info, process.infos['10.0.0.1'])
-        self.assertEqual(info['now'] - info['start'], info['uptime'])
+        record = process.infos['10.0.0.1']
+        self.assertIsInstance(record, ProcessInfo)
+        self.assertEqual(last_event_time, record['local_time'])
+        self.assertEqual(info['now'] - info['start'], record['uptime'])
+        self.assertEqual(info['pid'], record['pid'])
+        self.assertEqual(info['description'], record['description'])
         self.assertFalse(process.addresses)
         self.assertEqual(ProcessStates.STOPPING, process.state)
         self.assertTrue(process.expected_exit)
-        # extra_args are reset when using add_info
+        # extra_args are reset when using add_info and not stored in the record
         self.assertEqual('', process.extra_args)
-        self.assertEqual('', info['extra_args'])
+        self.assertIsNone(record.get('extra_args'))
         self.assertFalse(mocked_resolve.called)
         # 2. replace with an EXITED process info
         info = any_process_info_by_state(ProcessStates.EXITED)
@@ -294,11 +378,11 @@ class ProcessTest(unittest.TestCase):
         # check last event info
         self.assertGreaterEqual(process.last_event_time, last_event_time)
         last_event_time = process.last_event_time
-        self.assertEqual(info['local_time'], last_event_time)
         # check contents
         self.assertEqual(1, len(process.infos))
-        self.assertIs(info, process.infos['10.0.0.1'])
-        self.assertEqual(0, info['uptime'])
+        record = process.infos['10.0.0.1']
+        self.assertEqual(last_event_time, record['local_time'])
+        self.assertEqual(0, record['uptime'])
         self.assertFalse(process.addresses)
         self.assertEqual(ProcessStates.EXITED, process.state)
         self.assertTrue(process.expected_exit)
@@ -310,11 +394,12 @@ class ProcessTest(unittest.TestCase):
         process.add_info('10.0.0.2', info)
         # check last event info
         self.assertGreaterEqual(process.last_event_time, last_event_time)
-        self.assertEqual(info['local_time'], last_event_time)
+        last_event_time = process.last_event_time
         # check contents
         self.assertEqual(2, len(process.infos))
-        self.assertIs(info, process.infos['10.0.0.2'])
-        self.assertEqual(info['now'] - info['start'], info['uptime'])
+        record = process.infos['10.0.0.2']
+        self.assertEqual(last_event_time, record['local_time'])
+        self.assertEqual(info['now'] - info['start'], record['uptime'])
         self.assertEqual({'10.0.0.2'}, process.addresses)
         self.assertEqual(ProcessStates.RUNNING, process.state)
         self.assertTrue(process.expected_exit)
@@ -357,6 +442,7 @@ class ProcessTest(unittest.TestCase):
         info = any_process_info_by_state(ProcessStates.STOPPED)
         process = ProcessStatus(info['group'], info['name'], self.supvisors)
         process.add_info('10.0.0.1', info)
+        info = process.infos['10.0.0.1']
         # test last event info stored
         self.assertGreater(process.last_event_time, 0)
         last_event_time = process.last_event_time
@@ -532,6 +618,36 @@ class ProcessTest(unittest.TestCase):
         self.assertEqual(now_2 + 10, process.infos['10.0.0.2']['now'])
         self.assertEqual(0, process.infos['10.0.0.2']['uptime'])
 
+    def test_get_info(self):
+        """ Test that the time entries of a process info are refreshed when read. """
+        from supervisor.states import ProcessStates
+        from supvisors.process import ProcessStatus
+        info = any_process_info_by_state(ProcessStates.RUNNING)
+        process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        process.add_info('10.0.0.1', info)
+        now = process.infos['10.0.0.1']['now']
+        uptime = process.infos['10.0.0.1']['uptime']
+        with patch.object(ProcessStatus, 'update_description', return_value='pid 1234, uptime 0:01:00') as mocked_desc:
+            # test without AddressStatus
+            self.assertIs(process.infos['10.0.0.1'], process.get_info('10.0.0.1'))
+            self.assertEqual(now, process.infos['10.0.0.1']['now'])
+            self.assertFalse(mocked_desc.called)
+            # test with AddressStatus having received no newer tick
+            process.address_statuses['10.0.0.1'] = Mock(remote_time=now)
+            self.assertIs(process.infos['10.0.0.1'], process.get_info('10.0.0.1'))
+            self.assertEqual(now, process.infos['10.0.0.1']['now'])
+            self.assertFalse(mocked_desc.called)
+            # test with AddressStatus having received a newer tick
+            process.address_statuses['10.0.0.1'].remote_time = now + 60
+            info = process.get_info('10.0.0.1')
+            self.assertEqual(now + 60, info['now'])
+            self.assertEqual(uptime + 60, info['uptime'])
+            self.assertEqual('pid 1234, uptime 0:01:00', info['description'])
+            self.assertEqual(1, mocked_desc.call_count)
+            # test that the entries are not refreshed twice for the same tick
+            process.get_info('10.0.0.1')
+            self.assertEqual(1, mocked_desc.call_count)
+
     def test_update_uptime(self):
         """ Test the update of uptime entry in a Process info dictionary. """
         from supvisors.process import ProcessStatus
@@ -677,6 +793,89 @@ class ProcessTest(unittest.TestCase):
         self.assertFalse(process.evaluate_conflict())
         self.assertEqual(ProcessStates.STARTING, process.state)
 
+    def test_update_loading(self):
+        """ Test that the nodes holding the process are notified of the process updates. """
+        from supervisor.states import ProcessStates
+        from supvisors.process import ProcessStatus
+        info = any_process_info_by_state(ProcessStates.STOPPED)
+        process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        process.address_statuses = {'10.0.0.1': Mock(), '10.0.0.2': Mock()}
+        process.add_info('10.0.0.1', info)
+        for status in process.address_statuses.values():
+            self.assertEqual([call(process)], status.update_loading.call_args_list)
+            status.update_loading.reset_mock()
+        process.invalidate_address('10.0.0.1', False)
+        for status in process.address_statuses.values():
+            self.assertEqual([call(process)], status.update_loading.call_args_list)
+
+    def test_update_application(self):
+        """ Test that the application holding the process is notified of the process state changes. """
+        from supervisor.states import ProcessStates
+        from supvisors.process import ProcessStatus
+        info = any_process_info_by_state(ProcessStates.STOPPED)
+        process = ProcessStatus(info['group'], info['name'], self.supvisors)
+        self.assertIsNone(process.application_status)
+        # test without application
+        process.update_application()
+        process.application_status = application = Mock()
+        # test notification upon state change
+        process.state = ProcessStates.STARTING
+        self.assertEqual([call(process)], application.update_process.call_args_list)
+        application.update_process.reset_mock()
+        process.state = ProcessStates.STARTING
+        self.assertFalse(application.update_process.called)
+        # test notification upon update (exit status may have changed)
+        process.add_info('10.0.0.1', info)
+        self.assertEqual([call(process), call(process)], application.update_process.call_args_list)
+        # test notification upon node invalidation
+        process.add_info('10.0.0.1', any_process_info_by_state(ProcessStates.RUNNING))
+        application.update_process.reset_mock()
+        process.invalidate_address('10.0.0.1', False)
+        self.assertEqual(ProcessStates.FATAL, process.state)
+        self.assertEqual([call(process)], application.update_process.call_args_list)
+
+    def test_conflict_index(self):
+        """ Test that the conflict index is updated when the conflict is evaluated. """
+        from supervisor.states import ProcessStates
+        from supvisors.process import ProcessStatus
+        conflict_index = {}
+        info = any_process_info_by_state(ProcessStates.STOPPED)
+        process = ProcessStatus(info['group'], info['name'], self.supvisors, conflict_index)
+        self.assertIs(conflict_index, process.conflict_index)
+        process.add_info('10.0.0.1', info)
+        self.assertDictEqual({}, conflict_index)
+        # the conflict is indexed through update_status
+        process.add_info('10.0.0.2', any_process_info_by_state(ProcessStates.RUNNING))
+        process.add_info('10.0.0.3', any_process_info_by_state(ProcessStates.STARTING))
+        self.assertDictEqual({process.namespec(): process}, conflict_index)
+        # the conflict remains indexed as long as more than one node is running the process
+        process.add_info('10.0.0.4', any_process_info_by_state(ProcessStates.RUNNING))
+        process.update_status('10.0.0.3', ProcessStates.STOPPED, True)
+        self.assertDictEqual({process.namespec(): process}, conflict_index)
+        # the conflict is removed through invalidate_address
+        process.invalidate_address('10.0.0.4', False)
+        self.assertDictEqual({}, conflict_index)
+
+    def test_state_index(self):
+        """ Test that the state index is updated when the process state changes. """
+        from supervisor.states import ProcessStates
+        from supvisors.process import ProcessStatus
+        state_index = {state: {} for state in ProcessStates.__dict__.values() if isinstance(state, int)}
+        info = any_process_info_by_state(ProcessStates.STOPPED)
+        process = ProcessStatus(info['group'], info['name'], self.supvisors, None, state_index)
+        self.assertIs(state_index, process.state_index)
+        # the process is indexed as UNKNOWN at creation
+        namespec = process.namespec()
+        self.assertDictEqual({namespec: process}, state_index[ProcessStates.UNKNOWN])
+        # the process is moved upon state change
+        process.add_info('10.0.0.1', info)
+        self.assertDictEqual({}, state_index[ProcessStates.UNKNOWN])
+        self.assertDictEqual({namespec: process}, state_index[ProcessStates.STOPPED])
+        process.add_info('10.0.0.2', any_process_info_by_state(ProcessStates.RUNNING))
+        self.assertDictEqual({}, state_index[ProcessStates.STOPPED])
+        self.assertDictEqual({namespec: process}, state_index[ProcessStates.RUNNING])
+        self.assertEqual(1, sum(len(processes) for processes in state_index.values()))
+
     def test_running_state(self):
         """ Test the choice of a single state among a list of states. """
         from supervisor.states import ProcessStates, STOPPED_STATES, RUNNING_STATES
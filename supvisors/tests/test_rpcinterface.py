@@ -117,6 +117,43 @@ class RpcInterfaceTest(unittest.TestCase):
         rpc = RPCInterface(self.supervisor)
         self.assertListEqual(['address_info_1', 'address_info_2'], rpc.get_all_addresses_info())
 
+    @patch('supvisors.rpcinterface.RPCInterface.get_all_local_process_info',
+           return_value=[{'group': 'group', 'name': 'name'}])
+    def test_node_handshake(self, mocked_local):
+        """ Test the get_node_handshake RPC. """
+        import json
+        import zlib
+        from supervisor.compat import xmlrpclib
+        from supvisors.rpcinterface import RPCInterface
+        from supvisors.ttypes import AddressStates
+        # prepare context
+        self.supervisor.supvisors.context.master_address = '10.0.0.5'
+        self.supervisor.supvisors.context.addresses = {'10.0.0.1': Mock(state=AddressStates.RUNNING)}
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test with unknown address
+        with self.assertRaises(RPCError) as exc:
+            rpc.get_node_handshake('10.0.0.0')
+        self.assertEqual(Faults.BAD_ADDRESS, exc.exception.code)
+        self.assertEqual('BAD_ADDRESS: address 10.0.0.0 unknown to Supvisors', exc.exception.text)
+        # test with authorized address
+        self.assertDictEqual({'master_address': '10.0.0.5', 'authorized': True,
+                              'process_info': [{'group': 'group', 'name': 'name'}]},
+                             rpc.get_node_handshake('10.0.0.1'))
+        # test with compression
+        result = rpc.get_node_handshake('10.0.0.1', True)
+        self.assertIsInstance(result['process_info'], xmlrpclib.Binary)
+        self.assertListEqual([{'group': 'group', 'name': 'name'}],
+                             json.loads(zlib.decompress(result['process_info'].data)))
+        self.assertEqual(2, mocked_local.call_count)
+        mocked_local.reset_mock()
+        # test with isolated address
+        for state in [AddressStates.ISOLATING, AddressStates.ISOLATED]:
+            self.supervisor.supvisors.context.addresses['10.0.0.1'].state = state
+            self.assertDictEqual({'master_address': '10.0.0.5', 'authorized': False, 'process_info': []},
+                                 rpc.get_node_handshake('10.0.0.1'))
+        self.assertFalse(mocked_local.called)
+
     @patch('supvisors.rpcinterface.RPCInterface._check_from_deployment')
     @patch('supvisors.rpcinterface.RPCInterface._get_application',
            return_value=Mock(**{'serial.return_value': {'name': 'appli'}}))
@@ -184,6 +221,59 @@ class RpcInterfaceTest(unittest.TestCase):
                              rpc.get_all_process_info())
         self.assertEqual([call()], mocked_check.call_args_list)
 
+    @patch('supvisors.rpcinterface.RPCInterface._check_from_deployment')
+    def test_process_info_filtered(self, mocked_check):
+        """ Test the get_process_info_filtered RPC. """
+        from supvisors.rpcinterface import RPCInterface
+        from supvisors.ttypes import ProcessStates
+        # prepare context
+        context = self.supervisor.supvisors.context
+        context.addresses = {'10.0.0.1': Mock(), '10.0.0.2': Mock()}
+        mocked_filter = context.filter_processes = Mock(
+            return_value=[Mock(**{'serial.return_value': {'name': 'proc_{}'.format(idx)}}) for idx in range(5)])
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test RPC call with unknown filter
+        with self.assertRaises(RPCError) as exc:
+            rpc.get_process_info_filtered({'application': 'appli', 'dummy': True})
+        self.assertEqual(Faults.INCORRECT_PARAMETERS, exc.exception.code)
+        self.assertEqual([call()], mocked_check.call_args_list)
+        self.assertFalse(mocked_filter.called)
+        mocked_check.reset_mock()
+        # test RPC call with unknown process state
+        with self.assertRaises(RPCError) as exc:
+            rpc.get_process_info_filtered({'states': ['RUNNING', 'DUMMY']})
+        self.assertEqual(Faults.INCORRECT_PARAMETERS, exc.exception.code)
+        self.assertFalse(mocked_filter.called)
+        # test RPC call with unknown node
+        with self.assertRaises(RPCError) as exc:
+            rpc.get_process_info_filtered({'node': '10.0.0.0'})
+        self.assertEqual(Faults.BAD_ADDRESS, exc.exception.code)
+        self.assertFalse(mocked_filter.called)
+        # test RPC call with negative offset or limit
+        with self.assertRaises(RPCError) as exc:
+            rpc.get_process_info_filtered({}, -1)
+        self.assertEqual(Faults.INCORRECT_PARAMETERS, exc.exception.code)
+        with self.assertRaises(RPCError) as exc:
+            rpc.get_process_info_filtered({}, 0, -1)
+        self.assertEqual(Faults.INCORRECT_PARAMETERS, exc.exception.code)
+        self.assertFalse(mocked_filter.called)
+        # test RPC call without filter nor paging
+        self.assertListEqual([{'name': 'proc_{}'.format(idx)} for idx in range(5)],
+                             rpc.get_process_info_filtered({}))
+        self.assertEqual([call(None, None, None, False, False)], mocked_filter.call_args_list)
+        mocked_filter.reset_mock()
+        # test RPC call with all filters and paging
+        filters = {'application': 'sample*', 'states': ['RUNNING', 'FATAL'], 'node': '10.0.0.2',
+                   'conflicting': True, 'crashed': True}
+        self.assertListEqual([{'name': 'proc_1'}, {'name': 'proc_2'}],
+                             rpc.get_process_info_filtered(filters, 1, 2))
+        self.assertEqual([call('sample*', [ProcessStates.RUNNING, ProcessStates.FATAL], '10.0.0.2', True, True)],
+                         mocked_filter.call_args_list)
+        # test paging out of range and without limit
+        self.assertListEqual([], rpc.get_process_info_filtered({}, 10, 2))
+        self.assertListEqual([{'name': 'proc_3'}, {'name': 'proc_4'}], rpc.get_process_info_filtered({}, 3))
+
     @patch('supvisors.rpcinterface.RPCInterface._get_local_info',
            return_value={'group': 'group', 'name': 'name'})
     def test_local_process_info(self, mocked_get):
@@ -203,6 +293,33 @@ class RpcInterfaceTest(unittest.TestCase):
         self.assertEqual([call({'group': 'dummy_group', 'name': 'dummy_name'})],
                          mocked_get.call_args_list)
 
+    @patch('supvisors.rpcinterface.RPCInterface.get_all_local_process_info', return_value=['all'])
+    @patch('supvisors.rpcinterface.RPCInterface._get_local_info', side_effect=lambda info: info['name'])
+    def test_local_process_info_since(self, mocked_get, mocked_all):
+        """ Test the get_local_process_info_since RPC. """
+        from supvisors.rpcinterface import RPCInterface
+        # prepare context
+        info_source = self.supervisor.supvisors.info_source
+        mocked_rpc = info_source.supervisor_rpc_interface.getAllProcessInfo
+        mocked_rpc.return_value = [{'group': 'appli', 'name': 'proc_1'}, {'group': 'appli', 'name': 'proc_2'},
+                                   {'group': 'appli', 'name': 'proc_3'}]
+        listener = self.supervisor.supvisors.listener
+        listener.process_sequences = {'appli:proc_1': 10, 'appli:proc_2': 25, 'appli:proc_3': 30}
+        # create RPC instance
+        rpc = RPCInterface(self.supervisor)
+        # test RPC call before the publisher is created
+        listener.publisher = None
+        self.assertListEqual(['all'], rpc.get_local_process_info_since(12))
+        # test RPC call with a sequence greater than the publisher sequence
+        listener.publisher = Mock(sequence=30)
+        self.assertListEqual(['all'], rpc.get_local_process_info_since(31))
+        self.assertFalse(mocked_rpc.called)
+        # test RPC call with a valid sequence
+        self.assertListEqual(['proc_2', 'proc_3'], rpc.get_local_process_info_since(12))
+        self.assertListEqual(['proc_3'], rpc.get_local_process_info_since(25))
+        self.assertListEqual([], rpc.get_local_process_info_since(30))
+        self.assertEqual(2, mocked_all.call_count)
+
     @patch('supvisors.rpcinterface.RPCInterface._get_local_info',
            return_value={'group': 'group', 'name': 'name'})
     def test_all_local_process_info(self, mocked_get):
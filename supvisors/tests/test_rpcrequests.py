@@ -20,7 +20,10 @@
 import sys
 import unittest
 
+from unittest.mock import call, patch, Mock
+
 from supervisor.compat import xmlrpclib
+from supervisor.xmlrpc import SupervisorTransport
 
 
 class RpcRequestsTest(unittest.TestCase):
@@ -60,6 +63,194 @@ class RpcRequestsTest(unittest.TestCase):
         # if no server is started, call would block
 
 
+class PooledTransportTest(unittest.TestCase):
+    """ Test case for the PooledTransport class of the rpcrequests module. """
+
+    def setUp(self):
+        """ Create the transport. """
+        from supvisors.rpcrequests import PooledTransport
+        self.pool = Mock()
+        self.transport = PooledTransport(self.pool, 'cliche', 'p@$$w0rd', 'http://10.0.0.1:1000', 5)
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertIsInstance(self.transport, SupervisorTransport)
+        self.assertIs(self.pool, self.transport.pool)
+        self.assertEqual('cliche', self.transport.username)
+        self.assertEqual('p@$$w0rd', self.transport.password)
+        self.assertEqual('http://10.0.0.1:1000', self.transport.serverurl)
+        self.assertEqual(5, self.transport.timeout)
+        self.assertIsNone(self.transport.connection)
+        # test the timeout of the connection
+        connection = self.transport._get_connection()
+        self.assertEqual(('10.0.0.1', 1000, 5), (connection.host, connection.port, connection.timeout))
+
+    @patch.object(SupervisorTransport, 'request', return_value='result')
+    def test_request(self, mocked_request):
+        """ Test the request without error. """
+        # test with new connection
+        self.assertEqual('result', self.transport.request('host', '/RPC2', 'body'))
+        self.assertEqual([call(self.transport, 'host', '/RPC2', 'body', 0)], mocked_request.call_args_list)
+        self.assertEqual([call(False)], self.pool.count_connection.call_args_list)
+        self.pool.count_connection.reset_mock()
+        # test with connection kept alive
+        self.transport.connection = Mock()
+        self.assertEqual('result', self.transport.request('host', '/RPC2', 'body'))
+        self.assertEqual([call(True)], self.pool.count_connection.call_args_list)
+
+    @patch.object(SupervisorTransport, 'request', side_effect=xmlrpclib.Fault(1, 'fault'))
+    def test_request_fault(self, mocked_request):
+        """ Test the request with a XML-RPC fault. The connection is kept. """
+        connection = self.transport.connection = Mock()
+        with self.assertRaises(xmlrpclib.Fault):
+            self.transport.request('host', '/RPC2', 'body')
+        self.assertEqual(1, mocked_request.call_count)
+        self.assertIs(connection, self.transport.connection)
+        self.assertFalse(connection.close.called)
+
+    @patch.object(SupervisorTransport, 'request', side_effect=TimeoutError)
+    def test_request_error(self, mocked_request):
+        """ Test the request with an error that is not a connection loss. The connection is closed. """
+        connection = self.transport.connection = Mock()
+        with self.assertRaises(TimeoutError):
+            self.transport.request('host', '/RPC2', 'body')
+        self.assertEqual(1, mocked_request.call_count)
+        self.assertIsNone(self.transport.connection)
+        self.assertEqual(1, connection.close.call_count)
+
+    @patch.object(SupervisorTransport, 'request', side_effect=ConnectionResetError)
+    def test_request_reconnection(self, mocked_request):
+        """ Test the request with a connection loss. """
+        # test with new connection: no retry
+        with self.assertRaises(ConnectionResetError):
+            self.transport.request('host', '/RPC2', 'body')
+        self.assertEqual(1, mocked_request.call_count)
+        self.assertEqual([call(False)], self.pool.count_connection.call_args_list)
+        mocked_request.reset_mock()
+        self.pool.count_connection.reset_mock()
+        # test with connection kept alive: retry on a new connection
+        connection = self.transport.connection = Mock()
+        mocked_request.side_effect = [ConnectionResetError, 'result']
+        self.assertEqual('result', self.transport.request('host', '/RPC2', 'body'))
+        self.assertEqual(2, mocked_request.call_count)
+        self.assertEqual(1, connection.close.call_count)
+        self.assertEqual([call(True), call(False)], self.pool.count_connection.call_args_list)
+        mocked_request.reset_mock()
+        # test with connection kept alive and retry failure
+        self.transport.connection = Mock()
+        mocked_request.side_effect = ConnectionResetError
+        with self.assertRaises(ConnectionResetError):
+            self.transport.request('host', '/RPC2', 'body')
+        self.assertEqual(2, mocked_request.call_count)
+        self.assertIsNone(self.transport.connection)
+
+
+class RPCProxyPoolTest(unittest.TestCase):
+    """ Test case for the RPCProxyPool class of the rpcrequests module. """
+
+    def setUp(self):
+        """ Create the pool. """
+        from supvisors.rpcrequests import RPCProxyPool
+        self.env = {'SUPERVISOR_SERVER_URL': 'http://localhost:1000'}
+        self.pool = RPCProxyPool(self.env, 2, 10, 5)
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        from supvisors.rpcrequests import RPCProxyPool
+        self.assertIs(self.env, self.pool.env)
+        self.assertEqual(2, self.pool.max_size)
+        self.assertEqual(10, self.pool.idle_timeout)
+        self.assertEqual(5, self.pool.request_timeout)
+        self.assertDictEqual({}, self.pool.idle_proxies)
+        self.assertEqual(0, self.pool.new_connections)
+        self.assertEqual(0, self.pool.reused_connections)
+        # test default values
+        pool = RPCProxyPool(self.env)
+        self.assertEqual(RPCProxyPool.MAX_SIZE, pool.max_size)
+        self.assertEqual(RPCProxyPool.IDLE_TIMEOUT, pool.idle_timeout)
+        self.assertEqual(RPCProxyPool.REQUEST_TIMEOUT, pool.request_timeout)
+
+    def test_create_proxy(self):
+        """ Test the creation of a proxy. """
+        from supvisors.rpcrequests import PooledTransport
+        proxy = self.pool.create_proxy('10.0.0.1')
+        self.assertIsInstance(proxy, xmlrpclib.ServerProxy)
+        self.assertEqual('10.0.0.1', proxy._ServerProxy__host)
+        transport = proxy._ServerProxy__transport
+        self.assertIsInstance(transport, PooledTransport)
+        self.assertIs(self.pool, transport.pool)
+        self.assertEqual('http://10.0.0.1:1000', transport.serverurl)
+        self.assertEqual(5, transport.timeout)
+
+    def test_count_connection(self):
+        """ Test the connection counters. """
+        self.pool.count_connection(False)
+        self.pool.count_connection(True)
+        self.pool.count_connection(True)
+        self.assertEqual(1, self.pool.new_connections)
+        self.assertEqual(2, self.pool.reused_connections)
+
+    @patch('supvisors.rpcrequests.monotonic', return_value=100)
+    def test_acquire_release(self, _):
+        """ Test the acquisition and release of proxies. """
+        # acquire proxies when the pool is empty
+        proxy_1 = self.pool.acquire('10.0.0.1')
+        proxy_2 = self.pool.acquire('10.0.0.1')
+        proxy_3 = self.pool.acquire('10.0.0.1')
+        self.assertIsNot(proxy_1, proxy_2)
+        # release proxies: the third one is closed as max_size is reached
+        self.pool.release('10.0.0.1', proxy_1)
+        self.pool.release('10.0.0.1', proxy_2)
+        with patch.object(proxy_3._ServerProxy__transport, 'close') as mocked_close:
+            self.pool.release('10.0.0.1', proxy_3)
+            self.assertEqual(1, mocked_close.call_count)
+        self.assertDictEqual({'10.0.0.1': [(100, proxy_1), (100, proxy_2)]}, self.pool.idle_proxies)
+        # acquire proxies again: the last released is reused first
+        self.assertIs(proxy_2, self.pool.acquire('10.0.0.1'))
+        self.assertIsNot(proxy_1, self.pool.acquire('10.0.0.2'))
+        self.assertDictEqual({'10.0.0.1': [(100, proxy_1)]}, self.pool.idle_proxies)
+
+    def test_proxy(self):
+        """ Test the context manager. """
+        with self.pool.proxy('10.0.0.1') as proxy_1:
+            self.assertIsInstance(proxy_1, xmlrpclib.ServerProxy)
+            self.assertDictEqual({}, self.pool.idle_proxies)
+        self.assertEqual([proxy_1], [proxy for _, proxy in self.pool.idle_proxies['10.0.0.1']])
+        # the proxy is released even if the request fails
+        with self.assertRaises(ValueError):
+            with self.pool.proxy('10.0.0.1') as proxy_2:
+                self.assertIs(proxy_1, proxy_2)
+                raise ValueError
+        self.assertEqual([proxy_1], [proxy for _, proxy in self.pool.idle_proxies['10.0.0.1']])
+
+    def test_evict_idle(self):
+        """ Test the eviction of the idle proxies. """
+        proxies = [self.pool.create_proxy('10.0.0.1') for _ in range(3)]
+        self.pool.idle_proxies = {'10.0.0.1': [(100, proxies[0]), (115, proxies[1])],
+                                  '10.0.0.2': [(95, proxies[2])]}
+        with patch('supvisors.rpcrequests.monotonic', return_value=120):
+            with patch.object(SupervisorTransport, 'close') as mocked_close:
+                self.pool.evict_idle()
+                self.assertEqual(2, mocked_close.call_count)
+        self.assertDictEqual({'10.0.0.1': [(115, proxies[1])], '10.0.0.2': []}, self.pool.idle_proxies)
+
+    def test_close(self):
+        """ Test the closure of the idle proxies. """
+        proxies = [self.pool.create_proxy('10.0.0.1') for _ in range(3)]
+        self.pool.idle_proxies = {'10.0.0.1': [(100, proxies[0]), (115, proxies[1])],
+                                  '10.0.0.2': [(95, proxies[2])]}
+        with patch.object(SupervisorTransport, 'close') as mocked_close:
+            # test closure of specific nodes
+            self.pool.close(['10.0.0.2', '10.0.0.3'])
+            self.assertEqual(1, mocked_close.call_count)
+            self.assertDictEqual({'10.0.0.1': [(100, proxies[0]), (115, proxies[1])]}, self.pool.idle_proxies)
+            mocked_close.reset_mock()
+            # test closure of all nodes
+            self.pool.close()
+            self.assertEqual(2, mocked_close.call_count)
+            self.assertDictEqual({}, self.pool.idle_proxies)
+
+
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
 
@@ -163,6 +163,24 @@ class CommonParserTest(unittest.TestCase):
         self.assert_process_rules(process.rules,
                                   ['*'], None, 0, 0, False, False, 15,
                                   RunningFailureStrategies.CONTINUE)
+        # check that the rules are shared by the processes resolving to the same pattern
+        process = ProcessStatus('dummy_application_D', 'dummies_any', self.supvisors)
+        parser.load_process_rules(process)
+        other_process = ProcessStatus('dummy_application_D', 'dummies_other', self.supvisors)
+        parser.load_process_rules(other_process)
+        self.assertIs(process.rules, other_process.rules)
+        # check that the rules are not shared when the default running failure strategy is different
+        other_process = ProcessStatus('dummy_application_D', 'dummies_other', self.supvisors)
+        other_process.rules.running_failure_strategy = RunningFailureStrategies.STOP_APPLICATION
+        parser.load_process_rules(other_process)
+        self.assertIsNot(process.rules, other_process.rules)
+        # check that the rules are not shared when using the '#' option
+        process = ProcessStatus('dummy_application_D', 'dummies_01_any', self.supvisors)
+        parser.load_process_rules(process)
+        other_process = ProcessStatus('dummy_application_D', 'dummies_01_other', self.supvisors)
+        parser.load_process_rules(other_process)
+        self.assertIsNot(process.rules, other_process.rules)
+        self.assertEqual(process.rules.serial(), other_process.rules.serial())
 
     def assert_default_application_rules(self, rules):
         """ Check that rules contains default values. """
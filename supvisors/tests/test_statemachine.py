@@ -74,6 +74,8 @@ class StateMachinesTest(unittest.TestCase):
         state.enter()
         self.assertEqual('', state.context.master_address)
         self.assertGreaterEqual(int(time.time()), state.start_date)
+        # the nodes expected are rebuilt from the membership of the current session
+        self.assertEqual([call()], self.supvisors.context.update_expected_addresses.call_args_list)
         self.assertEqual(AddressStates.UNKNOWN, self.supvisors.context.addresses['127.0.0.1'].state)
         self.assertEqual(AddressStates.UNKNOWN, self.supvisors.context.addresses['10.0.0.1'].state)
         self.assertEqual(AddressStates.UNKNOWN, self.supvisors.context.addresses['10.0.0.2'].state)
@@ -83,6 +85,7 @@ class StateMachinesTest(unittest.TestCase):
         # 2. test next method
         # test that Supvisors wait for all addresses to be running or a given timeout is reached
         self.supvisors.context.forced_addresses = []
+        self.supvisors.context.expected_addresses = []
         self.supvisors.context.running_addresses.return_value = []
         # test case no address is running, especially local address
         result = state.next()
@@ -106,8 +109,18 @@ class StateMachinesTest(unittest.TestCase):
         self.supvisors.context.unknown_forced_addresses.return_value = []
         result = state.next()
         self.assertEqual(SupvisorsStates.DEPLOYMENT, result)
-        # test case where addresses are still unknown and timeout is reached
         self.supvisors.context.forced_addresses = []
+        # test case where the nodes of the last working session are still unknown
+        self.supvisors.context.expected_addresses = ['127.0.0.1', '10.0.0.2', '10.0.0.4']
+        self.supvisors.context.unknown_expected_addresses.return_value = ['10.0.0.4']
+        result = state.next()
+        self.assertEqual(SupvisorsStates.INITIALIZATION, result)
+        # test case where end of synchro is based on the nodes of the last working session
+        self.supvisors.context.unknown_expected_addresses.return_value = []
+        result = state.next()
+        self.assertEqual(SupvisorsStates.DEPLOYMENT, result)
+        # test case where addresses are still unknown and timeout is reached
+        self.supvisors.context.expected_addresses = []
         state.start_date = time.time() - 11
         result = state.next()
         self.assertEqual(SupvisorsStates.DEPLOYMENT, result)
@@ -395,6 +408,10 @@ class FiniteStateMachineTest(unittest.TestCase):
         from supvisors.statemachine import FiniteStateMachine
         # create state machine instance to be tested
         self.supvisors = MockedSupvisors()
+        # no job in progress and no conflict
+        self.supvisors.starter.in_progress.return_value = False
+        self.supvisors.stopper.in_progress.return_value = False
+        self.supvisors.context.conflict_processes = {}
         self.fsm = FiniteStateMachine(self.supvisors)
 
     @patch('supvisors.statemachine.FiniteStateMachine.update_instance')
@@ -407,6 +424,7 @@ class FiniteStateMachineTest(unittest.TestCase):
         self.assertIs(self.supvisors, self.fsm.supvisors)
         self.assertEqual(SupvisorsStates.INITIALIZATION, self.fsm.state)
         self.assertIsInstance(self.fsm.instance, InitializationState)
+        self.assertFalse(self.fsm.dirty)
 
     def test_state_string(self):
         """ Test the string conversion of state machine. """
@@ -422,7 +440,10 @@ class FiniteStateMachineTest(unittest.TestCase):
         # test serialization for all states
         for state in SupvisorsStates.values():
             self.fsm.state = state
-            self.assertDictEqual({'statecode': state, 'statename': SupvisorsStates.to_string(state)}, self.fsm.serial())
+            serialized = self.fsm.serial()
+            self.assertDictEqual({'statecode': state, 'statename': SupvisorsStates.to_string(state)}, serialized)
+            # test that the serialized form is cached
+            self.assertIs(serialized, self.fsm.serial())
 
     @patch('supvisors.statemachine.DeploymentState.exit')
     @patch('supvisors.statemachine.DeploymentState.next')
@@ -625,6 +646,7 @@ class FiniteStateMachineTest(unittest.TestCase):
 
     def test_timer_event(self):
         """ Test the actions triggered in state machine upon reception of a timer event. """
+        from supvisors.ttypes import SupvisorsStates
         # apply patches
         mocked_isolation = self.supvisors.context.handle_isolation
         mocked_isolation.return_value = [2, 3]
@@ -633,6 +655,7 @@ class FiniteStateMachineTest(unittest.TestCase):
         # test that context on_timer_event is always called
         # test that fsm next is always called
         # test that result of context handle_isolation is always returned
+        mocked_save = self.supvisors.context.save_membership
         with patch.object(self.fsm, 'next') as mocked_next:
             result = self.fsm.on_timer_event()
             # check result: marked processes are started
@@ -641,6 +664,19 @@ class FiniteStateMachineTest(unittest.TestCase):
             self.assertEqual(1, mocked_event.call_count)
             self.assertEqual(1, mocked_failure.call_count)
             self.assertEqual(1, mocked_isolation.call_count)
+            # membership is not stored in INITIALIZATION state
+            self.assertFalse(mocked_save.called)
+            # membership is stored in working states
+            for state in [SupvisorsStates.DEPLOYMENT, SupvisorsStates.OPERATION, SupvisorsStates.CONCILIATION]:
+                mocked_save.reset_mock()
+                self.fsm.state = state
+                self.fsm.on_timer_event()
+                self.assertEqual([call()], mocked_save.call_args_list)
+            # membership is not stored when stopping
+            mocked_save.reset_mock()
+            self.fsm.state = SupvisorsStates.SHUTTING_DOWN
+            self.fsm.on_timer_event()
+            self.assertFalse(mocked_save.called)
 
     def test_tick_event(self):
         """ Test the actions triggered in state machine upon reception of a tick event. """
@@ -650,8 +686,65 @@ class FiniteStateMachineTest(unittest.TestCase):
             self.assertEqual(1, mocked_evt.call_count)
             self.assertEqual(call('10.0.0.1', 1234), mocked_evt.call_args)
 
+    def test_next_if_dirty(self):
+        """ Test the evaluation of the state when an event may have made a transition possible. """
+        with patch.object(self.fsm.instance, 'next', return_value=self.fsm.state) as mocked_next:
+            # test not dirty
+            self.fsm.next_if_dirty()
+            self.assertFalse(mocked_next.called)
+            # test dirty
+            self.fsm.dirty = True
+            self.fsm.next_if_dirty()
+            self.assertEqual(1, mocked_next.call_count)
+            self.assertFalse(self.fsm.dirty)
+            # test that the flag is reset so that the state is not evaluated twice
+            self.fsm.next_if_dirty()
+            self.assertEqual(1, mocked_next.call_count)
+
+    def test_update_dirty(self):
+        """ Test the detection of the changes that may lead to a transition. """
+        starter, stopper = self.supvisors.starter, self.supvisors.stopper
+        conflicts = self.supvisors.context.conflict_processes
+        self.assertTupleEqual((False, False, 0), self.fsm.get_transition_status())
+        # test no change
+        self.fsm.update_dirty((False, False, 0))
+        self.assertFalse(self.fsm.dirty)
+        # test jobs added to starter and stopper
+        starter.in_progress.return_value = stopper.in_progress.return_value = True
+        self.fsm.update_dirty((False, False, 0))
+        self.assertFalse(self.fsm.dirty)
+        # test starter and stopper still in progress
+        self.fsm.update_dirty((True, True, 0))
+        self.assertFalse(self.fsm.dirty)
+        # test starter completed
+        starter.in_progress.return_value = False
+        self.fsm.update_dirty((True, True, 0))
+        self.assertTrue(self.fsm.dirty)
+        self.fsm.dirty = False
+        # test stopper completed
+        starter.in_progress.return_value, stopper.in_progress.return_value = True, False
+        self.fsm.update_dirty((True, True, 0))
+        self.assertTrue(self.fsm.dirty)
+        self.fsm.dirty = False
+        # test new conflict
+        starter.in_progress.return_value = False
+        conflicts.update({'appli:proc_1': Mock(), 'appli:proc_2': Mock()})
+        self.fsm.update_dirty((False, False, 1))
+        self.assertTrue(self.fsm.dirty)
+        self.fsm.dirty = False
+        # test conflicts unchanged or decreased
+        self.fsm.update_dirty((False, False, 2))
+        self.assertFalse(self.fsm.dirty)
+        self.fsm.update_dirty((False, False, 3))
+        self.assertFalse(self.fsm.dirty)
+        # test all conflicts conciliated
+        conflicts.clear()
+        self.fsm.update_dirty((False, False, 2))
+        self.assertTrue(self.fsm.dirty)
+
     # FIXME: test calls to failure_handler + master + crashed
-    def test_process_event(self):
+    @patch('supvisors.statemachine.FiniteStateMachine.next')
+    def test_process_event(self, mocked_next):
         """ Test the actions triggered in state machine upon reception of a process event. """
         # prepare context
         process = Mock(application_name='appli')
@@ -673,6 +766,7 @@ class FiniteStateMachineTest(unittest.TestCase):
         self.assertEqual(0, mocked_stop_has.call_count)
         self.assertEqual(0, mocked_start_evt.call_count)
         self.assertEqual(0, mocked_stop_evt.call_count)
+        self.assertFalse(mocked_next.called)
         # inject process event
         mocked_ctx.return_value = process
         mocked_ctx.reset_mock()
@@ -685,6 +779,13 @@ class FiniteStateMachineTest(unittest.TestCase):
         self.assertEqual([call('appli')], mocked_stop_has.call_args_list)
         self.assertEqual([call(process)], mocked_start_evt.call_args_list)
         self.assertEqual([call(process)], mocked_stop_evt.call_args_list)
+        # test that the state is not evaluated when nothing relevant to a transition has changed
+        self.assertFalse(mocked_next.called)
+        # test that the state is evaluated immediately when the event completes the starter jobs
+        self.supvisors.starter.in_progress.side_effect = [True, False]
+        self.fsm.on_process_event('10.0.0.1', ['dummy_event'])
+        self.assertEqual([call()], mocked_next.call_args_list)
+        self.supvisors.starter.in_progress.side_effect = None
         # inject process event
         mocked_start_has.reset_mock()
         mocked_start_has.return_value = True
@@ -703,6 +804,130 @@ class FiniteStateMachineTest(unittest.TestCase):
         self.assertEqual([call(process)], mocked_start_evt.call_args_list)
         self.assertEqual([call(process)], mocked_stop_evt.call_args_list)
 
+    @patch('supvisors.statemachine.FiniteStateMachine.next')
+    def test_process_events(self, mocked_next):
+        """ Test the actions triggered in state machine upon reception of a batch of process events. """
+        process_1 = Mock(application_name='appli_1')
+        process_2 = Mock(application_name='appli_2')
+        mocked_update = self.supvisors.context.update_process
+        mocked_update.side_effect = [process_1, None, process_2]
+        mocked_publish = self.supvisors.context.publish_process_updates
+        mocked_trigger = self.supvisors.failure_handler.trigger_jobs
+        # test without failure
+        with patch.object(self.fsm, 'on_process_update', return_value=False) as mocked_on_update:
+            self.fsm.on_process_events('10.0.0.1', ['event_1', 'event_2', 'event_3'])
+            self.assertEqual([call('10.0.0.1', 'event_1'), call('10.0.0.1', 'event_2'), call('10.0.0.1', 'event_3')],
+                             mocked_update.call_args_list)
+            self.assertEqual([call(process_1), call(process_2)], mocked_on_update.call_args_list)
+            self.assertEqual([call([process_1, process_2])], mocked_publish.call_args_list)
+            self.assertFalse(mocked_trigger.called)
+            # nothing relevant to a transition has changed
+            self.assertFalse(mocked_next.called)
+        # test with a new conflict: the state is evaluated immediately
+        mocked_update.reset_mock()
+        mocked_update.side_effect = [process_1, process_2]
+        mocked_publish.reset_mock()
+
+        def add_conflict(process):
+            self.supvisors.context.conflict_processes[process.application_name] = process
+            return False
+        with patch.object(self.fsm, 'on_process_update', side_effect=add_conflict):
+            self.fsm.on_process_events('10.0.0.1', ['event_1', 'event_2'])
+            self.assertEqual([call()], mocked_next.call_args_list)
+        # test without process updated: the state is not evaluated
+        mocked_update.reset_mock()
+        mocked_update.side_effect = [None]
+        mocked_next.reset_mock()
+        self.fsm.dirty = False
+        with patch.object(self.fsm, 'on_process_update') as mocked_on_update:
+            self.fsm.on_process_events('10.0.0.1', ['event_1'])
+            self.assertFalse(mocked_on_update.called)
+            self.assertFalse(mocked_next.called)
+        # test with failure: the jobs are triggered once, after the application update
+        mocked_update.reset_mock()
+        mocked_update.side_effect = [process_1, process_2]
+        mocked_publish.reset_mock()
+        with patch.object(self.fsm, 'on_process_update', side_effect=[True, True]):
+            self.fsm.on_process_events('10.0.0.1', ['event_1', 'event_2'])
+            self.assertEqual([call([process_1, process_2])], mocked_publish.call_args_list)
+            self.assertEqual(1, mocked_trigger.call_count)
+
+    def test_heartbeat_timer(self):
+        """ Test the actions triggered in state machine upon a heartbeat period. """
+        mocked_context = self.supvisors.context
+        mocked_context.handle_isolation.return_value = ['10.0.0.2']
+        mocked_trigger = self.supvisors.failure_handler.trigger_jobs
+        with patch.object(self.fsm, 'next') as mocked_next:
+            # test without node invalidated
+            mocked_context.on_heartbeat_timer.return_value = []
+            self.assertListEqual([], self.fsm.on_heartbeat_timer())
+            self.assertFalse(mocked_next.called)
+            self.assertFalse(mocked_trigger.called)
+            self.assertFalse(mocked_context.handle_isolation.called)
+            # test with nodes invalidated
+            mocked_context.on_heartbeat_timer.return_value = ['10.0.0.2']
+            self.assertListEqual(['10.0.0.2'], self.fsm.on_heartbeat_timer())
+            self.assertEqual([call()], mocked_next.call_args_list)
+            self.assertEqual([call()], mocked_trigger.call_args_list)
+
+    def test_heartbeat_event(self):
+        """ Test the actions triggered in state machine upon reception of a heartbeat. """
+        self.fsm.on_heartbeat_event('10.0.0.1', 49.5)
+        self.assertEqual([call('10.0.0.1', 49.5)], self.supvisors.context.on_heartbeat_event.call_args_list)
+
+    @patch('supvisors.statemachine.FiniteStateMachine.next')
+    def test_process_resync(self, mocked_next):
+        """ Test the actions triggered in state machine upon reception of the processes resynchronized. """
+        process_1 = Mock(application_name='appli_1')
+        process_2 = Mock(application_name='appli_2')
+        mocked_resync = self.supvisors.context.resync_processes
+        mocked_resync.return_value = [process_1, process_2]
+        mocked_publish = self.supvisors.context.publish_process_updates
+        mocked_trigger = self.supvisors.failure_handler.trigger_jobs
+        # test without failure
+        with patch.object(self.fsm, 'on_process_update', return_value=False) as mocked_on_update:
+            self.fsm.on_process_resync('10.0.0.1', ['info_1', 'info_2'])
+            self.assertEqual([call('10.0.0.1', ['info_1', 'info_2'])], mocked_resync.call_args_list)
+            self.assertEqual([call(process_1), call(process_2)], mocked_on_update.call_args_list)
+            self.assertEqual([call([process_1, process_2])], mocked_publish.call_args_list)
+            self.assertFalse(mocked_trigger.called)
+            # nothing relevant to a transition has changed
+            self.assertFalse(mocked_next.called)
+        # test with the stopper jobs completed: the state is evaluated immediately
+        mocked_publish.reset_mock()
+        self.supvisors.stopper.in_progress.side_effect = [True, False]
+        with patch.object(self.fsm, 'on_process_update', return_value=False):
+            self.fsm.on_process_resync('10.0.0.1', ['info_1', 'info_2'])
+            self.assertEqual([call()], mocked_next.call_args_list)
+        self.supvisors.stopper.in_progress.side_effect = None
+        mocked_publish.reset_mock()
+        # test with failure
+        mocked_publish.reset_mock()
+        with patch.object(self.fsm, 'on_process_update', side_effect=[False, True]):
+            self.fsm.on_process_resync('10.0.0.1', ['info_1', 'info_2'])
+            self.assertEqual([call([process_1, process_2])], mocked_publish.call_args_list)
+            self.assertEqual(1, mocked_trigger.call_count)
+
+    def test_on_process_update(self):
+        """ Test the running failure detection upon a process update. """
+        process = Mock(application_name='appli', **{'crashed.return_value': True})
+        self.supvisors.starter.has_application.return_value = False
+        self.supvisors.stopper.has_application.return_value = False
+        mocked_add = self.supvisors.failure_handler.add_default_job
+        # test not master
+        self.supvisors.context.master = False
+        self.assertFalse(self.fsm.on_process_update(process))
+        self.assertFalse(mocked_add.called)
+        # test master and crashed process
+        self.supvisors.context.master = True
+        self.assertTrue(self.fsm.on_process_update(process))
+        self.assertEqual([call(process)], mocked_add.call_args_list)
+        mocked_add.reset_mock()
+        # test master and crashed process in a starting application
+        self.supvisors.starter.has_application.return_value = True
+        self.assertFalse(self.fsm.on_process_update(process))
+        self.assertFalse(mocked_add.called)
+
     def test_process_info(self):
         """ Test the actions triggered in state machine upon reception of a process information. """
         # inject process info and test call to context load_processes
@@ -720,26 +945,33 @@ class FiniteStateMachineTest(unittest.TestCase):
         mocked_auth = self.fsm.context.on_authorization
         mocked_auth.return_value = False
         # test rejected authorization
-        self.fsm.on_authorization('10.0.0.1', False, '10.0.0.5')
-        self.assertEqual([call('10.0.0.1', False)], mocked_auth.call_args_list)
-        self.assertEqual('', self.supvisors.context.master_address)
-        # reset mocks
-        mocked_auth.reset_mock()
-        mocked_auth.return_value = True
-        # test authorization when to master address provided
-        self.fsm.on_authorization('10.0.0.1', True, '')
-        self.assertEqual(call('10.0.0.1', True), mocked_auth.call_args)
-        self.assertEqual('', self.supvisors.context.master_address)
-        # reset mocks
-        mocked_auth.reset_mock()
-        # test authorization and master address assignment
-        self.fsm.on_authorization('10.0.0.1', True, '10.0.0.5')
-        self.assertEqual(call('10.0.0.1', True), mocked_auth.call_args)
-        self.assertEqual('10.0.0.5', self.supvisors.context.master_address)
+        with patch.object(self.fsm, 'next') as mocked_next:
+            self.fsm.on_authorization('10.0.0.1', False, '10.0.0.5')
+            self.assertEqual([call('10.0.0.1', False)], mocked_auth.call_args_list)
+            self.assertEqual('', self.supvisors.context.master_address)
+            self.assertFalse(mocked_next.called)
+            # reset mocks
+            mocked_auth.reset_mock()
+            mocked_auth.return_value = True
+            # test authorization when to master address provided
+            self.fsm.on_authorization('10.0.0.1', True, '')
+            self.assertEqual(call('10.0.0.1', True), mocked_auth.call_args)
+            self.assertEqual('', self.supvisors.context.master_address)
+            # test that the state is evaluated immediately
+            self.assertEqual([call()], mocked_next.call_args_list)
+            self.fsm.dirty = False
+            # reset mocks
+            mocked_auth.reset_mock()
+            # test authorization and master address assignment
+            self.fsm.on_authorization('10.0.0.1', True, '10.0.0.5')
+            self.assertEqual(call('10.0.0.1', True), mocked_auth.call_args)
+            self.assertEqual('10.0.0.5', self.supvisors.context.master_address)
+            self.fsm.dirty = False
         # reset mocks
         mocked_auth.reset_mock()
-        # test authorization and master address assignment
-        self.fsm.on_authorization('10.0.0.1', True, '10.0.0.4')
+        # test authorization and master address discrepancy
+        with patch('supvisors.statemachine.InitializationState.next', return_value=SupvisorsStates.INITIALIZATION):
+            self.fsm.on_authorization('10.0.0.1', True, '10.0.0.4')
         self.assertEqual(call('10.0.0.1', True), mocked_auth.call_args)
         self.assertEqual('10.0.0.5', self.supvisors.context.master_address)
         self.assertEqual(SupvisorsStates.INITIALIZATION, self.fsm.state)
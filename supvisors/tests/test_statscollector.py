@@ -134,6 +134,23 @@ class StatisticsCollectorTest(unittest.TestCase):
             self.assertGreaterEqual(value, 0)
             self.assertLessEqual(value, 100)
 
+    def test_delta_statistics(self):
+        """ Test the changes of statistics since a keyframe. """
+        from supvisors.statscollector import delta_statistics
+        ref = (8.5, [(25, 400), (25, 125)], 76.1,
+               {'eth0': (1024, 2000), 'lo': (500, 500)},
+               {'appli:idle': (118612, (0.15, 1.85)), 'appli:busy': (118613, (0.25, 1.5)),
+                'appli:exited': (118614, (0.5, 2.5))})
+        stats = (13.5, [(45, 700), (50, 225)], 76.2,
+                 {'eth0': (1024, 2000), 'eth1': (10, 20)},
+                 {'appli:idle': (118612, (0.15, 1.85)), 'appli:busy': (118613, (1.75, 1.5)),
+                  'appli:new': (118615, (0.05, 0.5))})
+        self.assertTupleEqual((8.5, 13.5, [(45, 700), (50, 225)], 76.2,
+                               {'eth1': (10, 20)}, ['lo'],
+                               {'appli:busy': (118613, (1.75, 1.5)), 'appli:new': (118615, (0.05, 0.5))},
+                               ['appli:exited']),
+                              delta_statistics(ref, stats))
+
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
@@ -21,6 +21,8 @@ import multiprocessing
 import unittest
 import sys
 
+from unittest.mock import call, patch
+
 from supvisors.tests.base import MockedSupvisors, CompatTestCase
 
 
@@ -413,6 +415,39 @@ class StatisticsCompilerTest(CompatTestCase):
                 for period, instance in period_instance.items():
                     self.assertEqual(-1, instance.counter)
                     self.assertIsNone(instance.ref_stats)
+        # the last statistics pushed are the keyframe of the address
+        self.assertIs(stats4, compiler.keyframes['10.0.0.2'])
+        self.assertIsNone(compiler.keyframes['10.0.0.1'])
+
+    def test_push_delta_statistics(self):
+        """ Test the storage of the statistics of an address rebuilt from a delta. """
+        from supvisors.statscompiler import StatisticsCompiler
+        compiler = StatisticsCompiler(self.supvisors)
+        stats1 = (8.5, [(25, 400), (25, 125)], 76.1, {'eth0': (1024, 2000), 'lo': (500, 500)},
+                  {'myself': (118612, (0.15, 1.85)), 'other': (118613, (0.5, 2.5))})
+        delta = (8.5, 13.5, [(45, 700), (50, 225)], 75.2, {'eth0': (2048, 2512)}, ['lo'],
+                 {'new': (118614, (0.05, 0.5))}, ['other'])
+        with patch.object(compiler, 'add_statistics') as mocked_add:
+            # test without keyframe
+            self.assertFalse(compiler.push_delta_statistics('10.0.0.2', delta))
+            self.assertFalse(mocked_add.called)
+            # test with a keyframe that does not correspond
+            compiler.keyframes['10.0.0.2'] = (3.5, [], 75.0, {}, {})
+            self.assertFalse(compiler.push_delta_statistics('10.0.0.2', delta))
+            self.assertFalse(mocked_add.called)
+            # test with the expected keyframe
+            compiler.push_statistics('10.0.0.2', stats1)
+            mocked_add.reset_mock()
+            self.assertTrue(compiler.push_delta_statistics('10.0.0.2', delta))
+            self.assertEqual([call('10.0.0.2', (13.5, [(45, 700), (50, 225)], 75.2, {'eth0': (2048, 2512)},
+                                                {'myself': (118612, (0.15, 1.85)),
+                                                 'new': (118614, (0.05, 0.5))}))],
+                             mocked_add.call_args_list)
+            # the keyframe is unchanged
+            self.assertIs(stats1, compiler.keyframes['10.0.0.2'])
+        # test that clear resets the keyframe
+        compiler.clear('10.0.0.2')
+        self.assertIsNone(compiler.keyframes['10.0.0.2'])
 
 
 def test_suite():
@@ -49,6 +49,12 @@ class StartingStrategyTest(CompatTestCase):
         addresses['10.0.0.3'] = create_status('10.0.0.3', AddressStates.RUNNING, 20)
         addresses['10.0.0.4'] = create_status('10.0.0.4', AddressStates.UNKNOWN, 0)
         addresses['10.0.0.5'] = create_status('10.0.0.5', AddressStates.RUNNING, 80)
+        # index the addresses per state
+        state_addresses = {state: set() for state in AddressStates.values()}
+        for address_name, status in addresses.items():
+            state_addresses[status.state].add(address_name)
+        self.supvisors.context.state_addresses = state_addresses
+        self.supvisors.context.running_addresses.return_value = sorted(state_addresses[AddressStates.RUNNING])
         # initialize dummy address mapper with all address names (keep the alphabetic order)
         self.supvisors.address_mapper.addresses = sorted(addresses.keys())
         self.supvisors.address_mapper.local_address = '10.0.0.1'
@@ -77,9 +83,8 @@ class StartingStrategyTest(CompatTestCase):
         from supvisors.strategy import AbstractStartingStrategy
         strategy = AbstractStartingStrategy(self.supvisors)
         # test valid addresses with different additional loadings
-        self.assertDictEqual({'10.0.0.0': (False, 0), '10.0.0.1': (True, 50),
-                              '10.0.0.2': (False, 0), '10.0.0.3': (True, 20), '10.0.0.4': (False, 0),
-                              '10.0.0.5': (True, 80)},
+        # only the RUNNING addresses are considered when all addresses are applicable
+        self.assertDictEqual({'10.0.0.1': (True, 50), '10.0.0.3': (True, 20), '10.0.0.5': (True, 80)},
                              strategy.get_loading_and_validity('*', 15))
         self.assertDictEqual({'10.0.0.0': (False, 0), '10.0.0.1': (True, 50),
                               '10.0.0.2': (False, 0), '10.0.0.3': (True, 20), '10.0.0.4': (False, 0),
@@ -181,6 +186,7 @@ class ConciliationStrategyTest(CompatTestCase):
                                   infos={address_name: {'uptime': time}
                                          for address_name, time in timed_addresses.items()})
             process_status.namespec.return_value = name
+            process_status.get_info.side_effect = process_status.infos.__getitem__
             return process_status
 
         self.conflicts = [create_process_status('conflict_1', {'10.0.0.1': 5, '10.0.0.2': 10, '10.0.0.3': 15}),
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import sys
+import unittest
+
+from unittest.mock import call, patch, Mock
+
+from supvisors.tests.base import MockedSupvisors
+
+
+class SupvisorsEventInterfaceTest(unittest.TestCase):
+    """ Test case for the SupvisorsEventInterface class of the client subscriber module. """
+
+    def setUp(self):
+        """ Create the client. """
+        from supvisors.client.subscriber import SupvisorsEventInterface
+        self.client = SupvisorsEventInterface(Mock(), 60002, MockedSupvisors().logger, 60003)
+
+    def test_creation(self):
+        """ Test the values set at construction. """
+        self.assertEqual(60002, self.client.event_port)
+        self.assertEqual(60003, self.client.snapshot_port)
+        self.assertEqual(0, self.client.snapshot_sequence)
+        self.assertEqual(0, self.client.last_sequence)
+
+    @patch('supvisors.client.subscriber.SnapshotRequester')
+    def test_request_snapshot(self, mocked_requester):
+        """ Test the reception of the snapshot. """
+        snapshot = {'sequence': 12, 'supvisors': {'statename': 'OPERATION'}}
+        mocked_requester.return_value.request.return_value = snapshot
+        self.client.last_sequence = 5
+        with patch.object(self.client, 'on_snapshot') as mocked_on_snapshot:
+            self.client.request_snapshot()
+            self.assertEqual([call(snapshot)], mocked_on_snapshot.call_args_list)
+        self.assertEqual(12, self.client.snapshot_sequence)
+        self.assertEqual(0, self.client.last_sequence)
+        self.assertTrue(mocked_requester.return_value.close.called)
+
+    def test_in_snapshot(self):
+        """ Test the filtering of the events already taken into account in the snapshot. """
+        # no snapshot
+        self.assertFalse(self.client.in_snapshot(3))
+        # the events up to the snapshot are filtered until the first event following the snapshot
+        self.client.snapshot_sequence, self.client.last_sequence = 12, 0
+        self.assertTrue(self.client.in_snapshot(11))
+        self.assertTrue(self.client.in_snapshot(12))
+        self.assertFalse(self.client.in_snapshot(13))
+        self.assertEqual(0, self.client.snapshot_sequence)
+        self.assertFalse(self.client.in_snapshot(14))
+
+    def test_in_snapshot_restart(self):
+        """ Test that the events are not filtered anymore when Supvisors restarts. """
+        self.client.snapshot_sequence, self.client.last_sequence = 12, 0
+        self.assertTrue(self.client.in_snapshot(10))
+        # the sequence number goes backwards
+        self.assertFalse(self.client.in_snapshot(1))
+        self.assertEqual(0, self.client.snapshot_sequence)
+        self.assertFalse(self.client.in_snapshot(2))
+
+    def test_in_snapshot_legacy(self):
+        """ Test that the events without sequence number are not filtered. """
+        self.client.snapshot_sequence, self.client.last_sequence = 12, 0
+        self.assertFalse(self.client.in_snapshot(0))
+        self.assertEqual(0, self.client.snapshot_sequence)
+        self.assertFalse(self.client.in_snapshot(0))
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -159,14 +159,73 @@ class InternalEventTest(unittest.TestCase):
         msg = self.receive('Tick')
         self.assertTupleEqual((InternalEventHeaders.TICK,
                                local_address, payload), msg)
+        self.assertDictEqual({local_address: 1}, self.subscriber.sequences)
         # test local disconnection
         self.subscriber.disconnect([local_address])
+        self.assertDictEqual({}, self.subscriber.sequences)
         # send a tick event from the local publisher
         self.publisher.send_tick_event(payload)
         # check the non-reception of the tick event
         with self.assertRaises(zmq.Again):
             self.subscriber.receive()
 
+    def test_sequence_gap(self):
+        """ Test the detection of the messages lost. """
+        local_address = self.supvisors.address_mapper.local_address
+        self.assertEqual(0, self.publisher.sequence)
+        self.assertIsNone(self.subscriber.gap)
+        # first message received
+        self.publisher.send_tick_event({'date': 1000})
+        self.receive('Tick')
+        self.assertEqual(1, self.publisher.sequence)
+        self.assertDictEqual({local_address: 1}, self.subscriber.sequences)
+        self.assertIsNone(self.subscriber.gap)
+        # simulate the loss of messages
+        self.publisher.sequence = 5
+        self.publisher.send_tick_event({'date': 1005})
+        self.receive('Tick')
+        self.assertDictEqual({local_address: 6}, self.subscriber.sequences)
+        self.assertTupleEqual((local_address, 1), self.subscriber.gap)
+        # next message received
+        self.publisher.send_tick_event({'date': 1010})
+        self.receive('Tick')
+        self.assertIsNone(self.subscriber.gap)
+        # the sequence number wraps
+        self.publisher.sequence = self.publisher.MAX_SEQUENCE - 1
+        self.publisher.send_tick_event({'date': 1015})
+        self.receive('Tick')
+        self.assertTupleEqual((local_address, 7), self.subscriber.gap)
+        self.assertEqual(self.publisher.MAX_SEQUENCE, self.publisher.sequence)
+        self.publisher.send_tick_event({'date': 1020})
+        self.receive('Tick')
+        self.assertEqual(1, self.publisher.sequence)
+        self.assertIsNone(self.subscriber.gap)
+        # restart of the publisher
+        self.publisher.sequence = 0
+        self.publisher.send_tick_event({'date': 1030})
+        self.receive('Tick')
+        self.assertIsNone(self.subscriber.gap)
+
+    def test_sequence_compatibility(self):
+        """ Test that the gap detection is skipped for the messages without sequence number. """
+        import pickle
+        from supvisors.utils import InternalEventHeaders
+        local_address = self.supvisors.address_mapper.local_address
+        self.publisher.send_tick_event({'date': 1000})
+        self.receive('Tick')
+        self.assertDictEqual({local_address: 1}, self.subscriber.sequences)
+        # message sent by an older Supvisors instance
+        self.publisher.socket.send(pickle.dumps((InternalEventHeaders.TICK, local_address, {'date': 1005})))
+        self.assertTupleEqual((InternalEventHeaders.TICK, local_address, {'date': 1005}), self.receive('Tick'))
+        self.assertDictEqual({}, self.subscriber.sequences)
+        self.assertIsNone(self.subscriber.gap)
+        # the next sequenced message is not considered as a gap
+        self.publisher.sequence = 5
+        self.publisher.send_tick_event({'date': 1010})
+        self.receive('Tick')
+        self.assertDictEqual({local_address: 6}, self.subscriber.sequences)
+        self.assertIsNone(self.subscriber.gap)
+
     def test_tick_event(self):
         """ Test the publication and subscription of the messages. """
         from supvisors.utils import InternalEventHeaders
@@ -180,6 +239,14 @@ class InternalEventTest(unittest.TestCase):
         self.assertTupleEqual((InternalEventHeaders.TICK,
                                local_address, payload), msg)
 
+    def test_heartbeat(self):
+        """ Test the publication and subscription of the heartbeats. """
+        from supvisors.utils import InternalEventHeaders
+        local_address = self.supvisors.address_mapper.local_address
+        self.publisher.send_heartbeat()
+        msg = self.receive('Heartbeat')
+        self.assertTupleEqual((InternalEventHeaders.HEARTBEAT, local_address, None), msg)
+
     def test_process_event(self):
         """ Test the publication and subscription of the process events. """
         from supvisors.utils import InternalEventHeaders
@@ -193,6 +260,19 @@ class InternalEventTest(unittest.TestCase):
         self.assertTupleEqual((InternalEventHeaders.PROCESS,
                                local_address, payload), msg)
 
+    def test_process_events(self):
+        """ Test the publication and subscription of a batch of process events. """
+        from supvisors.utils import InternalEventHeaders
+        # get the local address
+        local_address = self.supvisors.address_mapper.local_address
+        # send a batch of process events
+        payloads = [{'name': 'dummy_program', 'state': 'starting'}, {'name': 'dummy_program', 'state': 'running'}]
+        self.publisher.send_process_events(payloads)
+        # check the reception of the batch
+        msg = self.receive('ProcessBatch')
+        self.assertTupleEqual((InternalEventHeaders.PROCESS_BATCH,
+                               local_address, payloads), msg)
+
     def test_statistics(self):
         """ Test the publication and subscription of the statistics messages. """
         from supvisors.utils import InternalEventHeaders
@@ -206,6 +286,19 @@ class InternalEventTest(unittest.TestCase):
         self.assertTupleEqual((InternalEventHeaders.STATISTICS,
                                local_address, payload), msg)
 
+    def test_statistics_delta(self):
+        """ Test the publication and subscription of the statistics delta messages. """
+        from supvisors.utils import InternalEventHeaders
+        # get the local address
+        local_address = self.supvisors.address_mapper.local_address
+        # send a statistics delta event
+        payload = {'cpu': 15, 'mem': 5, 'io': {}}
+        self.publisher.send_statistics_delta(payload)
+        # check the reception of the statistics delta event
+        msg = self.receive('StatisticsDelta')
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS_DELTA,
+                               local_address, payload), msg)
+
 
 class RequestTest(unittest.TestCase):
     """ Test case for the InternalEventPublisher and InternalEventSubscriber
@@ -358,6 +451,17 @@ class RequestTest(unittest.TestCase):
         except:
             self.fail('unexpected exception')
 
+    def test_snapshot(self):
+        """ The method tests that the 'SendSnapshot' request is sent
+        and received correctly. """
+        from supvisors.utils import DeferredRequestHeaders
+        self.pusher.send_snapshot('00abcd', {'sequence': 12})
+        request = self.receive('SendSnapshot')
+        self.assertTupleEqual((DeferredRequestHeaders.SEND_SNAPSHOT, ('00abcd', {'sequence': 12})), request)
+        # test that the pusher socket is not blocking
+        with patch.object(self.pusher.socket, 'send_pyobj', side_effect=zmq.error.Again):
+            self.pusher.send_snapshot('00abcd', {'sequence': 12})
+
 
 class EventTest(unittest.TestCase):
     """ Test case for the EventPublisher and EventSubscriber classes
@@ -385,8 +489,8 @@ class EventTest(unittest.TestCase):
         self.subscriber.socket.setsockopt(zmq.RCVTIMEO, 1000)
         # create test payloads
         self.supvisors_payload = {'state': 'running', 'version': '1.0'}
-        self.address_payload = {'state': 'silent', 'name': 'cliche01', 'date': 1234}
-        self.application_payload = {'state': 'starting', 'name': 'supvisors'}
+        self.address_payload = {'state': 'silent', 'address_name': 'cliche01', 'date': 1234}
+        self.application_payload = {'state': 'starting', 'application_name': 'supvisors'}
         self.process_payload = {'state': 'running', 'process_name': 'plugin', 'application_name': 'supvisors',
                                 'date': 1230}
         self.event_payload = {'state': 20, 'name': 'plugin', 'group': 'supvisors', 'now': 1230}
@@ -404,7 +508,9 @@ class EventTest(unittest.TestCase):
                 msg = self.subscriber.receive()
             except zmq.Again:
                 self.fail('Failed to get {} status'.format(header))
-            self.assertTupleEqual((header, data), msg)
+            # check that the sequence number is received in the data
+            self.assertTupleEqual((header, dict(data, sequence=self.publisher.sequence)), msg)
+            self.assertEqual(self.publisher.sequence, self.subscriber.sequence)
         else:
             # check the non-reception of the Supvisors status
             with self.assertRaises(zmq.Again):
@@ -560,6 +666,79 @@ class EventTest(unittest.TestCase):
         self.subscriber.unsubscribe_process_status()
         self.check_subscription(False, False, False, False, False)
 
+    def test_subscription_address(self):
+        """ Test the reception of the status messages of a given address. """
+        # subscribe to an address whose name is a prefix of the address published
+        self.subscriber.subscribe_address('cliche')
+        self.check_subscription(False, False, False, False, False)
+        self.subscriber.unsubscribe_address('cliche')
+        # subscribe to the address published
+        self.subscriber.subscribe_address('cliche01')
+        self.check_subscription(False, True, False, False, False)
+        self.subscriber.unsubscribe_address('cliche01')
+        self.check_subscription(False, False, False, False, False)
+
+    def test_subscription_application(self):
+        """ Test the reception of the messages related to a given application. """
+        # subscribe to an application whose name is a prefix of the application published
+        self.subscriber.subscribe_application('supvisor')
+        self.check_subscription(False, False, False, False, False)
+        self.subscriber.unsubscribe_application('supvisor')
+        # subscribe to the application published
+        self.subscriber.subscribe_application('supvisors')
+        self.check_subscription(False, False, True, True, True)
+        self.subscriber.unsubscribe_application('supvisors')
+        self.check_subscription(False, False, False, False, False)
+
+    def test_subscription_process(self):
+        """ Test the reception of the messages related to a given process. """
+        # subscribe to a process whose name is a prefix of the process published
+        self.subscriber.subscribe_process('supvisors:plug')
+        self.check_subscription(False, False, False, False, False)
+        self.subscriber.unsubscribe_process('supvisors:plug')
+        # subscribe to the process published
+        self.subscriber.subscribe_process('supvisors:plugin')
+        self.check_subscription(False, False, False, True, True)
+        self.subscriber.unsubscribe_process('supvisors:plugin')
+        # subscribe to all the processes of the application
+        self.subscriber.subscribe_process('supvisors:*')
+        self.check_subscription(False, False, False, True, True)
+        self.subscriber.unsubscribe_process('supvisors:*')
+        self.check_subscription(False, False, False, False, False)
+
+    def test_sequence(self):
+        """ Test that every message published increments the sequence number. """
+        self.assertEqual(0, self.publisher.sequence)
+        self.assertEqual(0, self.subscriber.sequence)
+        self.subscriber.subscribe_all()
+        self.check_subscription(True, True, True, True, True)
+        self.assertEqual(5, self.publisher.sequence)
+        self.assertEqual(5, self.subscriber.sequence)
+
+    def test_two_parts(self):
+        """ Test that the messages keep the two-parts format expected by the existing clients. """
+        import json
+        self.subscriber.subscribe_all()
+        time.sleep(1)
+        self.publisher.send_supvisors_status(self.supvisors_payload)
+        topic, data = self.subscriber.socket.recv_multipart()
+        self.assertEqual(b'supvisors/', topic)
+        self.assertDictEqual(dict(self.supvisors_payload, sequence=1), json.loads(data.decode('utf-8')))
+        # the payload provided is not modified
+        self.assertNotIn('sequence', self.supvisors_payload)
+
+    def test_topics(self):
+        """ Test the topics related to an application or a process. """
+        from supvisors.supvisorszmq import EventSubscriber
+        self.assertListEqual(['application/appli/', 'process/appli/', 'event/appli/'],
+                             EventSubscriber.application_topics('appli'))
+        self.assertListEqual(['process/appli/proc/', 'event/appli/proc/'],
+                             EventSubscriber.process_topics('appli:proc'))
+        self.assertListEqual(['process/appli/', 'event/appli/'],
+                             EventSubscriber.process_topics('appli:*'))
+        self.assertListEqual(['process/proc/proc/', 'event/proc/proc/'],
+                             EventSubscriber.process_topics('proc'))
+
 
 class SupervisorZmqTest(unittest.TestCase):
     """ Test case for the SupervisorZmq class of the supvisorszmq module. """
@@ -572,6 +751,7 @@ class SupervisorZmqTest(unittest.TestCase):
 
     def test_creation_closure(self):
         """ Test the types of the attributes created. """
+        from supvisors.codec import PickleCodec
         from supvisors.supvisorszmq import (SupervisorZmq, EventPublisher,
                                             InternalEventPublisher, RequestPusher)
         sockets = SupervisorZmq(self.supvisors)
@@ -580,6 +760,7 @@ class SupervisorZmqTest(unittest.TestCase):
         self.assertFalse(sockets.publisher.socket.closed)
         self.assertIsInstance(sockets.internal_publisher,
                               InternalEventPublisher)
+        self.assertIsInstance(sockets.internal_publisher.codec, PickleCodec)
         self.assertFalse(sockets.internal_publisher.socket.closed)
         self.assertIsInstance(sockets.pusher, RequestPusher)
         self.assertFalse(sockets.pusher.socket.closed)
@@ -601,19 +782,70 @@ class SupvisorsZmqTest(unittest.TestCase):
 
     def test_creation_closure(self):
         """ Test the types of the attributes created. """
-        from supvisors.supvisorszmq import (SupvisorsZmq,
-                                            InternalEventSubscriber, RequestPuller)
+        from supvisors.codec import PickleCodec
+        from supvisors.supvisorszmq import (SupvisorsZmq, InternalEventSubscriber,
+                                            RequestPuller, SnapshotServer)
         sockets = SupvisorsZmq(self.supvisors)
         # test all attribute types
         self.assertIsInstance(sockets.internal_subscriber,
                               InternalEventSubscriber)
+        self.assertIsInstance(sockets.internal_subscriber.codec, PickleCodec)
         self.assertFalse(sockets.internal_subscriber.socket.closed)
         self.assertIsInstance(sockets.puller, RequestPuller)
         self.assertFalse(sockets.puller.socket.closed)
+        self.assertIsInstance(sockets.snapshot_server, SnapshotServer)
+        self.assertFalse(sockets.snapshot_server.socket.closed)
         # close the instance
         sockets.close()
         self.assertTrue(sockets.internal_subscriber.socket.closed)
         self.assertTrue(sockets.puller.socket.closed)
+        self.assertTrue(sockets.snapshot_server.socket.closed)
+
+    def test_creation_no_snapshot(self):
+        """ Test that the snapshot server is not created when the snapshot port is not set. """
+        from supvisors.supvisorszmq import SupvisorsZmq
+        self.supvisors.options.snapshot_port = None
+        sockets = SupvisorsZmq(self.supvisors)
+        self.assertIsNone(sockets.snapshot_server)
+        sockets.close()
+
+
+class SnapshotTest(unittest.TestCase):
+    """ Test case for the SnapshotServer and SnapshotRequester classes of the supvisorszmq module. """
+
+    def setUp(self):
+        """ Create a dummy supvisors, the server and the requester. """
+        if SKIP_IT:
+            raise unittest.SkipTest('DEBUG')
+        from supvisors.supvisorszmq import SnapshotRequester, SnapshotServer
+        self.supvisors = MockedSupvisors()
+        self.server = SnapshotServer(self.supvisors.options.snapshot_port)
+        self.requester = SnapshotRequester(zmq.Context.instance(), self.supvisors.options.snapshot_port,
+                                           self.supvisors.logger)
+
+    def tearDown(self):
+        """ Close the sockets. """
+        self.requester.close()
+        self.server.close()
+
+    def serve(self):
+        """ Reply a snapshot to the first request received. """
+        if self.server.socket.poll(2000, zmq.POLLIN):
+            identity = self.server.receive()
+            self.server.send(identity, {'sequence': 28, 'supvisors': {'statename': 'OPERATION'}})
+
+    def test_request(self):
+        """ Test the request of a snapshot. """
+        from threading import Thread
+        thread = Thread(target=self.serve)
+        thread.start()
+        snapshot = self.requester.request()
+        thread.join()
+        self.assertDictEqual({'sequence': 28, 'supvisors': {'statename': 'OPERATION'}}, snapshot)
+
+    def test_request_timeout(self):
+        """ Test the request of a snapshot without reply. """
+        self.assertIsNone(self.requester.request(100))
 
 
 def test_suite():
@@ -75,6 +75,12 @@ class TypesTest(unittest.TestCase):
         self.assertEqual('RESTART_APPLICATION',
                          RunningFailureStrategies.to_string(RunningFailureStrategies.RESTART_APPLICATION))
 
+    def test_InternalCodecs(self):
+        """ Test the InternalCodecs enumeration. """
+        from supvisors.ttypes import InternalCodecs
+        self.assertEqual('PICKLE', InternalCodecs.to_string(InternalCodecs.PICKLE))
+        self.assertEqual('BINARY', InternalCodecs.to_string(InternalCodecs.BINARY))
+
     def test_SupvisorsStates(self):
         """ Test the SupvisorsStates enumeration. """
         from supvisors.ttypes import SupvisorsStates
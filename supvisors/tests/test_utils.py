@@ -63,6 +63,13 @@ class UtilsTest(unittest.TestCase):
         self.assertListEqual(['ENUM_1', 'ENUM_2', 'ENUM_3'],
                              sorted(DummyEnum.strings()))
 
+    def test_event_topic(self):
+        """ Test the hierarchical topics of the messages published to the Supvisors clients. """
+        from supvisors.utils import EventHeaders, event_topic
+        self.assertEqual('supvisors/', event_topic(EventHeaders.SUPVISORS))
+        self.assertEqual('address/10.0.0.1/', event_topic(EventHeaders.ADDRESS, '10.0.0.1'))
+        self.assertEqual('process/appli/proc/', event_topic(EventHeaders.PROCESS_STATUS, 'appli', 'proc'))
+
     def test_shortcut(self):
         """ Test the shortcuts to supvisors data. """
         from supvisors.utils import supvisors_shortcuts
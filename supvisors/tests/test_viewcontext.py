@@ -473,10 +473,10 @@ class ViewContextTest(unittest.TestCase):
     def test_get_process_last_desc(self):
         """ Test the get_process_last_desc method. """
         # build common Mock
-        mocked_process = Mock(addresses=set(),
-                              infos={'10.0.0.1': {'local_time': 10, 'description': 'desc1'},
-                                     '10.0.0.2': {'local_time': 30, 'description': 'desc2'},
-                                     '10.0.0.3': {'local_time': 20, 'description': 'desc3'}})
+        infos = {'10.0.0.1': {'local_time': 10, 'description': 'desc1'},
+                 '10.0.0.2': {'local_time': 30, 'description': 'desc2'},
+                 '10.0.0.3': {'local_time': 20, 'description': 'desc3'}}
+        mocked_process = Mock(addresses=set(), infos=infos, **{'get_info.side_effect': infos.__getitem__})
         # test method return on non-running process and running requested
         with patch('supvisors.viewcontext.ViewContext.get_process_status',
                    return_value=mocked_process):
@@ -430,12 +430,12 @@ class ViewSupvisorsTest(CompatTestCase):
     def test_get_conciliation_data(self):
         """ Test the get_conciliation_data method. """
         # patch context
-        process_1 = Mock(addresses={'10.0.0.1', '10.0.0.2'},
-                         infos={'10.0.0.1': {'uptime': 12}, '10.0.0.2': {'uptime': 11}},
-                         **{'namespec.return_value': 'proc_1'})
-        process_2 = Mock(addresses={'10.0.0.3', '10.0.0.2'},
-                         infos={'10.0.0.3': {'uptime': 10}, '10.0.0.2': {'uptime': 11}},
-                         **{'namespec.return_value': 'proc_2'})
+        infos_1 = {'10.0.0.1': {'uptime': 12}, '10.0.0.2': {'uptime': 11}}
+        process_1 = Mock(addresses={'10.0.0.1', '10.0.0.2'}, infos=infos_1,
+                         **{'namespec.return_value': 'proc_1', 'get_info.side_effect': infos_1.__getitem__})
+        infos_2 = {'10.0.0.3': {'uptime': 10}, '10.0.0.2': {'uptime': 11}}
+        process_2 = Mock(addresses={'10.0.0.3', '10.0.0.2'}, infos=infos_2,
+                         **{'namespec.return_value': 'proc_2', 'get_info.side_effect': infos_2.__getitem__})
         self.view.sup_ctx.conflicts.return_value = [process_1, process_2]
         # test call
         # no direct method in unittests to compare 2 lists of dicts so put all tuples in flat list
@@ -66,6 +66,12 @@ class RunningFailureStrategies:
     CONTINUE, RESTART_PROCESS, STOP_APPLICATION, RESTART_APPLICATION = range(4)
 
 
+@enumeration_tools
+class InternalCodecs:
+    """ Serialization formats of the messages exchanged between Supvisors instances. """
+    PICKLE, BINARY = range(2)
+
+
 @enumeration_tools
 class SupvisorsStates:
     """ Internal state of Supvisors. """
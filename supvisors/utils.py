@@ -24,7 +24,7 @@ from time import gmtime, localtime, strftime, time
 class InternalEventHeaders:
     """ Enumeration class for the headers in messages between Listener
     and MainLoop. """
-    TICK, PROCESS, STATISTICS = range(3)
+    TICK, PROCESS, STATISTICS, PROCESS_BATCH, STATISTICS_DELTA, HEARTBEAT = range(6)
 
 
 class RemoteCommEvents:
@@ -33,6 +33,9 @@ class RemoteCommEvents:
     SUPVISORS_AUTH = u'auth'
     SUPVISORS_EVENT = u'event'
     SUPVISORS_INFO = u'info'
+    SUPVISORS_SNAPSHOT = u'snapshot'
+    SUPVISORS_RESYNC = u'resync'
+    SUPVISORS_HEARTBEAT = u'heartbeat'
 
 
 class EventHeaders:
@@ -43,12 +46,26 @@ class EventHeaders:
     APPLICATION = u'application'
     PROCESS_EVENT = u'event'
     PROCESS_STATUS = u'process'
+    # separator of the levels in the topic of the messages
+    SEPARATOR = u'/'
+
+
+def event_topic(header: str, *names: str) -> str:
+    """ Build the hierarchical topic of a message published to the Supvisors clients.
+    The topic is made of the header followed by the names identifying the entity, each level being terminated
+    by a separator, so that a ZeroMQ prefix subscription matches exactly the names given.
+
+    :param header: the type of the message, in EventHeaders
+    :param names: the names identifying the entity (e.g. application name and process name)
+    :return: the topic of the message
+    """
+    return ''.join(name + EventHeaders.SEPARATOR for name in (header,) + names)
 
 
 # for deferred XML-RPC requests
 class DeferredRequestHeaders:
     """ Enumeration class for the headers of deferred XML-RPC messages sent to MainLoop."""
-    CHECK_ADDRESS, ISOLATE_ADDRESSES, START_PROCESS, STOP_PROCESS, RESTART, SHUTDOWN = range(6)
+    CHECK_ADDRESS, ISOLATE_ADDRESSES, START_PROCESS, STOP_PROCESS, RESTART, SHUTDOWN, SEND_SNAPSHOT = range(7)
 
 
 def enumeration_tools(cls):
@@ -193,7 +193,7 @@ class ViewContext:
                                   reverse=True)
             address, info = next(iter(sorted_infos), (None, None))
         # return the address too
-        return address, info['description'] if info else None
+        return address, status.get_info(address)['description'] if info else None
 
     def get_process_stats(self, namespec, address=None):
         """ Get the statistics structure related to the process and the period selected.
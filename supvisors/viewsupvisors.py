@@ -158,7 +158,7 @@ class SupvisorsView(ViewHandler):
         return [{'namespec': process.namespec(),
                  'rowspan': len(process.addresses) if idx == 0 else 0,
                  'address': address,
-                 'uptime': process.infos[address]['uptime']}
+                 'uptime': process.get_info(address)['uptime']}
                 for process in self.sup_ctx.conflicts()
                 for idx, address in enumerate(process.addresses)]
 